@@ -160,6 +160,49 @@ LOGOUT_REDIRECT_URL = 'login'
 # Google Drive連携
 GOOGLE_DRIVE_SERVICE_ACCOUNT = 'edi-drive-uploader@edi-sophia-test.iam.gserviceaccount.com'
 GOOGLE_DRIVE_ROOT_FOLDER_ID = env('GOOGLE_DRIVE_ROOT_FOLDER_ID', default='')  # 共有フォルダID
+GOOGLE_DRIVE_UPLOAD_WORKERS = env.int('GOOGLE_DRIVE_UPLOAD_WORKERS', default=8)  # 一括アップロードの並列数
+
+# PDFレンダリングキャッシュ（local: ローカルディスク / media: メディアストレージ / none: 無効）
+PDF_CACHE_BACKEND = env('PDF_CACHE_BACKEND', default='local')
+PDF_CACHE_DIR = env('PDF_CACHE_DIR', default=str(BASE_DIR / 'cache' / 'pdf'))
+PDF_CACHE_MAX_BYTES = env.int('PDF_CACHE_MAX_BYTES', default=256 * 1024 * 1024)
+# PDFキャッシュの容量を確認（全エントリを走査）する間隔の秒数（推定容量が上限を超えた場合はその時点でも確認する）
+PDF_CACHE_EVICT_INTERVAL = env.int('PDF_CACHE_EVICT_INTERVAL', default=300)
+# 自社情報をプロセス内に保持する秒数（変更はキャッシュの世代番号で各ワーカーに伝わる。キャッシュを共有しない構成ではこの秒数以内に反映される）
+COMPANY_INFO_CACHE_TIMEOUT = env.int('COMPANY_INFO_CACHE_TIMEOUT', default=300)
+# 支払条件・契約条件の対応表をプロセス内に保持する秒数（変更はキャッシュの世代番号で各ワーカーに伝わる。キャッシュを共有しない構成ではこの秒数以内に反映される）
+TERM_CACHE_TIMEOUT = env.int('TERM_CACHE_TIMEOUT', default=300)
+# 売上請求書PDFの画像圧縮（既定は圧縮せず、画像をそのまま埋め込む。例: BILLING_PDF_JPEG_QUALITY=85 / BILLING_PDF_DPI=150）
+BILLING_PDF_OPTIONS = {
+    'optimize_images': env.bool('BILLING_PDF_OPTIMIZE_IMAGES', default=False),
+    'jpeg_quality': env.int('BILLING_PDF_JPEG_QUALITY', default=None),
+    'dpi': env.int('BILLING_PDF_DPI', default=None),
+}
+# 画面からの書類一括ダウンロードで描画に使うワーカープロセス数
+DOCUMENT_EXPORT_WORKERS = env.int('DOCUMENT_EXPORT_WORKERS', default=2)
+# 保存済み書類のダウンロード（none: gunicorn から送信 / x-accel: nginx に送信を任せる / x-sendfile）
+DOCUMENT_DOWNLOAD_OFFLOAD = env('DOCUMENT_DOWNLOAD_OFFLOAD', default='none')
+DOCUMENT_DOWNLOAD_ACCEL_PREFIX = env('DOCUMENT_DOWNLOAD_ACCEL_PREFIX', default='/protected-media/')
+# ダウンロード時に照合した原本の結果を保持する秒数（ファイルの名前・サイズ・更新日時が変われば照合し直す）
+DOCUMENT_VERIFY_CACHE_TIMEOUT = env.int('DOCUMENT_VERIFY_CACHE_TIMEOUT', default=3600)
+# 書類原本のハッシュ値をハッシュチェーンに追記する（manage.py verify_documents --since で前回の監査以降だけを照合できる）
+DOCUMENT_HASH_CHAIN = env.bool('DOCUMENT_HASH_CHAIN', default=False)
+
+# キャッシュ（複数ワーカー間で共有する場合は CACHE_URL に共有キャッシュを指定）
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+# ダッシュボードのステータス別集計のキャッシュ秒数
+STATUS_COUNTS_CACHE_TIMEOUT = env.int('STATUS_COUNTS_CACHE_TIMEOUT', default=60)
+
+# バックグラウンドジョブ（database: ワーカー manage.py run_jobs で実行 / immediate: 登録直後にその場で実行）
+JOB_QUEUE_BACKEND = env('JOB_QUEUE_BACKEND', default='database')
+JOB_MAX_ATTEMPTS = env.int('JOB_MAX_ATTEMPTS', default=5)
+JOB_RETRY_BASE_SECONDS = env.int('JOB_RETRY_BASE_SECONDS', default=30)
+JOB_RETRY_MAX_SECONDS = env.int('JOB_RETRY_MAX_SECONDS', default=3600)
+# 実行中のジョブは JOB_HEARTBEAT_INTERVAL 秒ごとに実行開始日時を更新する。JOB_LOCK_TIMEOUT 秒更新がなければワーカー停止とみなす
+JOB_LOCK_TIMEOUT = env.int('JOB_LOCK_TIMEOUT', default=600)
+JOB_HEARTBEAT_INTERVAL = env.int('JOB_HEARTBEAT_INTERVAL', default=60)
 
 
 # パスワードハッシュ化設定（Django標準を使用）
@@ -173,6 +216,9 @@ PASSWORD_HASHERS = [
 
 # メール設定（テスト環境ではコンソール出力、本番では環境変数で切り替え）
 EMAIL_BACKEND = env('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+# メール一括送信（注文書発行通知など）の送信ワーカー数と1秒あたりの送信数の上限（0 は無制限）
+BULK_MAIL_WORKERS = env.int('BULK_MAIL_WORKERS', default=1)
+BULK_MAIL_RATE = env.float('BULK_MAIL_RATE', default=5.0)
 
 # デフォルトのプライマリキーフィールド型
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
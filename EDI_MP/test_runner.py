@@ -0,0 +1,16 @@
+"""
+テストランナー（EDI_MP.test_settings で使用）
+
+マイグレーションを適用せずにテーブルを作成するため、マイグレーション 0026 が作成する
+横断検索の索引（core.services.search）をテーブル作成後に作成する。
+"""
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_databases(self, **kwargs):
+        old_config = super().setup_databases(**kwargs)
+        from core.services.search import ensure_search_backend
+        ensure_search_backend()
+        return old_config
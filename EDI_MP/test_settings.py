@@ -0,0 +1,25 @@
+"""
+テスト用の設定（python manage.py test --settings=EDI_MP.test_settings）
+
+既存のマイグレーション（orders.0012 など、SQLite で適用できないもの）を適用せず、
+NAS の scripts/create_tables.py と同じくモデルから直接テーブルを作成する。
+横断検索の索引は EDI_MP.test_runner がテーブル作成後に作成する。
+"""
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+MIGRATION_MODULES = {app: None for app in ('core', 'orders', 'invoices', 'billing')}
+TEST_RUNNER = 'EDI_MP.test_runner.TestRunner'
+
+DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+}
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+MEDIA_ROOT = tempfile.mkdtemp(prefix='edi-test-media-')
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+PDF_CACHE_BACKEND = 'none'
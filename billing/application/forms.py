@@ -137,3 +137,5 @@ class InvoiceMailForm(forms.Form):
         label='本文',
         widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 8}),
     )
+    # 送信画面を開くごとに発行する値。同じ画面からの二重送信だけを防ぎ、送信後の再送は受け付ける
+    submission_token = forms.CharField(required=False, widget=forms.HiddenInput)
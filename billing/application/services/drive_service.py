@@ -1,34 +1,9 @@
 """
 Googleドライブ保存サービス
 """
-import os
 from django.conf import settings
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseUpload
-
-
-SCOPES = ['https://www.googleapis.com/auth/drive.file']
-
-
-def _get_drive_service():
-    """Google Drive APIサービスを取得"""
-    cred_path = os.path.join(
-        settings.BASE_DIR, 'credentials', 'drive-service-account.json'
-    )
-
-    # サービスアカウントJSONが存在し、中身がある場合はそれを使用
-    if os.path.exists(cred_path) and os.path.getsize(cred_path) > 0:
-        from google.oauth2 import service_account
-        credentials = service_account.Credentials.from_service_account_file(
-            cred_path, scopes=SCOPES
-        )
-    else:
-        # Application Default Credentials (ADC) を使用
-        # gcloud auth application-default login で認証
-        import google.auth
-        credentials, _ = google.auth.default(scopes=SCOPES)
-
-    return build('drive', 'v3', credentials=credentials)
+from core.services.google_drive import get_drive_service
 
 
 def upload_to_drive(pdf_buffer, filename, folder_id=None):
@@ -43,7 +18,8 @@ def upload_to_drive(pdf_buffer, filename, folder_id=None):
     Returns:
         GoogleドライブのファイルID
     """
-    service = _get_drive_service()
+    # 認証情報・クライアントはプロセス内で再利用する
+    service = get_drive_service('billing')
 
     if folder_id is None:
         folder_id = getattr(settings, 'GOOGLE_DRIVE_ROOT_FOLDER_ID', '')
@@ -1,25 +1,109 @@
 """
 PDF生成サービス（WeasyPrint）
+
+WeasyPrint はスタイルシートとフォントの解析に時間がかかるため、
+- スタイルシート（billing/invoice_pdf.css）はプロセスで1回だけ読み込み、CSS オブジェクトとして事前に解析し、
+- フォント設定（FontConfiguration）・画像キャッシュ・コンパイル済みテンプレートとともに
+スレッドごとに保持して、2件目以降の生成では HTML の描画のみを行う。
+スタイルシートを変更した場合は reset_renderer() で読み込み直す。
+
+画像の圧縮（optimize_images / jpeg_quality / dpi）は出力が変わるため既定では行わない
+（settings.BILLING_PDF_OPTIONS で有効にできる）。
+
+WeasyPrint（pango）はインポート時にネイティブライブラリを読み込むため、
+PDFを生成するときに初めてインポートする。
 """
+import functools
 import io
-from django.template.loader import render_to_string
-from weasyprint import HTML
-from core.domain.models import CompanyInfo
+import threading
+
+from django.conf import settings
+from django.template.loader import get_template, render_to_string
+from core.services.company import get_company_info
+
+# write_pdf() に渡すオプション（settings.BILLING_PDF_OPTIONS で上書きできる。既定は WeasyPrint の既定と同じ）
+DEFAULT_PDF_OPTIONS = {
+    'optimize_images': False,
+    'jpeg_quality': None,
+    'dpi': None,
+}
+
+TEMPLATE_NAME = 'billing/invoice_pdf.html'
+STYLESHEET_NAME = 'billing/invoice_pdf.css'
+
+_local = threading.local()
+
+
+@functools.lru_cache(maxsize=None)
+def stylesheet_source():
+    """スタイルシートの内容（プロセスで1回だけ読み込む）"""
+    return render_to_string(STYLESHEET_NAME)
+
+
+class _Renderer:
+    """解析済みスタイルシート・フォント設定・テンプレートをまとめて保持する"""
+
+    def __init__(self):
+        from weasyprint import CSS
+        from weasyprint.text.fonts import FontConfiguration
+
+        self.font_config = FontConfiguration()
+        self.css_source = stylesheet_source()
+        self.stylesheets = [CSS(string=self.css_source, font_config=self.font_config)]
+        self.template = get_template(TEMPLATE_NAME)
+        # 同じ画像（ロゴ等）を請求書ごとに読み直さないためのキャッシュ
+        self.image_cache = {}
+        self.options = {**DEFAULT_PDF_OPTIONS, **getattr(settings, 'BILLING_PDF_OPTIONS', {})}
+
+    def render(self, context):
+        from weasyprint import HTML
+
+        html = HTML(string=self.template.render(context), base_url=str(settings.BASE_DIR))
+        return html.write_pdf(
+            stylesheets=self.stylesheets,
+            font_config=self.font_config,
+            cache=self.image_cache,
+            **self.options,
+        )
 
 
-def generate_billing_pdf(invoice):
+def get_renderer():
+    """現在のスレッドの描画オブジェクト（初回とスタイルシートの読み込み直し後のみ解析する）"""
+    renderer = getattr(_local, 'renderer', None)
+    if renderer is None or renderer.css_source is not stylesheet_source():
+        renderer = _local.renderer = _Renderer()
+    return renderer
+
+
+def reset_renderer():
+    """スタイルシートを読み込み直し、保持している描画オブジェクトを破棄する（スタイルシート変更時・計測用）"""
+    stylesheet_source.cache_clear()
+    _local.renderer = None
+
+
+def billing_pdf_inputs(invoice):
     """
-    請求書PDFを生成してバイトストリームを返す。
+    請求書PDFに反映される入力一式（PDFキャッシュのキー算出用）
     """
+    return [
+        invoice,
+        invoice.items.all(),
+        invoice.customer,
+        invoice.company or get_company_info(),
+    ]
+
+
+def billing_pdf_context(invoice, company=None):
+    """請求書PDFのテンプレートに渡す値"""
     # 自社情報を取得
-    company = invoice.company or CompanyInfo.objects.first()
+    company = invoice.company or company or get_company_info()
 
     # 税率ごとの内訳
     tax_summary = invoice.tax_summary
     for rate, amounts in tax_summary.items():
         amounts['tax_fmt'] = f"{amounts['tax']:,}"
 
-    context = {
+    return {
         'invoice': invoice,
         'company': company,
         'items': invoice.items.all(),
@@ -31,8 +115,23 @@ def generate_billing_pdf(invoice):
         'tax_summary': tax_summary,
     }
 
-    html_string = render_to_string('billing/invoice_pdf.html', context)
-    html = HTML(string=html_string)
-    pdf_bytes = html.write_pdf()
 
+def generate_billing_pdf(invoice, company=None):
+    """
+    請求書PDFを生成してバイトストリームを返す。
+    """
+    pdf_bytes = get_renderer().render(billing_pdf_context(invoice, company=company))
     return io.BytesIO(pdf_bytes)
+
+
+def render_billing_pdfs(invoices, company=None):
+    """
+    複数の請求書PDFを同じ描画オブジェクトで続けて生成する。
+
+    Yields:
+        tuple: (請求書, PDFのバイト列)
+    """
+    renderer = get_renderer()
+    company = company or get_company_info()
+    for invoice in invoices:
+        yield invoice, renderer.render(billing_pdf_context(invoice, company=company))
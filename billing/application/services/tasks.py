@@ -0,0 +1,33 @@
+"""
+売上請求書のバックグラウンドジョブ（Googleドライブ保存・メール送信）
+
+core.services.jobs.enqueue から登録し、ワーカー（manage.py run_jobs）で実行する。
+"""
+from billing.domain.models import BillingInvoice
+from core.services.pdf_cache import get_or_render
+from .drive_service import upload_to_drive
+from .mail_service import send_invoice_email
+from .pdf_generator import billing_pdf_inputs, generate_billing_pdf
+
+
+def _render_pdf(invoice):
+    return get_or_render('billing_invoice', billing_pdf_inputs(invoice), lambda: generate_billing_pdf(invoice))
+
+
+def upload_invoice_to_drive(invoice_id, folder_id=None):
+    """請求書PDFをGoogleドライブに保存し、ファイルIDを記録する"""
+    invoice = BillingInvoice.objects.select_related('customer', 'company').get(pk=invoice_id)
+    filename = f"請求書_{invoice.customer.name}_{invoice.issue_date}.pdf"
+    file_id = upload_to_drive(_render_pdf(invoice), filename, folder_id=folder_id)
+    invoice.drive_file_id = file_id
+    invoice.save(update_fields=['drive_file_id'])
+
+
+def send_invoice_mail(invoice_id, to_list, cc_list, subject, body):
+    """請求書PDFを添付してメールを送信し、送付済に更新する"""
+    invoice = BillingInvoice.objects.select_related('customer', 'company').get(pk=invoice_id)
+    if not send_invoice_email(invoice, to_list, cc_list, subject, body, _render_pdf(invoice)):
+        raise RuntimeError("メール送信に失敗しました。")
+    if invoice.status in ('DRAFT', 'ISSUED'):
+        invoice.status = 'SENT'
+        invoice.save(update_fields=['status'])
@@ -5,9 +5,13 @@ billing ドメインモデル
 EDI Sophia の invoices（買掛: パートナーへの支払い）とは逆方向の取引。
 """
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from contextlib import contextmanager
 import datetime
+import threading
 import uuid
 
 
@@ -96,6 +100,15 @@ class BillingInvoice(models.Model):
         _("DriveファイルID"), max_length=200, blank=True
     )
 
+    # 金額（明細から集計して保存。BillingItem の保存・削除時に自動更新）
+    subtotal_amount = models.IntegerField(_("税抜合計"), default=0, editable=False)
+    tax_amount = models.IntegerField(_("消費税合計"), default=0, editable=False)
+    total_amount = models.IntegerField(_("税込合計"), default=0, editable=False)
+    tax_breakdown = models.JSONField(
+        _("税率別内訳"), default=list, blank=True, editable=False,
+        help_text=_("[{'tax_category': '10', 'subtotal': 0, 'tax': 0}, ...]")
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -103,6 +116,14 @@ class BillingInvoice(models.Model):
         verbose_name = _("売上請求書")
         verbose_name_plural = _("売上請求書")
         ordering = ['-issue_date', '-created_at']
+        indexes = [
+            # 請求書一覧のキーセットページ送り
+            models.Index(fields=['-issue_date', '-created_at', '-id'], name='billing_issue_created_id_idx'),
+            # 請求書一覧のステータス絞り込み（キーセットページ送りと同じ並び順）
+            models.Index(fields=['status', '-issue_date', '-created_at', '-id'], name='billing_status_issue_idx'),
+            # 未入金・期日超過の請求書（請求先での絞り込みは外部キーのインデックスを使う）
+            models.Index(fields=['status', 'due_date'], name='billing_status_due_idx'),
+        ]
 
     def __str__(self):
         return f"{self.issue_date} - {self.customer.name} - {self.subject}"
@@ -126,36 +147,59 @@ class BillingInvoice(models.Model):
     @property
     def subtotal(self):
         """税抜合計"""
-        return sum(item.amount for item in self.items.all())
-
-    @property
-    def tax_amount(self):
-        """消費税合計"""
-        return sum(item.tax for item in self.items.all())
+        return self.subtotal_amount
 
     @property
     def total(self):
         """税込合計"""
-        return self.subtotal + self.tax_amount
+        return self.total_amount
 
     @property
     def subtotal_fmt(self):
-        return f"{self.subtotal:,}"
+        return f"{self.subtotal_amount:,}"
 
     @property
     def total_fmt(self):
-        return f"{self.total:,}"
+        return f"{self.total_amount:,}"
 
     @property
     def tax_summary(self):
         """税率ごとの内訳（インボイス制度対応）"""
-        from collections import defaultdict
-        summary = defaultdict(lambda: {'subtotal': 0, 'tax': 0})
-        for item in self.items.all():
-            rate = item.tax_rate_display
-            summary[rate]['subtotal'] += item.amount
-            summary[rate]['tax'] += item.tax
-        return dict(summary)
+        labels = dict(BillingItem.TAX_CHOICES)
+        return {
+            labels.get(entry['tax_category'], '10%'): {'subtotal': entry['subtotal'], 'tax': entry['tax']}
+            for entry in self.tax_breakdown
+        }
+
+    def calculate_totals(self, items=None):
+        """明細から税抜合計・消費税・税込合計・税率別内訳を算出して設定する（保存はしない）"""
+        if items is None:
+            items = self.items.all()
+        breakdown = {}
+        for item in items:
+            category = item.tax_category
+            entry = breakdown.setdefault(category, {'tax_category': category, 'subtotal': 0, 'tax': 0})
+            entry['subtotal'] += item.amount
+            entry['tax'] += item.tax
+        self.tax_breakdown = list(breakdown.values())
+        self.subtotal_amount = sum(e['subtotal'] for e in self.tax_breakdown)
+        self.tax_amount = sum(e['tax'] for e in self.tax_breakdown)
+        self.total_amount = self.subtotal_amount + self.tax_amount
+
+    def update_totals(self):
+        """明細から金額を再計算して保存する"""
+        self.calculate_totals()
+        # updated_at やシグナルに影響しないよう直接更新する
+        BillingInvoice.objects.filter(pk=self.pk).update(
+            subtotal_amount=self.subtotal_amount,
+            tax_amount=self.tax_amount,
+            total_amount=self.total_amount,
+            tax_breakdown=self.tax_breakdown,
+        )
+        from core.services.document_registry import register_documents
+        from core.services.status_counts import invalidate_status_counts
+        invalidate_status_counts(BillingInvoice._meta.label)
+        register_documents(BillingInvoice._meta.label, [self.pk], update_fields=['total_amount'])
 
 
 class BillingItem(models.Model):
@@ -231,3 +275,38 @@ class BillingItem(models.Model):
     def total(self):
         """合計（税込）"""
         return self.amount + self.tax
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_totals(invoice):
+    """
+    ブロック内の明細の保存・削除では金額を再計算せず、ブロックを抜けるときに1回だけ再計算する。
+
+    明細のフォームセットを保存する場合に使う（明細ごとに再計算すると明細数の2乗の処理になる）。
+    """
+    deferred = getattr(_deferred, 'invoice_ids', None)
+    if deferred is None:
+        deferred = _deferred.invoice_ids = set()
+    nested = invoice.pk in deferred
+    deferred.add(invoice.pk)
+    try:
+        yield
+    finally:
+        if not nested:
+            deferred.discard(invoice.pk)
+    if not nested:
+        invoice.update_totals()
+
+
+@receiver(post_save, sender=BillingItem)
+@receiver(post_delete, sender=BillingItem)
+def update_invoice_totals(sender, instance, **kwargs):
+    """明細が変更されたら請求書の保存済み金額を再計算する（deferred_totals のブロック内を除く）"""
+    if instance.invoice_id in getattr(_deferred, 'invoice_ids', ()):
+        return
+    invoice = BillingInvoice.objects.filter(pk=instance.invoice_id).first()
+    if invoice:
+        invoice.update_totals()
@@ -0,0 +1,90 @@
+import datetime
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.template.loader import get_template, render_to_string
+from billing.application.services.pdf_generator import (
+    STYLESHEET_NAME, TEMPLATE_NAME, billing_pdf_context, render_billing_pdfs, reset_renderer,
+)
+from billing.domain.models import BillingCustomer, BillingInvoice, BillingItem
+
+
+class RollbackSeed(Exception):
+    """計測用データを破棄するためにトランザクションを巻き戻す"""
+
+
+class Command(BaseCommand):
+    help = '売上請求書PDF（WeasyPrint）の1件あたりの生成時間を、従来方式と事前解析方式で比較する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoices', type=int, default=50, help='生成する請求書の件数')
+        parser.add_argument('--items', type=int, default=5, help='請求書1件あたりの明細数')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                invoices = self._seed(options['invoices'], options['items'])
+                before = self._measure("従来方式（毎回CSS・フォントを解析）", self._render_legacy, invoices)
+                reset_renderer()
+                after = self._measure("事前解析方式", self._render_cached, invoices)
+                raise RollbackSeed
+        except RollbackSeed:
+            pass
+
+        speedup = statistics.mean(before) / statistics.mean(after) if after else 0
+        self.stdout.write(self.style.SUCCESS(f"1件あたりの生成時間は {speedup:.1f} 倍速くなりました。"))
+        if speedup < 1:
+            raise CommandError("事前解析方式が従来方式より遅くなっています。")
+
+    def _render_legacy(self, invoices):
+        """変更前の生成方法（請求書ごとにテンプレート・CSS・フォント設定を作り直す）"""
+        from weasyprint import CSS, HTML
+        for invoice in invoices:
+            started = time.perf_counter()
+            html = render_to_string(TEMPLATE_NAME, billing_pdf_context(invoice))
+            css = get_template(STYLESHEET_NAME).template.source
+            HTML(string=html).write_pdf(stylesheets=[CSS(string=css)])
+            yield time.perf_counter() - started
+
+    def _render_cached(self, invoices):
+        started = time.perf_counter()
+        for _invoice, _pdf in render_billing_pdfs(invoices):
+            yield time.perf_counter() - started
+            started = time.perf_counter()
+
+    def _measure(self, title, render, invoices):
+        latencies = list(render(invoices))
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self.stdout.write(
+            f"{title}: {len(latencies)}件 / 1件目 {latencies[0] * 1000:.1f}ms / "
+            f"平均 {statistics.mean(ordered) * 1000:.1f}ms / "
+            f"中央値 {statistics.median(ordered) * 1000:.1f}ms / "
+            f"p95 {p95 * 1000:.1f}ms"
+        )
+        return latencies
+
+    def _seed(self, count, items):
+        """計測用の請求書を count 件作成する（呼び出し側で巻き戻す）"""
+        customer = BillingCustomer.objects.create(name='計測用取引先', contact_person='計測 太郎')
+        invoices = BillingInvoice.objects.bulk_create([
+            BillingInvoice(
+                customer=customer, subject=f"計測用請求 {i + 1}",
+                due_date=datetime.date.today() + datetime.timedelta(days=30),
+            )
+            for i in range(count)
+        ])
+        BillingItem.objects.bulk_create([
+            BillingItem(
+                invoice=invoice, product_name=f"SES作業 {n + 1}", unit_price=800000,
+                man_month='1.00', tax_category='10', sort_order=n,
+            )
+            for invoice in invoices for n in range(items)
+        ])
+        for invoice in invoices:
+            invoice.update_totals()
+        return list(
+            BillingInvoice.objects.filter(pk__in=[i.pk for i in invoices])
+            .select_related('customer', 'company').order_by('created_at')
+        )
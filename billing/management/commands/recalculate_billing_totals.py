@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from billing.domain.models import BillingInvoice
+
+TOTAL_FIELDS = ['subtotal_amount', 'tax_amount', 'total_amount', 'tax_breakdown']
+
+
+class Command(BaseCommand):
+    help = '売上請求書の保存済み金額（税抜・消費税・税込・税率別内訳）を明細から一括で再計算する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='一度に処理する請求書の件数')
+        parser.add_argument('--dry-run', action='store_true', help='差異の報告のみ行い、保存しない')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = 0
+        changed = []
+
+        queryset = BillingInvoice.objects.order_by('pk').prefetch_related('items')
+        batch = []
+        for invoice in queryset.iterator(chunk_size=batch_size):
+            before = [getattr(invoice, f) for f in TOTAL_FIELDS]
+            invoice.calculate_totals(items=invoice.items.all())
+            checked += 1
+            if before != [getattr(invoice, f) for f in TOTAL_FIELDS]:
+                changed.append(invoice)
+                batch.append(invoice)
+                self.stdout.write(f"{invoice.invoice_number}: ¥{before[2]:,} -> ¥{invoice.total_amount:,}")
+            if len(batch) >= batch_size:
+                self._save(batch, options['dry_run'])
+                batch = []
+        self._save(batch, options['dry_run'])
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{checked}件を確認し、{len(changed)}件に差異があります（未保存）。"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{checked}件を確認し、{len(changed)}件を更新しました。"))
+
+    def _save(self, invoices, dry_run):
+        if not invoices or dry_run:
+            return
+        with transaction.atomic():
+            BillingInvoice.objects.bulk_update(invoices, TOTAL_FIELDS)
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:02
+
+from django.db import migrations, models
+
+
+TAX_RATES = {'10': 0.10, '8': 0.08, '0': 0.0}
+
+
+def backfill_totals(apps, schema_editor):
+    """既存の請求書に明細から集計した金額を設定する"""
+    BillingInvoice = apps.get_model('billing', 'BillingInvoice')
+    invoices = list(BillingInvoice.objects.prefetch_related('items'))
+    for invoice in invoices:
+        breakdown = {}
+        for item in invoice.items.all():
+            amount = int(item.unit_price * item.man_month)
+            tax = int(amount * TAX_RATES.get(item.tax_category, 0.10))
+            entry = breakdown.setdefault(
+                item.tax_category, {'tax_category': item.tax_category, 'subtotal': 0, 'tax': 0}
+            )
+            entry['subtotal'] += amount
+            entry['tax'] += tax
+        invoice.tax_breakdown = list(breakdown.values())
+        invoice.subtotal_amount = sum(e['subtotal'] for e in invoice.tax_breakdown)
+        invoice.tax_amount = sum(e['tax'] for e in invoice.tax_breakdown)
+        invoice.total_amount = invoice.subtotal_amount + invoice.tax_amount
+    BillingInvoice.objects.bulk_update(
+        invoices, ['subtotal_amount', 'tax_amount', 'total_amount', 'tax_breakdown'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0003_alter_billingitem_man_month'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billinginvoice',
+            name='subtotal_amount',
+            field=models.IntegerField(default=0, editable=False, verbose_name='税抜合計'),
+        ),
+        migrations.AddField(
+            model_name='billinginvoice',
+            name='tax_amount',
+            field=models.IntegerField(default=0, editable=False, verbose_name='消費税合計'),
+        ),
+        migrations.AddField(
+            model_name='billinginvoice',
+            name='tax_breakdown',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text="[{'tax_category': '10', 'subtotal': 0, 'tax': 0}, ...]", verbose_name='税率別内訳'),
+        ),
+        migrations.AddField(
+            model_name='billinginvoice',
+            name='total_amount',
+            field=models.IntegerField(default=0, editable=False, verbose_name='税込合計'),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0004_billinginvoice_stored_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='billinginvoice',
+            index=models.Index(fields=['-issue_date', '-created_at', '-id'], name='billing_issue_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0005_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='billinginvoice',
+            index=models.Index(fields=['status', '-issue_date', '-created_at', '-id'], name='billing_status_issue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='billinginvoice',
+            index=models.Index(fields=['status', 'due_date'], name='billing_status_due_idx'),
+        ),
+    ]
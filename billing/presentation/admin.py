@@ -3,8 +3,9 @@ billing プレゼンテーション層 - Django Admin設定
 """
 from django.contrib import admin
 from billing.domain.models import (
-    BillingCustomer, BillingProduct, BillingInvoice, BillingItem,
+    BillingCustomer, BillingProduct, BillingInvoice, BillingItem, deferred_totals,
 )
+from core.services.search import SearchIndexAdminMixin
 
 
 class BillingItemInline(admin.TabularInline):
@@ -14,7 +15,7 @@ class BillingItemInline(admin.TabularInline):
 
 
 @admin.register(BillingCustomer)
-class BillingCustomerAdmin(admin.ModelAdmin):
+class BillingCustomerAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'contact_person', 'email', 'phone']
     search_fields = ['name', 'contact_person']
 
@@ -27,12 +28,17 @@ class BillingProductAdmin(admin.ModelAdmin):
 
 
 @admin.register(BillingInvoice)
-class BillingInvoiceAdmin(admin.ModelAdmin):
+class BillingInvoiceAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
     list_display = ['invoice_number', 'customer', 'issue_date', 'due_date', 'status', 'total']
     list_filter = ['status', 'issue_date']
     search_fields = ['customer__name', 'subject']
     inlines = [BillingItemInline]
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['subtotal_amount', 'tax_amount', 'total_amount', 'created_at', 'updated_at']
+
+    def save_related(self, request, form, formsets, change):
+        # 明細のインラインを保存した後に金額を1回だけ再計算する
+        with deferred_totals(form.instance):
+            super().save_related(request, form, formsets, change)
 
     def total(self, obj):
         return f"¥{obj.total:,}"
@@ -1,6 +1,8 @@
 """
 billing プレゼンテーション層 - ビュー定義
 """
+import hashlib
+import uuid
 from django.shortcuts import render, get_object_or_404, redirect
 from django.http import HttpResponse, JsonResponse
 from django.contrib.auth.decorators import login_required, user_passes_test
@@ -12,26 +14,34 @@ from django.views.generic import (
     ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView,
 )
 from django.urls import reverse_lazy, reverse
-from django.db.models import Sum, Q
+from django.db.models import Sum
 
 from billing.domain.models import (
-    BillingCustomer, BillingProduct, BillingInvoice, BillingItem,
+    BillingCustomer, BillingProduct, BillingInvoice, BillingItem, deferred_totals,
 )
 from billing.application.forms import (
     BillingCustomerForm, BillingProductForm, BillingInvoiceForm,
     BillingItemFormSet, InvoiceMailForm,
 )
-from billing.application.services.pdf_generator import generate_billing_pdf
-from billing.application.services.drive_service import upload_to_drive, get_drive_file_url
-from billing.application.services.mail_service import (
-    send_invoice_email, parse_email_list,
-)
+from billing.application.services.pdf_generator import generate_billing_pdf, billing_pdf_inputs
+from billing.application.services.mail_service import parse_email_list
 from core.domain.models import CompanyInfo
+from core.services.jobs import enqueue, jobs_for
+from core.services.keyset import KeysetPaginationMixin
+from core.services.pdf_cache import get_or_render
+from core.services.search import search_ids
+from core.services.status_counts import get_status_counts
 
 
 staff_required = user_passes_test(lambda u: u.is_staff)
 
 
+def _job_key(action, invoice, *parts):
+    """ジョブの冪等キー（同じ請求書・同じ内容の処理を一度だけ登録する）"""
+    digest = hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()[:32]
+    return f"billing_invoice:{invoice.pk}:{action}:{digest}"
+
+
 # ============================================================
 # ダッシュボード
 # ============================================================
@@ -43,12 +53,16 @@ class DashboardView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        invoices = BillingInvoice.objects.all()
-        context['total_count'] = invoices.count()
-        context['draft_count'] = invoices.filter(status='DRAFT').count()
-        context['issued_count'] = invoices.filter(status='ISSUED').count()
-        context['sent_count'] = invoices.filter(status='SENT').count()
-        context['paid_count'] = invoices.filter(status='PAID').count()
+        invoices = BillingInvoice.objects.select_related('customer')
+        counts = get_status_counts('billing.BillingInvoice')
+        context['total_count'] = counts['total']
+        context['draft_count'] = counts['by_status']['DRAFT']
+        context['issued_count'] = counts['by_status']['ISSUED']
+        context['sent_count'] = counts['by_status']['SENT']
+        context['paid_count'] = counts['by_status']['PAID']
+        context['unpaid_amount'] = counts['unpaid_amount']
+        context['overdue_amount'] = counts['overdue_amount']
+        context['overdue_count'] = counts['overdue_count']
         context['recent_invoices'] = invoices[:10]
         context['unpaid_invoices'] = invoices.exclude(status='PAID')[:10]
         return context
@@ -164,21 +178,21 @@ class ProductAPIView(View):
 # ============================================================
 
 @method_decorator([login_required, staff_required], name='dispatch')
-class InvoiceListView(ListView):
+class InvoiceListView(KeysetPaginationMixin, ListView):
     model = BillingInvoice
     template_name = 'billing/invoice_list.html'
     context_object_name = 'invoices'
+    keyset_ordering = ('-issue_date', '-created_at', '-id')
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        qs = super().get_queryset().select_related('customer')
         status = self.request.GET.get('status')
         q = self.request.GET.get('q')
         if status:
             qs = qs.filter(status=status)
         if q:
-            qs = qs.filter(
-                Q(customer__name__icontains=q) | Q(subject__icontains=q)
-            )
+            # 請求先名・件名・備考・請求書番号を横断検索の索引で検索する（表記揺れを区別しない）
+            qs = qs.filter(pk__in=search_ids('billing.BillingInvoice', q))
         return qs
 
     def get_context_data(self, **kwargs):
@@ -216,14 +230,16 @@ class InvoiceCreateView(CreateView):
             self.object = form.save()
             formset.instance = self.object
             items = formset.save(commit=False)
-            for item in items:
-                if item.product:
-                    item.product_name = item.product.name
-                    item.unit_price = item.product.unit_price
-                    item.tax_category = item.product.tax_category
-                item.save()
-            for obj in formset.deleted_objects:
-                obj.delete()
+            # 金額は明細ごとではなく、すべての明細を保存した後に1回だけ再計算する
+            with deferred_totals(self.object):
+                for item in items:
+                    if item.product:
+                        item.product_name = item.product.name
+                        item.unit_price = item.product.unit_price
+                        item.tax_category = item.product.tax_category
+                    item.save()
+                for obj in formset.deleted_objects:
+                    obj.delete()
             messages.success(self.request, '請求書を作成しました。')
             return redirect('billing:invoice_list')
         else:
@@ -253,14 +269,16 @@ class InvoiceUpdateView(UpdateView):
             self.object = form.save()
             formset.instance = self.object
             items = formset.save(commit=False)
-            for item in items:
-                if item.product:
-                    item.product_name = item.product.name
-                    item.unit_price = item.product.unit_price
-                    item.tax_category = item.product.tax_category
-                item.save()
-            for obj in formset.deleted_objects:
-                obj.delete()
+            # 金額は明細ごとではなく、すべての明細を保存した後に1回だけ再計算する
+            with deferred_totals(self.object):
+                for item in items:
+                    if item.product:
+                        item.product_name = item.product.name
+                        item.unit_price = item.product.unit_price
+                        item.tax_category = item.product.tax_category
+                    item.save()
+                for obj in formset.deleted_objects:
+                    obj.delete()
             messages.success(self.request, '請求書を更新しました。')
             return redirect('billing:invoice_list')
         else:
@@ -283,6 +301,7 @@ class InvoiceDetailView(DetailView):
         inv = self.object
         context['status_display'] = inv.get_status_display()
         context['status_style'] = inv.status_badge_style
+        context['jobs'] = jobs_for(inv)
         return context
 
 
@@ -307,7 +326,9 @@ class InvoicePDFView(View):
     """PDF生成・プレビュー"""
     def get(self, request, pk):
         invoice = get_object_or_404(BillingInvoice, pk=pk)
-        pdf_buffer = generate_billing_pdf(invoice)
+        pdf_buffer = get_or_render(
+            'billing_invoice', billing_pdf_inputs(invoice), lambda: generate_billing_pdf(invoice)
+        )
         response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
         response['Content-Disposition'] = f'inline; filename="invoice_{invoice.invoice_number}.pdf"'
         return response
@@ -318,7 +339,9 @@ class InvoicePDFDownloadView(View):
     """PDFダウンロード"""
     def get(self, request, pk):
         invoice = get_object_or_404(BillingInvoice, pk=pk)
-        pdf_buffer = generate_billing_pdf(invoice)
+        pdf_buffer = get_or_render(
+            'billing_invoice', billing_pdf_inputs(invoice), lambda: generate_billing_pdf(invoice)
+        )
         response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="invoice_{invoice.invoice_number}.pdf"'
         return response
@@ -351,23 +374,18 @@ class InvoiceDriveUploadView(View):
                 else:
                     folder_id = folder_url  # 直接IDとして使用
 
-            pdf_buffer = generate_billing_pdf(invoice)
-            filename = f"請求書_{invoice.customer.name}_{invoice.issue_date}.pdf"
-            file_id = upload_to_drive(pdf_buffer, filename, folder_id=folder_id)
-
-            invoice.drive_file_id = file_id
-            invoice.save(update_fields=['drive_file_id'])
-
-            messages.success(request, 'Googleドライブに保存しました。')
+            # アップロードはワーカーで実行する（同じ内容・同じ保存先への二重登録は行わない）
+            enqueue(
+                'billing.application.services.tasks.upload_invoice_to_drive',
+                {'invoice_id': str(invoice.pk), 'folder_id': folder_id},
+                label="Googleドライブへの保存", target=invoice,
+                idempotency_key=_job_key('drive', invoice, invoice.updated_at.isoformat(), folder_id or ''),
+            )
+            messages.success(request, 'Googleドライブへの保存を受け付けました。処理状況は画面下部に表示されます。')
         except Exception as e:
             import traceback
             traceback.print_exc()
-            detail = str(e)
-            if hasattr(e, 'reason'):
-                detail = e.reason
-            if hasattr(e, 'content'):
-                detail = e.content.decode('utf-8', errors='replace')[:500]
-            messages.error(request, f'ドライブ保存に失敗しました: {detail}')
+            messages.error(request, f'ドライブ保存の受付に失敗しました: {e}')
 
         return redirect('billing:invoice_detail', pk=pk)
 
@@ -406,6 +424,7 @@ class InvoiceMailView(View):
             'cc_email': customer.cc_email,
             'subject': f'請求書をお送りします。',
             'body': body_text,
+            'submission_token': uuid.uuid4().hex,
         }
         form = InvoiceMailForm(initial=initial)
         return render(request, 'billing/invoice_mail.html', {
@@ -421,22 +440,21 @@ class InvoiceMailView(View):
             cc_list = parse_email_list(form.cleaned_data['cc_email'])
             subject = form.cleaned_data['subject']
             body = form.cleaned_data['body']
-
-            # PDF生成して添付
-            pdf_buffer = generate_billing_pdf(invoice)
-
-            success = send_invoice_email(
-                invoice, to_list, cc_list, subject, body, pdf_buffer
+            token = form.cleaned_data['submission_token'] or uuid.uuid4().hex
+
+            # PDFを添付した送信はワーカーで実行する（送信成功時に送付済へ更新）
+            # 同じ送信画面からの同じ宛先・内容の二重送信は行わない（画面を開き直した再送は送信する）
+            enqueue(
+                'billing.application.services.tasks.send_invoice_mail',
+                {
+                    'invoice_id': str(invoice.pk), 'to_list': to_list, 'cc_list': cc_list,
+                    'subject': subject, 'body': body,
+                },
+                label="請求書メール送信", target=invoice,
+                idempotency_key=_job_key('mail', invoice, token, *to_list, '|', *cc_list, '|', subject, body),
             )
-
-            if success:
-                if invoice.status in ('DRAFT', 'ISSUED'):
-                    invoice.status = 'SENT'
-                    invoice.save(update_fields=['status'])
-                messages.success(request, 'メールを送信しました。')
-                return redirect('billing:invoice_detail', pk=pk)
-            else:
-                messages.error(request, 'メール送信に失敗しました。')
+            messages.success(request, 'メール送信を受け付けました。処理状況は画面下部に表示されます。')
+            return redirect('billing:invoice_detail', pk=pk)
 
         return render(request, 'billing/invoice_mail.html', {
             'invoice': invoice, 'form': form,
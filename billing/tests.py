@@ -0,0 +1,91 @@
+"""
+billing のテスト
+
+python manage.py test --settings=EDI_MP.test_settings で実行する。
+"""
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from billing.domain.models import BillingCustomer, BillingInvoice, BillingItem, deferred_totals
+from core.management.commands.check_query_budget import FORMSET_QUERIES_PER_ITEM
+
+
+class BillingItemFormsetTests(TestCase):
+    """明細フォームセットの保存で、金額の再計算が明細数によらず1回であること"""
+
+    def setUp(self):
+        self.customer = BillingCustomer.objects.create(name='テスト請求先', email='c@example.com')
+        staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+
+    def _form_data(self, prices, initial=0):
+        data = {
+            'customer': self.customer.pk, 'issue_date': '2026-09-01', 'due_date': '2026-09-30',
+            'subject': 'テスト', 'notes': '', 'status': 'DRAFT',
+            'items-TOTAL_FORMS': len(prices), 'items-INITIAL_FORMS': initial,
+            'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+        }
+        for i, (price, tax_category) in enumerate(prices):
+            data.update({
+                f'items-{i}-unit_price': price, f'items-{i}-man_month': '1.00',
+                f'items-{i}-tax_category': tax_category, f'items-{i}-sort_order': i,
+            })
+        return data
+
+    def _create(self, prices):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('billing:invoice_create'), self._form_data(prices))
+        self.assertEqual(response.status_code, 302)
+        return BillingInvoice.objects.order_by('-created_at').first(), len(ctx.captured_queries)
+
+    def test_create_costs_one_query_per_item(self):
+        _invoice, one = self._create([(1000, '10')])
+        _invoice, ten = self._create([(1000, '10')] * 10)
+        self.assertLessEqual(ten - one, FORMSET_QUERIES_PER_ITEM * 9)
+
+    def test_create_stores_totals_and_tax_breakdown(self):
+        invoice, _queries = self._create([(100000, '10'), (50000, '8'), (30000, '0')])
+        self.assertEqual(invoice.subtotal_amount, 180000)
+        self.assertEqual(invoice.tax_amount, 10000 + 4000)
+        self.assertEqual(invoice.total_amount, 194000)
+        self.assertEqual(
+            {entry['tax_category']: entry['subtotal'] for entry in invoice.tax_breakdown},
+            {'10': 100000, '8': 50000, '0': 30000},
+        )
+
+    def test_update_recalculates_after_deleting_items(self):
+        invoice, _queries = self._create([(100000, '10'), (50000, '10')])
+        items = list(invoice.items.order_by('sort_order'))
+        data = self._form_data([(100000, '10'), (50000, '10')], initial=2)
+        for i, item in enumerate(items):
+            data[f'items-{i}-id'] = item.pk
+            data[f'items-{i}-invoice'] = invoice.pk
+        data['items-1-DELETE'] = 'on'
+        response = self.client.post(reverse('billing:invoice_update', args=[invoice.pk]), data)
+        self.assertEqual(response.status_code, 302)
+        invoice.refresh_from_db()
+        self.assertEqual((invoice.subtotal_amount, invoice.total_amount), (100000, 110000))
+
+
+class DeferredTotalsTests(TestCase):
+    """deferred_totals のブロック内では明細ごとに再計算しないこと"""
+
+    def test_recalculates_once_on_exit(self):
+        customer = BillingCustomer.objects.create(name='テスト請求先')
+        invoice = BillingInvoice.objects.create(customer=customer, subject='テスト', issue_date=datetime.date(2026, 9, 1))
+        with deferred_totals(invoice):
+            for i in range(5):
+                BillingItem.objects.create(invoice=invoice, product_name=f"明細{i}", unit_price=1000, tax_category='10')
+            self.assertEqual(BillingInvoice.objects.get(pk=invoice.pk).total_amount, 0)
+        self.assertEqual(BillingInvoice.objects.get(pk=invoice.pk).total_amount, 5500)
+
+    def test_item_saved_outside_block_updates_totals(self):
+        customer = BillingCustomer.objects.create(name='テスト請求先')
+        invoice = BillingInvoice.objects.create(customer=customer, subject='テスト', issue_date=datetime.date(2026, 9, 1))
+        BillingItem.objects.create(invoice=invoice, product_name='明細', unit_price=2000, tax_category='8')
+        self.assertEqual(BillingInvoice.objects.get(pk=invoice.pk).total_amount, 2160)
@@ -1,14 +1,15 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
-from .domain.models import Profile, Partner, Customer, CompanyInfo, BankMaster, SentEmailLog, MasterContractProgress, EmailTemplate
+from .domain.models import Profile, Partner, Customer, CompanyInfo, BankMaster, SentEmailLog, MasterContractProgress, EmailTemplate, DocumentSequence, BackgroundJob, DriveFolderCache
+from .services.search import SearchIndexAdminMixin
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'tel', 'email', 'registration_no', 'representative_name')
     search_fields = ('name', 'registration_no')
 
 @admin.register(Partner)
-class PartnerAdmin(admin.ModelAdmin):
+class PartnerAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
     list_display = ('partner_id', 'name', 'tel', 'email', 'registration_no')
     search_fields = ('name', 'email', 'registration_no')
     readonly_fields = ('partner_id',)
@@ -68,3 +69,31 @@ class EmailTemplateAdmin(admin.ModelAdmin):
         if obj:
             return self.readonly_fields
         return ('updated_at',)
+
+@admin.register(DocumentSequence)
+class DocumentSequenceAdmin(admin.ModelAdmin):
+    list_display = ('key', 'last_value', 'updated_at')
+    search_fields = ('key',)
+    readonly_fields = ('updated_at',)
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('label', 'task', 'status', 'attempts', 'max_attempts', 'run_at', 'target_model', 'target_id', 'updated_at')
+    list_filter = ('status', 'task')
+    search_fields = ('label', 'task', 'target_id', 'idempotency_key')
+    readonly_fields = ('attempts', 'locked_by', 'locked_at', 'finished_at', 'last_error', 'created_at', 'updated_at')
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        from .services.jobs import retry_job
+        count = 0
+        for job in queryset.exclude(status='RUNNING'):
+            retry_job(job)
+            count += 1
+        self.message_user(request, f"{count}件のジョブを再実行対象に戻しました。")
+    retry_jobs.short_description = "選択したジョブを再実行"
+
+@admin.register(DriveFolderCache)
+class DriveFolderCacheAdmin(admin.ModelAdmin):
+    list_display = ('name', 'parent_id', 'folder_id', 'updated_at')
+    search_fields = ('name', 'folder_id')
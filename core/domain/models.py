@@ -1,9 +1,13 @@
 
 # ドメイン層（エンティティ定義）
+import datetime
+import hashlib
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -66,15 +70,28 @@ class Partner(models.Model):
     account_number = models.CharField(_("口座番号"), max_length=20, blank=True)
     account_name = models.CharField(_("口座名義"), max_length=128, blank=True)
 
+    @classmethod
+    def allocate_ids(cls, count=1):
+        """パートナーID（10桁連番）を count 件まとめて確保する"""
+        from core.services.sequences import allocate, seed_from_last
+        # 数値のみのIDの最大値は、カウンタ行の初回作成時にだけ検索する
+        first = allocate(
+            'partner', count,
+            seed=seed_from_last(cls.objects.filter(partner_id__regex=r'^\d+$'), 'partner_id', 0),
+        )
+        return [str(n).zfill(10) for n in range(first, first + count)]
+
     def save(self, *args, **kwargs):
+        explicit = self._state.adding and bool(self.partner_id)
         if not self.partner_id:
-            last_partner = Partner.objects.filter(partner_id__regex=r'^\d+$').order_by('-partner_id').first()
-            if last_partner:
-                next_id = int(last_partner.partner_id) + 1
-            else:
-                next_id = 1
-            self.partner_id = str(next_id).zfill(10)
+            self.partner_id = self.allocate_ids()[0]
         super().save(*args, **kwargs)
+        if explicit:
+            # 手入力された数値のIDは、以降の採番で払い出さないようカウンタに反映する
+            from core.services.sequences import observe, sequence_number
+            number = sequence_number(self.partner_id)
+            if number is not None:
+                observe('partner', number)
 
     def __str__(self):
         return f"[{self.partner_id}] {self.name}"
@@ -161,6 +178,10 @@ class SentEmailLog(models.Model):
         verbose_name = _("メール送信ログ")
         verbose_name_plural = _("メール送信ログ")
         ordering = ['-sent_at']
+        indexes = [
+            # 送信メール履歴のキーセットページ送り
+            models.Index(fields=['partner', '-sent_at', '-id'], name='core_emaillog_partner_sent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.partner.name} - {self.subject} ({self.sent_at})"
@@ -182,6 +203,10 @@ class MasterContractProgress(models.Model):
     class Meta:
         verbose_name = _("基本契約進捗")
         verbose_name_plural = _("基本契約進捗")
+        indexes = [
+            # 基本契約進捗一覧のキーセットページ送り
+            models.Index(fields=['-updated_at', '-id'], name='core_progress_updated_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.partner.name}: {self.get_status_display()}"
@@ -201,3 +226,183 @@ class EmailTemplate(models.Model):
 
     def __str__(self):
         return f"{self.subject} ({self.code})"
+
+
+class DocumentSequence(models.Model):
+    """書類番号の採番カウンタ（接頭辞・期間ごとに1行）"""
+    key = models.CharField(_("採番キー"), max_length=64, unique=True, help_text=_("例: order:MP20260301, invoice:2603, project:PRJ, partner"))
+    last_value = models.BigIntegerField(_("最終番号"), default=0)
+    updated_at = models.DateTimeField(_("更新日時"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("採番カウンタ")
+        verbose_name_plural = _("採番カウンタ")
+
+    def __str__(self):
+        return f"{self.key}: {self.last_value}"
+
+
+class BackgroundJob(models.Model):
+    """バックグラウンドジョブ（Driveアップロード・メール送信・署名依頼などの外部連携）"""
+    STATUS_CHOICES = [
+        ('PENDING', _('待機中')),
+        ('RUNNING', _('実行中')),
+        ('SUCCEEDED', _('完了')),
+        ('FAILED', _('失敗')),
+    ]
+
+    task = models.CharField(_("タスク"), max_length=200, help_text=_("実行する関数のパス"))
+    label = models.CharField(_("処理名"), max_length=100, blank=True)
+    payload = models.JSONField(_("引数"), default=dict, blank=True)
+    status = models.CharField(_("ステータス"), max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(_("試行回数"), default=0)
+    max_attempts = models.PositiveIntegerField(_("最大試行回数"), default=5)
+    run_at = models.DateTimeField(_("実行予定日時"), default=timezone.now)
+    locked_by = models.CharField(_("実行ワーカー"), max_length=100, blank=True)
+    locked_at = models.DateTimeField(_("実行開始日時"), null=True, blank=True)
+    finished_at = models.DateTimeField(_("完了日時"), null=True, blank=True)
+    last_error = models.TextField(_("エラー内容"), blank=True)
+    idempotency_key = models.CharField(_("冪等キー"), max_length=200, unique=True, null=True, blank=True, help_text=_("同じキーのジョブは一度だけ登録される"))
+
+    # 処理対象の書類（画面にステータスを表示するため）
+    target_model = models.CharField(_("対象モデル"), max_length=100, blank=True)
+    target_id = models.CharField(_("対象ID"), max_length=64, blank=True)
+
+    created_at = models.DateTimeField(_("登録日時"), auto_now_add=True)
+    updated_at = models.DateTimeField(_("更新日時"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("バックグラウンドジョブ")
+        verbose_name_plural = _("バックグラウンドジョブ")
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='core_bgjob_status_run_at'),
+            models.Index(fields=['target_model', 'target_id'], name='core_bgjob_target'),
+        ]
+
+    def __str__(self):
+        return f"{self.label or self.task} ({self.get_status_display()})"
+
+
+class DriveFolderCache(models.Model):
+    """GoogleドライブのフォルダIDキャッシュ（親フォルダ内のフォルダ名 → フォルダID）"""
+    parent_id = models.CharField(_("親フォルダID"), max_length=200)
+    name = models.CharField(_("フォルダ名"), max_length=255)
+    folder_id = models.CharField(_("フォルダID"), max_length=200)
+    updated_at = models.DateTimeField(_("更新日時"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("DriveフォルダIDキャッシュ")
+        verbose_name_plural = _("DriveフォルダIDキャッシュ")
+        constraints = [
+            models.UniqueConstraint(fields=['parent_id', 'name'], name='core_drivefoldercache_parent_name'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.folder_id})"
+
+
+class SearchEntry(models.Model):
+    """横断検索の索引（書類・取引先ごとに1行。core/services/search.py で更新する）"""
+    target_model = models.CharField(_("対象モデル"), max_length=100)
+    target_id = models.CharField(_("対象ID"), max_length=64)
+    title = models.CharField(_("表示名"), max_length=255)
+    text = models.TextField(_("検索用テキスト"), help_text=_("NFKC正規化・かなの統一・空白除去済み"))
+    updated_at = models.DateTimeField(_("更新日時"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("検索索引")
+        verbose_name_plural = _("検索索引")
+        constraints = [
+            models.UniqueConstraint(fields=['target_model', 'target_id'], name='core_searchentry_target'),
+        ]
+
+    def __str__(self):
+        return f"{self.target_model}:{self.target_id} {self.title}"
+
+
+class DocumentRecord(models.Model):
+    """
+    発行済み書類の検索台帳（電子帳簿保存法の検索要件：取引年月日・取引金額・取引先）
+    書類の発行時に登録する（core/services/document_registry.py）
+    """
+    DOC_TYPE_CHOICES = [
+        ('order', _('注文書')),
+        ('acceptance', _('注文請書')),
+        ('invoice', _('請求書・支払通知書')),
+        ('billing_invoice', _('売上請求書')),
+    ]
+
+    doc_type = models.CharField(_("書類種別"), max_length=20, choices=DOC_TYPE_CHOICES)
+    document_no = models.CharField(_("書類番号"), max_length=64)
+    transaction_date = models.DateField(_("取引年月日"))
+    amount = models.BigIntegerField(_("取引金額"), help_text=_("書類に記載の金額（注文書・注文請書は税抜、請求書は税込）"))
+    counterparty_id = models.CharField(_("取引先ID"), max_length=64)
+    counterparty_name = models.CharField(_("取引先名"), max_length=255)
+    counterparty_key = models.CharField(_("取引先名（検索用）"), max_length=255, help_text=_("正規化し法人格を除いた取引先名"))
+    storage_key = models.CharField(_("保存先"), max_length=255, blank=True, help_text=_("原本PDFのストレージ上のパス"))
+    sha256 = models.CharField(_("ハッシュ値"), max_length=64, blank=True)
+    source_model = models.CharField(_("元のモデル"), max_length=100)
+    source_id = models.CharField(_("元のID"), max_length=64)
+    registered_at = models.DateTimeField(_("登録日時"), auto_now_add=True)
+    updated_at = models.DateTimeField(_("更新日時"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("書類台帳")
+        verbose_name_plural = _("書類台帳")
+        constraints = [
+            models.UniqueConstraint(fields=['doc_type', 'source_id'], name='core_docrecord_source'),
+        ]
+        indexes = [
+            # 取引年月日の範囲を起点に、金額・書類種別で絞り込む
+            models.Index(fields=['transaction_date', 'amount'], name='core_docrecord_date_amount'),
+            models.Index(fields=['amount', 'transaction_date'], name='core_docrecord_amount_date'),
+            models.Index(fields=['counterparty_key', 'transaction_date'], name='core_docrecord_party_date'),
+            models.Index(fields=['counterparty_id', 'transaction_date'], name='core_docrecord_partyid_date'),
+            models.Index(fields=['doc_type', 'transaction_date'], name='core_docrecord_type_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_doc_type_display()} {self.document_no} ({self.transaction_date})"
+
+
+class DocumentHashChain(models.Model):
+    """
+    書類原本のハッシュ値の追記専用の記録（ハッシュチェーン）
+    各行は前の行の chain_hash を含めてハッシュ化するため、途中の行を書き換える・削除すると以降がつながらなくなる。
+    書類台帳の登録時に追記する（DOCUMENT_HASH_CHAIN。core/services/document_verification.py）
+    """
+    GENESIS_HASH = '0' * 64
+
+    doc_type = models.CharField(_("書類種別"), max_length=20, choices=DocumentRecord.DOC_TYPE_CHOICES)
+    source_id = models.CharField(_("元のID"), max_length=64)
+    document_no = models.CharField(_("書類番号"), max_length=64)
+    storage_key = models.CharField(_("保存先"), max_length=255)
+    sha256 = models.CharField(_("ハッシュ値"), max_length=64)
+    recorded_at = models.DateTimeField(_("記録日時"))
+    # 1つの行につながる次の行は1つだけ（同時に追記した場合は後の追記が失敗し、やり直す）
+    previous_hash = models.CharField(_("前の行のハッシュ値"), max_length=64, unique=True)
+    chain_hash = models.CharField(_("チェーンのハッシュ値"), max_length=64)
+
+    class Meta:
+        verbose_name = _("書類ハッシュチェーン")
+        verbose_name_plural = _("書類ハッシュチェーン")
+
+    def __str__(self):
+        return f"#{self.pk} {self.get_doc_type_display()} {self.document_no}"
+
+    def compute_chain_hash(self):
+        recorded_at = self.recorded_at.astimezone(datetime.timezone.utc).isoformat()
+        payload = '|'.join([
+            self.previous_hash, self.doc_type, self.source_id, self.document_no,
+            self.storage_key, self.sha256, recorded_at,
+        ])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("書類ハッシュチェーンの行は変更できません。")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("書類ハッシュチェーンの行は削除できません。")
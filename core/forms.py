@@ -123,8 +123,9 @@ class QuickPartnerRegistrationForm(forms.Form):
         from django.core.mail import send_mail
         from django.template import Template, Context
         from .domain.models import CompanyInfo, SentEmailLog, EmailTemplate
+        from .services.company import get_company_info
         
-        company = CompanyInfo.objects.first()
+        company = get_company_info()
         if not company:
             company = CompanyInfo()
             
@@ -202,3 +203,28 @@ TEL: {{ company_tel }}
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f"Failed to send invitation email: {e}")
+
+
+class DocumentSearchForm(forms.Form):
+    """書類台帳の検索条件（電子帳簿保存法の検索要件: 取引年月日・取引金額の範囲、取引先）"""
+    date_from = forms.DateField(required=False, label="取引年月日（から）", widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, label="取引年月日（まで）", widget=forms.DateInput(attrs={'type': 'date'}))
+    amount_min = forms.IntegerField(required=False, min_value=0, label="取引金額（以上）")
+    amount_max = forms.IntegerField(required=False, min_value=0, label="取引金額（以下）")
+    counterparty = forms.CharField(required=False, max_length=128, label="取引先", help_text="前方一致。法人格・全角半角の違いは無視します。")
+    doc_type = forms.MultipleChoiceField(required=False, label="書類種別", widget=forms.CheckboxSelectMultiple)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        from .domain.models import DocumentRecord
+        self.fields['doc_type'].choices = DocumentRecord.DOC_TYPE_CHOICES
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("取引年月日の範囲が正しくありません。")
+        amount_min, amount_max = cleaned_data.get('amount_min'), cleaned_data.get('amount_max')
+        if amount_min is not None and amount_max is not None and amount_min > amount_max:
+            raise forms.ValidationError("取引金額の範囲が正しくありません。")
+        return cleaned_data
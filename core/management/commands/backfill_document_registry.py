@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.services.document_registry import BATCH_SIZE, DOCUMENT_TYPES, backfill
+
+
+class Command(BaseCommand):
+    help = '発行済みの書類を書類台帳に登録する（導入時・台帳の項目を変更した後など）。登録済みの行は内容が変わった場合のみ更新する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doc-type', action='append', choices=sorted(DOCUMENT_TYPES), help='対象の書類種別（複数指定可。省略時はすべて）')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='1回に登録する件数')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size は1以上を指定してください。")
+        counts = backfill(options['doc_type'], options['batch_size'], stdout=self.stdout)
+        written = sum(written for _total, written in counts.values())
+        self.stdout.write(self.style.SUCCESS(f"{written}件を台帳に登録・更新しました。"))
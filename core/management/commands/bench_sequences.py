@@ -0,0 +1,76 @@
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from core.domain.models import DocumentSequence
+from core.services.sequences import allocate
+
+
+def _allocate_many(key, iterations, block):
+    """同一キーから iterations 回採番し、払い出された番号をすべて返す"""
+    values = []
+    try:
+        for _ in range(iterations):
+            first = allocate(key, block)
+            values.extend(range(first, first + block))
+    finally:
+        connections.close_all()
+    return values
+
+
+def _process_worker(key, threads, iterations, block):
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(_allocate_many, key, iterations, block) for _ in range(threads)]
+        return [v for f in futures for v in f.result()]
+
+
+class Command(BaseCommand):
+    help = '採番カウンタを複数スレッド・複数プロセスから同時に使用し、重複がないことを検証する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='プロセス数')
+        parser.add_argument('--threads', type=int, default=8, help='プロセスあたりのスレッド数')
+        parser.add_argument('--iterations', type=int, default=50, help='スレッドあたりの採番回数')
+        parser.add_argument('--block', type=int, default=1, help='1回あたりの確保件数（一括確保の検証用）')
+
+    def handle(self, *args, **options):
+        key = f"bench:{uuid.uuid4().hex[:12]}"
+        processes = options['processes']
+        threads = options['threads']
+        iterations = options['iterations']
+        block = options['block']
+        expected = processes * threads * iterations * block
+
+        self.stdout.write(
+            f"{processes}プロセス × {threads}スレッド × {iterations}回 (ブロック{block}件) で採番します..."
+        )
+
+        connections.close_all()
+        started = time.perf_counter()
+        try:
+            with multiprocessing.Pool(processes) as pool:
+                results = pool.starmap(
+                    _process_worker, [(key, threads, iterations, block)] * processes
+                )
+            elapsed = time.perf_counter() - started
+            values = [v for chunk in results for v in chunk]
+        finally:
+            DocumentSequence.objects.filter(key=key).delete()
+
+        duplicates = len(values) - len(set(values))
+        missing = set(range(1, expected + 1)) - set(values)
+        calls = processes * threads * iterations
+
+        self.stdout.write(f"払い出し件数: {len(values)} / 期待値: {expected}")
+        self.stdout.write(f"重複: {duplicates}件 / 欠番: {len(missing)}件")
+        self.stdout.write(f"所要時間: {elapsed:.2f}秒 / {calls / elapsed:.0f}回/秒")
+
+        if duplicates or missing or len(values) != expected:
+            raise CommandError("採番結果に重複または欠番があります。")
+        self.stdout.write(self.style.SUCCESS("重複・欠番なし"))
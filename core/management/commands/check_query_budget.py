@@ -0,0 +1,184 @@
+import datetime
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from billing.domain.models import BillingCustomer, BillingInvoice
+from core.domain.models import Customer, Partner, Profile
+from core.services.status_counts import invalidate_status_counts
+from invoices.models import Invoice
+from orders.models import Order, Project
+
+# (URL名, ログインユーザー, 許容クエリ数)
+# クエリ数にはセッション・ユーザー・プロフィールの取得、
+# ステータス別集計（キャッシュ未作成の初回表示時）も含む
+QUERY_BUDGETS = [
+    ('core:dashboard', 'staff', 8),
+    ('core:dashboard', 'partner', 9),
+    ('orders:order_list', 'staff', 3),
+    ('orders:order_list', 'partner', 5),
+    ('invoices:invoice_list', 'staff', 3),
+    ('invoices:invoice_list', 'partner', 5),
+    ('billing:dashboard', 'staff', 4),
+    ('billing:invoice_list', 'staff', 3),
+]
+
+# 請求書の明細フォームセットの保存で、明細1件あたりに許容するクエリ数（明細の INSERT のみ。
+# 金額の再計算は明細数によらず1回）
+FORMSET_ITEM_COUNTS = (1, 10)
+FORMSET_QUERIES_PER_ITEM = 1
+
+ORDER_STATUSES = ['UNCONFIRMED', 'RECEIVED', 'APPROVED', 'DRAFT']
+INVOICE_STATUSES = ['ISSUED', 'SENT', 'CONFIRMED']
+BILLING_STATUSES = ['DRAFT', 'ISSUED', 'SENT', 'PAID']
+
+
+class RollbackSeed(Exception):
+    """計測用データを破棄するためにトランザクションを巻き戻す"""
+
+
+class Command(BaseCommand):
+    help = (
+        '一覧・ダッシュボード画面のクエリ数がデータ件数に依存せず上限内に収まることと、'
+        '請求書の明細の保存で明細1件あたりのクエリ数が上限内であることを検証する'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='10,1000', help='投入する件数（カンマ区切りで複数指定可）')
+
+    def handle(self, *args, **options):
+        sizes = [int(n) for n in options['rows'].split(',')]
+        results = {}
+        for size in sizes:
+            try:
+                with transaction.atomic():
+                    users = self._seed(size)
+                    results[size] = self._measure(users)
+                    formset_counts = self._measure_formset(users['staff'])
+                    raise RollbackSeed
+            except RollbackSeed:
+                pass
+
+        errors = []
+        header = "画面".ljust(32) + "".join(f"{size:>8}件" for size in sizes) + "    上限"
+        self.stdout.write(header)
+        for url_name, role, budget in QUERY_BUDGETS:
+            counts = [results[size][(url_name, role)] for size in sizes]
+            self.stdout.write(
+                f"{url_name} ({role})".ljust(32)
+                + "".join(f"{count:>9}" for count in counts)
+                + f"{budget:>8}"
+            )
+            if max(counts) > budget:
+                errors.append(f"{url_name} ({role}): {max(counts)}クエリ（上限 {budget}）")
+            if len(set(counts)) > 1:
+                errors.append(f"{url_name} ({role}): 件数によってクエリ数が変化しています {counts}")
+
+        low, high = FORMSET_ITEM_COUNTS
+        per_item = (formset_counts[high] - formset_counts[low]) / (high - low)
+        self.stdout.write(
+            "billing:invoice_create (POST)".ljust(32)
+            + "".join(f"{formset_counts[n]:>8}q" for n in FORMSET_ITEM_COUNTS)
+            + f"    明細{low}件→{high}件（明細1件あたり {per_item:.1f}クエリ、上限 {FORMSET_QUERIES_PER_ITEM}）"
+        )
+        if per_item > FORMSET_QUERIES_PER_ITEM:
+            errors.append(
+                f"billing:invoice_create (POST): 明細1件あたり {per_item:.1f}クエリ（上限 {FORMSET_QUERIES_PER_ITEM}）"
+            )
+
+        if errors:
+            for error in errors:
+                self.stdout.write(self.style.ERROR(error))
+            raise CommandError("クエリ数の上限を超えた画面があります。")
+        self.stdout.write(self.style.SUCCESS("すべての画面がクエリ数の上限内です。"))
+
+    def _measure(self, users):
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'testserver')
+        counts = {}
+        for url_name, role, _budget in QUERY_BUDGETS:
+            client = Client(HTTP_HOST=host)
+            client.force_login(users[role])
+            url = reverse(url_name)
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url, secure=settings.SECURE_SSL_REDIRECT)
+            if response.status_code != 200:
+                raise CommandError(f"{url_name} ({role}): ステータス {response.status_code}")
+            counts[(url_name, role)] = len(ctx.captured_queries)
+        return counts
+
+    def _measure_formset(self, staff):
+        """明細の件数を変えて請求書の作成画面から保存し、件数ごとのクエリ数を返す"""
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'testserver')
+        client = Client(HTTP_HOST=host)
+        client.force_login(staff)
+        customer = BillingCustomer.objects.create(name='計測用請求先（明細）')
+        url = reverse('billing:invoice_create')
+        counts = {}
+        for item_count in FORMSET_ITEM_COUNTS:
+            data = {
+                'customer': customer.pk, 'issue_date': datetime.date.today().isoformat(),
+                'subject': f"計測用明細{item_count}件", 'status': 'DRAFT',
+                'items-TOTAL_FORMS': item_count, 'items-INITIAL_FORMS': 0,
+                'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+            }
+            for i in range(item_count):
+                data.update({
+                    f'items-{i}-unit_price': 1000, f'items-{i}-man_month': '1.00',
+                    f'items-{i}-tax_category': '10', f'items-{i}-sort_order': i,
+                })
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.post(url, data, secure=settings.SECURE_SSL_REDIRECT)
+            if response.status_code != 302:
+                raise CommandError(f"billing:invoice_create (POST): ステータス {response.status_code}")
+            counts[item_count] = len(ctx.captured_queries)
+        return counts
+
+    def _seed(self, size):
+        """計測用のデータを size 件ずつ投入する（呼び出し側で巻き戻す）"""
+        today = datetime.date.today()
+        month = today.replace(day=1)
+        customer = Customer.objects.create(name='計測用顧客')
+        partners = Partner.objects.bulk_create([
+            Partner(partner_id=f"QB{i:08d}", name=f"計測用パートナー{i}", email=f"qb{i}@example.com")
+            for i in range(max(1, size // 10))
+        ])
+        project = Project.objects.create(customer=customer, name='計測用プロジェクト')
+
+        orders = Order.objects.bulk_create([
+            Order(
+                order_id=f"QB{i:010d}", partner=partners[i % len(partners)], project=project,
+                status=ORDER_STATUSES[i % len(ORDER_STATUSES)],
+                order_end_ym=month, work_start=month, work_end=today,
+            )
+            for i in range(size)
+        ])
+        Invoice.objects.bulk_create([
+            Invoice(
+                order=order, invoice_no=f"QB{i:08d}", target_month=month,
+                status=INVOICE_STATUSES[i % len(INVOICE_STATUSES)],
+            )
+            for i, order in enumerate(orders)
+        ])
+
+        billing_customers = BillingCustomer.objects.bulk_create([
+            BillingCustomer(name=f"計測用請求先{i}") for i in range(max(1, size // 10))
+        ])
+        BillingInvoice.objects.bulk_create([
+            BillingInvoice(
+                customer=billing_customers[i % len(billing_customers)], subject=f"計測用請求{i}",
+                status=BILLING_STATUSES[i % len(BILLING_STATUSES)],
+            )
+            for i in range(size)
+        ])
+
+        # bulk_create はシグナルを送らないため、集計キャッシュを明示的に破棄する
+        for label in ('orders.Order', 'invoices.Invoice', 'billing.BillingInvoice'):
+            invalidate_status_counts(label)
+
+        staff = User.objects.create_user('query_budget_staff', is_staff=True)
+        partner_user = User.objects.create_user('query_budget_partner')
+        Profile.objects.create(user=partner_user, partner=partners[0], is_first_login=False)
+        return {'staff': staff, 'partner': partner_user}
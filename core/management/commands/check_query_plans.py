@@ -0,0 +1,222 @@
+import datetime
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from billing.domain.models import BillingCustomer, BillingInvoice
+from billing.presentation.views import InvoiceListView as BillingInvoiceListView
+from core.domain.models import Customer, DocumentRecord, Partner, SentEmailLog
+from core.services.document_registry import counterparty_key, find_documents
+from core.views import DASHBOARD_LIST_LIMIT, DocumentRegistryView, PartnerEmailLogView
+from invoices.models import Invoice
+from invoices.views import PartnerInvoiceListView
+from orders.models import Order, Project
+from orders.views import OrderListView
+
+# 運用中と同じく、大半の書類は完了したステータス（承認済・支払済）にする
+ORDER_STATUSES = ['UNCONFIRMED', 'RECEIVED', 'DRAFT'] + ['APPROVED'] * 7
+INVOICE_STATUSES = ['ISSUED', 'SENT', 'CONFIRMED'] + ['PAID'] * 7
+BILLING_STATUSES = ['DRAFT', 'ISSUED', 'SENT'] + ['PAID'] * 7
+
+# (名前, 投入データ → クエリセット)
+# 画面・処理で実際に発行する絞り込み・並び順と同じ形にする
+HOT_QUERIES = [
+    ('ダッシュボード 未確認注文（スタッフ）', lambda s: (
+        Order.objects.filter(status='UNCONFIRMED').select_related('partner', 'project')
+        .order_by('-order_date')[:DASHBOARD_LIST_LIMIT]
+    )),
+    ('ダッシュボード 受領済注文（パートナー）', lambda s: (
+        Order.objects.filter(partner_id=s['partner'].pk, status__in=['RECEIVED', 'APPROVED'])
+        .select_related('partner', 'project').order_by('-order_date')[:DASHBOARD_LIST_LIMIT]
+    )),
+    ('ダッシュボード 確認待ち請求書（スタッフ）', lambda s: (
+        Invoice.objects.filter(status__in=['ISSUED', 'SENT']).select_related('order__partner', 'order__project')
+        .order_by('-issue_date')[:DASHBOARD_LIST_LIMIT]
+    )),
+    ('ダッシュボード 確認待ち請求書（パートナー）', lambda s: (
+        Invoice.objects.filter(order__partner_id=s['partner'].pk, status__in=['ISSUED', 'SENT'])
+        .select_related('order__partner', 'order__project').order_by('-issue_date')[:DASHBOARD_LIST_LIMIT]
+    )),
+    ('注文書一覧（パートナー）', lambda s: (
+        Order.objects.filter(partner=s['partner']).exclude(status='DRAFT').select_related('partner', 'project')
+        .order_by(*OrderListView.keyset_ordering)[:OrderListView.paginate_by + 1]
+    )),
+    ('請求書一覧（パートナー）', lambda s: (
+        Invoice.objects.filter(order__partner=s['partner']).select_related('order__partner', 'order__project')
+        .order_by(*PartnerInvoiceListView.keyset_ordering)[:PartnerInvoiceListView.paginate_by + 1]
+    )),
+    ('電子署名 Webhook', lambda s: (
+        Order.objects.filter(external_signature_id=s['signature_id'])[:1]
+    )),
+    ('未確認注文の通知', lambda s: (
+        Order.objects.filter(status='UNCONFIRMED').select_related('partner', 'project').order_by('partner_id', 'order_id')
+    )),
+    ('売上請求書一覧 ステータス絞り込み', lambda s: (
+        BillingInvoice.objects.filter(status='SENT').select_related('customer')
+        .order_by(*BillingInvoiceListView.keyset_ordering)[:BillingInvoiceListView.paginate_by + 1]
+    )),
+    ('売上請求書 期日超過', lambda s: (
+        BillingInvoice.objects.filter(status__in=['ISSUED', 'SENT'], due_date__lt=s['today']).order_by('due_date')
+    )),
+    ('売上請求書 請求先別', lambda s: (
+        BillingInvoice.objects.filter(customer=s['billing_customer']).order_by('-issue_date', '-created_at')
+    )),
+    ('送信メール履歴', lambda s: (
+        SentEmailLog.objects.filter(partner=s['partner'])
+        .order_by(*PartnerEmailLogView.keyset_ordering)[:PartnerEmailLogView.paginate_by + 1]
+    )),
+    ('書類台帳 取引年月日の範囲', lambda s: (
+        find_documents(date_from=s['today'] - datetime.timedelta(days=30), date_to=s['today'])
+        [:DocumentRegistryView.paginate_by + 1]
+    )),
+    ('書類台帳 取引金額の範囲', lambda s: (
+        find_documents(amount_min=100000, amount_max=110000)[:DocumentRegistryView.paginate_by + 1]
+    )),
+    ('書類台帳 取引先', lambda s: (
+        find_documents(counterparty='計測用取引先12')[:DocumentRegistryView.paginate_by + 1]
+    )),
+    ('書類台帳 取引先・取引年月日の範囲', lambda s: (
+        find_documents(counterparty='計測用取引先12', date_from=s['today'] - datetime.timedelta(days=365))
+    )),
+]
+
+# 実行計画のうちテーブル全体を走査する行
+#   SQLite    : "SCAN orders_order" / "SCAN orders_order USING INDEX ..."（索引の全件を順に読む）
+#   PostgreSQL: "Seq Scan on orders_order"
+# 件数を限定したクエリ（LIMIT）が並び順のインデックスを順に読むのは、先頭の数件で止まるため走査とみなさない
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)(?: AS \w+)?(?P<index> USING (?:COVERING )?INDEX \w+)?\s*$'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+
+def full_scans(plan, pattern, limited):
+    """実行計画からテーブル全体を走査しているテーブル名を返す"""
+    scanned = set()
+    for line in plan.splitlines():
+        match = pattern.search(line)
+        if match and not (limited and match.groupdict().get('index')):
+            scanned.add(match.group(1))
+    return sorted(scanned)
+
+
+class RollbackSeed(Exception):
+    """計測用データを破棄するためにトランザクションを巻き戻す"""
+
+
+class Command(BaseCommand):
+    help = '一覧・ダッシュボード・Webhook でよく使う絞り込みの実行計画を取得し、テーブル全体の走査になっていないことを検証する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='投入する注文・請求書の件数')
+
+    def handle(self, *args, **options):
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"{connection.vendor} の実行計画には対応していません。")
+
+        try:
+            with transaction.atomic():
+                seed = self._seed(options['rows'])
+                self._analyze()
+                plans = []
+                for name, build in HOT_QUERIES:
+                    queryset = build(seed)
+                    plans.append((name, str(queryset.explain()), queryset.query.high_mark is not None))
+                raise RollbackSeed
+        except RollbackSeed:
+            pass
+
+        errors = []
+        for name, plan, limited in plans:
+            scanned = full_scans(plan, pattern, limited)
+            if scanned:
+                errors.append(f"{name}: テーブル全体を走査しています（{', '.join(scanned)}）")
+                self.stdout.write(self.style.ERROR(f"NG  {name}"))
+            else:
+                self.stdout.write(f"OK  {name}")
+            if scanned or options['verbosity'] >= 2:
+                for line in plan.splitlines():
+                    self.stdout.write(f"      {line}")
+
+        if errors:
+            for error in errors:
+                self.stdout.write(self.style.ERROR(error))
+            raise CommandError("インデックスを使えないクエリがあります。")
+        self.stdout.write(self.style.SUCCESS("すべてのクエリがインデックスを使用しています。"))
+
+    def _analyze(self):
+        """統計情報を更新し、投入したデータに基づく実行計画にする"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            if connection.vendor == 'postgresql':
+                # 投入件数が少ないとテーブル全体の走査の方が安くなるため、走査を避けられるか
+                # （使えるインデックスがあるか）を検証する。SET LOCAL はトランザクションの終了で戻る
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def _seed(self, size):
+        """計測用のデータを size 件ずつ投入する（呼び出し側で巻き戻す）"""
+        today = datetime.date.today()
+        customer = Customer.objects.create(name='計測用顧客')
+        partners = Partner.objects.bulk_create([
+            Partner(partner_id=f"QP{i:08d}", name=f"計測用パートナー{i}", email=f"qp{i}@example.com")
+            for i in range(max(1, size // 50))
+        ])
+        projects = Project.objects.bulk_create([
+            Project(project_id=f"QP{i:08d}", customer=customer, name=f"計測用プロジェクト{i}")
+            for i in range(max(1, size // 50))
+        ])
+
+        orders = []
+        for i in range(size):
+            order_date = today - datetime.timedelta(days=i // 20)
+            orders.append(Order(
+                order_id=f"QP{i:010d}", partner=partners[i % len(partners)], project=projects[i % len(projects)],
+                status=ORDER_STATUSES[i % len(ORDER_STATUSES)],
+                order_end_ym=order_date.replace(day=1), order_date=order_date,
+                work_start=order_date, work_end=order_date,
+                # 署名依頼済みの注文は一部のみ
+                external_signature_id=f"sig-{i}" if i % 10 == 0 else None,
+            ))
+        Order.objects.bulk_create(orders, batch_size=1000)
+        Invoice.objects.bulk_create([
+            Invoice(
+                order=order, invoice_no=f"QP{i:08d}", target_month=order.order_end_ym,
+                issue_date=order.order_date, status=INVOICE_STATUSES[i % len(INVOICE_STATUSES)],
+            )
+            for i, order in enumerate(orders)
+        ], batch_size=1000)
+
+        billing_customers = BillingCustomer.objects.bulk_create([
+            BillingCustomer(name=f"計測用請求先{i}") for i in range(max(1, size // 50))
+        ])
+        BillingInvoice.objects.bulk_create([
+            BillingInvoice(
+                customer=billing_customers[i % len(billing_customers)], subject=f"計測用請求{i}",
+                status=BILLING_STATUSES[i % len(BILLING_STATUSES)],
+                issue_date=today - datetime.timedelta(days=i // 20),
+                due_date=today - datetime.timedelta(days=i // 20 - 30),
+            )
+            for i in range(size)
+        ], batch_size=1000)
+
+        SentEmailLog.objects.bulk_create([
+            SentEmailLog(partner=partners[i % len(partners)], subject=f"計測用メール{i}", body='')
+            for i in range(size)
+        ], batch_size=1000)
+
+        DocumentRecord.objects.bulk_create([
+            DocumentRecord(
+                doc_type='invoice', document_no=f"QP{i:08d}", source_model='invoices.Invoice', source_id=f"QP{i:08d}",
+                transaction_date=today - datetime.timedelta(days=i // 20), amount=(i * 7919) % 1000000,
+                counterparty_id=f"QP{i % 100:08d}", counterparty_name=f"株式会社計測用取引先{i % 100}",
+                counterparty_key=counterparty_key(f"株式会社計測用取引先{i % 100}"),
+            )
+            for i in range(size)
+        ], batch_size=1000)
+
+        return {
+            'today': today,
+            'partner': partners[0],
+            'billing_customer': billing_customers[0],
+            'signature_id': 'sig-10',
+        }
@@ -0,0 +1,69 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.services.batch_render import DOCUMENT_KINDS
+from core.services.document_export import iter_merged_pdf, iter_zip, parse_month, select_documents
+
+
+class Command(BaseCommand):
+    help = '対象月・パートナーの書類PDFを1つのPDFまたはZIPにまとめて出力する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', nargs='+', choices=sorted(DOCUMENT_KINDS), help='書類種別（zip は複数指定可）')
+        parser.add_argument('--month', help='対象年月 (YYYY-MM)。注文は注文終了年月、請求は対象年月で絞り込む')
+        parser.add_argument('--partner', help='パートナーID')
+        parser.add_argument('--status', help='ステータス（カンマ区切りで複数指定可）')
+        parser.add_argument('--format', choices=['pdf', 'zip'], default='pdf', help='出力形式（pdf: 1つのPDFに結合 / zip）')
+        parser.add_argument('--output', '-o', help='出力先ファイル（省略時は <種別>_<年月>.<形式>）')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='ワーカープロセス数（1で直列実行）')
+
+    def handle(self, *args, **options):
+        kinds = options['kind']
+        fmt = options['format']
+        if fmt == 'pdf' and len(kinds) > 1:
+            raise CommandError("PDFの結合は1種類の書類のみ指定できます。複数の場合は --format zip を指定してください。")
+
+        month = None
+        if options['month']:
+            try:
+                month = parse_month(options['month'])
+            except ValueError:
+                raise CommandError("--month は YYYY-MM 形式で指定してください。")
+        statuses = [s.strip() for s in options['status'].split(',')] if options['status'] else None
+
+        targets = []
+        for kind in kinds:
+            pks = list(select_documents(kind, month, options['partner'], statuses).values_list('pk', flat=True))
+            if pks:
+                targets.append((kind, pks))
+        count = sum(len(pks) for _kind, pks in targets)
+        if not count:
+            self.stdout.write(self.style.WARNING("対象の書類がありません。"))
+            return
+
+        output = options['output'] or f"{'_'.join(kinds)}_{options['month'] or 'all'}.{fmt}"
+        self.stdout.write(f"{count}件の書類を{options['workers']}プロセスで描画し、{output} に出力します...")
+
+        started = time.perf_counter()
+        failures = []
+        if fmt == 'zip':
+            chunks = iter_zip(targets, workers=options['workers'], failures=failures)
+        else:
+            kind, pks = targets[0]
+            chunks = iter_merged_pdf(kind, pks, workers=options['workers'], failures=failures)
+        size = 0
+        with open(output, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        elapsed = time.perf_counter() - started
+
+        for name, error in failures:
+            self.stdout.write(self.style.ERROR(f"Failed: {name}: {error}"))
+        self.stdout.write(
+            f"出力: {count - len(failures)}件 / 失敗: {len(failures)}件 / {size / 1024:.0f}KB / "
+            f"{elapsed:.2f}秒（{count / elapsed if elapsed else 0:.1f}件/秒）"
+        )
+        if failures:
+            raise CommandError(f"{len(failures)}件の書類を出力できませんでした。")
+        self.stdout.write(self.style.SUCCESS(f"Successfully exported {count} documents to {output}."))
@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.services.search import (
+    REBUILD_BATCH_SIZE, SEARCH_SOURCES, ensure_search_backend, rebuild_search_index, search,
+)
+
+
+class Command(BaseCommand):
+    help = '横断検索の索引を作り直す（導入時・一括取込の後など）。--query で検索結果と時間を確認できる'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', choices=sorted(SEARCH_SOURCES), help='対象のモデル（複数指定可。省略時はすべて）')
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE, help='1回に更新する件数')
+        parser.add_argument('--query', help='作り直さずに、この語で検索した結果を表示する')
+
+    def handle(self, *args, **options):
+        if options['query']:
+            started = time.perf_counter()
+            entries = search(options['query'], options['model'])
+            elapsed = time.perf_counter() - started
+            for entry in entries:
+                self.stdout.write(f"{entry.target_model:<24} {entry.target_id:<16} {entry.title}")
+            self.stdout.write(f"{len(entries)}件（{elapsed * 1000:.1f}ms）")
+            return
+
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size は1以上を指定してください。")
+        # SQLite でテーブルを作り直すマイグレーションの後はトリガーが失われるため、先に作成し直す
+        backend = ensure_search_backend()
+        self.stdout.write(f"検索方式: {backend}")
+        counts = rebuild_search_index(options['model'], options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"{sum(counts.values())}件の索引を更新しました。"))
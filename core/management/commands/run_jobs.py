@@ -0,0 +1,43 @@
+import signal
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core.services.jobs import release_stale_jobs, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'バックグラウンドジョブ（Driveアップロード・メール送信・署名依頼）を実行するワーカー'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='待機中のジョブを一度だけ処理して終了する')
+        parser.add_argument('--batch', type=int, default=10, help='1回に取得するジョブの件数')
+        parser.add_argument('--sleep', type=float, default=5.0, help='ジョブがないときの待機秒数')
+        parser.add_argument('--worker-id', default=None, help='ワーカー識別子（省略時はホスト名:PID）')
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        released = release_stale_jobs()
+        if released:
+            self.stdout.write(self.style.WARNING(f"実行中のまま停止していたジョブ {released}件 を再実行対象に戻しました。"))
+
+        total = 0
+        while not self._stopping:
+            close_old_connections()
+            executed = run_pending_jobs(worker_id=options['worker_id'], limit=options['batch'])
+            total += executed
+            if options['once']:
+                if executed < options['batch']:
+                    break
+                continue
+            if not executed:
+                time.sleep(options['sleep'])
+                release_stale_jobs()
+
+        self.stdout.write(self.style.SUCCESS(f"{total}件のジョブを実行しました。"))
+
+    def _stop(self, signum, frame):
+        # 実行中のジョブを終えてから停止する
+        self._stopping = True
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_remaining_fixes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='例: order:MP20260301, invoice:2603, project:PRJ, partner', max_length=64, unique=True, verbose_name='採番キー')),
+                ('last_value', models.BigIntegerField(default=0, verbose_name='最終番号')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': '採番カウンタ',
+                'verbose_name_plural': '採番カウンタ',
+            },
+        ),
+    ]
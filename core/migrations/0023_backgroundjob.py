@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:07
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_documentsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(help_text='実行する関数のパス', max_length=200, verbose_name='タスク')),
+                ('label', models.CharField(blank=True, max_length=100, verbose_name='処理名')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='引数')),
+                ('status', models.CharField(choices=[('PENDING', '待機中'), ('RUNNING', '実行中'), ('SUCCEEDED', '完了'), ('FAILED', '失敗')], default='PENDING', max_length=10, verbose_name='ステータス')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='試行回数')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='最大試行回数')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='実行予定日時')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='実行ワーカー')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='実行開始日時')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完了日時')),
+                ('last_error', models.TextField(blank=True, verbose_name='エラー内容')),
+                ('idempotency_key', models.CharField(blank=True, help_text='同じキーのジョブは一度だけ登録される', max_length=200, null=True, unique=True, verbose_name='冪等キー')),
+                ('target_model', models.CharField(blank=True, max_length=100, verbose_name='対象モデル')),
+                ('target_id', models.CharField(blank=True, max_length=64, verbose_name='対象ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='登録日時')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': 'バックグラウンドジョブ',
+                'verbose_name_plural': 'バックグラウンドジョブ',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_at'], name='core_bgjob_status_run_at'), models.Index(fields=['target_model', 'target_id'], name='core_bgjob_target')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriveFolderCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parent_id', models.CharField(max_length=200, verbose_name='親フォルダID')),
+                ('name', models.CharField(max_length=255, verbose_name='フォルダ名')),
+                ('folder_id', models.CharField(max_length=200, verbose_name='フォルダID')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': 'DriveフォルダIDキャッシュ',
+                'verbose_name_plural': 'DriveフォルダIDキャッシュ',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='drivefoldercache',
+            constraint=models.UniqueConstraint(fields=('parent_id', 'name'), name='core_drivefoldercache_parent_name'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_drivefoldercache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mastercontractprogress',
+            index=models.Index(fields=['-updated_at', '-id'], name='core_progress_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sentemaillog',
+            index=models.Index(fields=['partner', '-sent_at', '-id'], name='core_emaillog_partner_sent_idx'),
+        ),
+    ]
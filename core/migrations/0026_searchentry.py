@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:45
+
+from django.db import migrations, models
+
+
+def create_search_backend(apps, schema_editor):
+    from core.services.search import ensure_search_backend
+    ensure_search_backend(schema_editor.connection)
+
+
+def drop_search_backend(apps, schema_editor):
+    from core.services.search import drop_search_backend
+    drop_search_backend(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_model', models.CharField(max_length=100, verbose_name='対象モデル')),
+                ('target_id', models.CharField(max_length=64, verbose_name='対象ID')),
+                ('title', models.CharField(max_length=255, verbose_name='表示名')),
+                ('text', models.TextField(help_text='NFKC正規化・かなの統一・空白除去済み', verbose_name='検索用テキスト')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': '検索索引',
+                'verbose_name_plural': '検索索引',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('target_model', 'target_id'), name='core_searchentry_target'),
+        ),
+        # SQLite: FTS5 の仮想テーブルと同期用トリガー / PostgreSQL: pg_trgm の GIN インデックス
+        # 既存データの索引は manage.py rebuild_search_index で作成する
+        migrations.RunPython(create_search_backend, drop_search_backend),
+    ]
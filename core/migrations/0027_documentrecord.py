@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_searchentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(choices=[('order', '注文書'), ('acceptance', '注文請書'), ('invoice', '請求書・支払通知書'), ('billing_invoice', '売上請求書')], max_length=20, verbose_name='書類種別')),
+                ('document_no', models.CharField(max_length=64, verbose_name='書類番号')),
+                ('transaction_date', models.DateField(verbose_name='取引年月日')),
+                ('amount', models.BigIntegerField(help_text='書類に記載の金額（注文書・注文請書は税抜、請求書は税込）', verbose_name='取引金額')),
+                ('counterparty_id', models.CharField(max_length=64, verbose_name='取引先ID')),
+                ('counterparty_name', models.CharField(max_length=255, verbose_name='取引先名')),
+                ('counterparty_key', models.CharField(help_text='正規化し法人格を除いた取引先名', max_length=255, verbose_name='取引先名（検索用）')),
+                ('storage_key', models.CharField(blank=True, help_text='原本PDFのストレージ上のパス', max_length=255, verbose_name='保存先')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='ハッシュ値')),
+                ('source_model', models.CharField(max_length=100, verbose_name='元のモデル')),
+                ('source_id', models.CharField(max_length=64, verbose_name='元のID')),
+                ('registered_at', models.DateTimeField(auto_now_add=True, verbose_name='登録日時')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': '書類台帳',
+                'verbose_name_plural': '書類台帳',
+                'indexes': [models.Index(fields=['transaction_date', 'amount'], name='core_docrecord_date_amount'), models.Index(fields=['amount', 'transaction_date'], name='core_docrecord_amount_date'), models.Index(fields=['counterparty_key', 'transaction_date'], name='core_docrecord_party_date'), models.Index(fields=['counterparty_id', 'transaction_date'], name='core_docrecord_partyid_date'), models.Index(fields=['doc_type', 'transaction_date'], name='core_docrecord_type_date')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='documentrecord',
+            constraint=models.UniqueConstraint(fields=('doc_type', 'source_id'), name='core_docrecord_source'),
+        ),
+    ]
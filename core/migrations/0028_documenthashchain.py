@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_documentrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentHashChain',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(choices=[('order', '注文書'), ('acceptance', '注文請書'), ('invoice', '請求書・支払通知書'), ('billing_invoice', '売上請求書')], max_length=20, verbose_name='書類種別')),
+                ('source_id', models.CharField(max_length=64, verbose_name='元のID')),
+                ('document_no', models.CharField(max_length=64, verbose_name='書類番号')),
+                ('storage_key', models.CharField(max_length=255, verbose_name='保存先')),
+                ('sha256', models.CharField(max_length=64, verbose_name='ハッシュ値')),
+                ('recorded_at', models.DateTimeField(verbose_name='記録日時')),
+                ('previous_hash', models.CharField(max_length=64, unique=True, verbose_name='前の行のハッシュ値')),
+                ('chain_hash', models.CharField(max_length=64, verbose_name='チェーンのハッシュ値')),
+            ],
+            options={
+                'verbose_name': '書類ハッシュチェーン',
+                'verbose_name_plural': '書類ハッシュチェーン',
+            },
+        ),
+    ]
@@ -0,0 +1,112 @@
+"""
+書類PDFの一括生成サービス
+
+月末の注文書・注文請書・請求書・支払通知書の発行を ProcessPoolExecutor で並列化する。
+各ワーカープロセスは起動時に一度だけフォント登録と自社情報の読み込みを行い、
+以降の描画ではそれらを使い回す。
+"""
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# 書類種別 → (モデル, select_related, 生成関数)
+DOCUMENT_KINDS = {
+    'order': (
+        'orders.Order', ('partner', 'project', 'workplace'),
+        'orders.services.pdf_generator.generate_order_pdf',
+    ),
+    'acceptance': (
+        'orders.Order', ('partner', 'project', 'workplace'),
+        'orders.services.pdf_generator.generate_acceptance_pdf',
+    ),
+    'invoice': (
+        'invoices.Invoice', ('order__partner', 'order__project'),
+        'invoices.services.pdf_generator.generate_invoice_pdf',
+    ),
+    'payment_notice': (
+        'invoices.Invoice', ('order__partner', 'order__project'),
+        'invoices.services.pdf_generator.generate_payment_notice_pdf',
+    ),
+}
+
+# ワーカープロセス内で共有する自社情報
+_worker_company = None
+
+
+def init_worker():
+    """ワーカープロセスの初期化（フォント登録・自社情報の読み込みを一度だけ行う）"""
+    global _worker_company
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        # spawn 方式で起動された場合
+        django.setup()
+
+    from core.services.company import get_company_info
+    from core.services.pdf_context import warm_up
+    warm_up()
+    _worker_company = get_company_info()
+
+
+def render_document(kind, pk):
+    """
+    書類を1件描画する（ワーカープロセスで実行される）。
+
+    Returns:
+        tuple: (pk, PDFのバイト列, 描画時間[秒])
+    """
+    from django.apps import apps
+    model_label, related, generator_path = DOCUMENT_KINDS[kind]
+    model = apps.get_model(model_label)
+    generate = import_string(generator_path)
+
+    started = time.perf_counter()
+    obj = model.objects.select_related(*related).get(pk=pk)
+    buffer = generate(obj, company=_worker_company)
+    return pk, buffer.getvalue(), time.perf_counter() - started
+
+
+def iter_rendered(kind, pks, workers=None, mp_context=None):
+    """
+    書類を並列に描画し、完了した順に結果を返す。
+
+    取り出した結果は保持しないため、呼び出し側で順に書き出せばすべての書類を
+    同時にメモリに置くことはない。途中で取り出しをやめた場合、未着手の描画は取り消す。
+
+    Args:
+        mp_context: ワーカープロセスの起動方式（スレッドを使うWebワーカーからは spawn を指定する）
+
+    Yields:
+        tuple: (pk, PDFのバイト列 or None, 描画時間[秒], 例外 or None)
+    """
+    from django.db import connections
+
+    pks = list(pks)
+    if workers is not None and workers <= 1:
+        init_worker()
+        for pk in pks:
+            started = time.perf_counter()
+            try:
+                yield render_document(kind, pk) + (None,)
+            except Exception as e:
+                yield pk, None, time.perf_counter() - started, e
+        return
+
+    # 親プロセスのDB接続を子プロセスに引き継がないよう、fork前に閉じておく
+    connections.close_all()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, mp_context=mp_context)
+    try:
+        futures = {executor.submit(render_document, kind, pk): pk for pk in pks}
+        for future in as_completed(futures):
+            pk = futures.pop(future)
+            try:
+                result = future.result() + (None,)
+            except Exception as e:
+                result = pk, None, 0.0, e
+            yield result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
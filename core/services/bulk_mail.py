@@ -0,0 +1,111 @@
+"""
+メール一括送信サービス
+
+月末の注文書発行通知など、多数のメールを送る処理で使う。
+
+- 送信ワーカーごとに get_connection() で接続を1本だけ開き、全メッセージで使い回す
+  （1通ごとにSMTP接続・認証をやり直さない）
+- 送信ワーカー数（並列数）と1秒あたりの送信数の上限を指定できる
+  （メールサービスの送信制限に掛からないようにするため）
+- 途中で接続が切れた場合は再接続して1回だけ送り直す
+"""
+import logging
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """全ワーカーで共有する送信間隔の制御（rate 通/秒。0 以下は無制限）"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _send_with(connection, message):
+    try:
+        connection.send_messages([message])
+    except smtplib.SMTPServerDisconnected:
+        # 長時間の送信中にサーバー側から切断された場合は再接続する
+        logger.info("SMTP connection closed by server, reconnecting")
+        connection.close()
+        connection.open()
+        connection.send_messages([message])
+
+
+def send_bulk(messages, workers=None, rate=None):
+    """
+    EmailMessage のリストを送信する。
+
+    Args:
+        messages: django.core.mail.EmailMessage のリスト
+        workers: 送信ワーカー数（省略時は settings.BULK_MAIL_WORKERS）。ワーカーごとに接続を1本使う
+        rate: 1秒あたりの送信数の上限（省略時は settings.BULK_MAIL_RATE。0 は無制限）
+
+    Returns:
+        dict: {
+            'errors': 各メッセージの送信エラー（成功は None。messages と同じ順序）,
+            'sent': 送信件数,
+            'failed': 失敗件数,
+            'elapsed': 所要秒数,
+        }
+    """
+    messages = list(messages)
+    workers = max(1, min(workers or getattr(settings, 'BULK_MAIL_WORKERS', 1), len(messages) or 1))
+    limiter = RateLimiter(getattr(settings, 'BULK_MAIL_RATE', 0) if rate is None else rate)
+    errors = [None] * len(messages)
+
+    def worker(indexes):
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+            for index in indexes:
+                limiter.wait()
+                try:
+                    _send_with(connection, messages[index])
+                except Exception as e:
+                    logger.warning(f"Mail send failed to {messages[index].to}: {e}")
+                    errors[index] = e
+        except Exception as e:
+            # 接続できなかった場合は担当分をすべて失敗にする
+            logger.error(f"Mail connection failed: {e}")
+            for index in indexes:
+                if errors[index] is None:
+                    errors[index] = e
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(worker, range(i, len(messages), workers)) for i in range(workers)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    failed = sum(1 for error in errors if error is not None)
+    return {
+        'errors': errors,
+        'sent': len(messages) - failed,
+        'failed': failed,
+        'elapsed': elapsed,
+    }
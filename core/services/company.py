@@ -0,0 +1,75 @@
+"""
+自社情報（CompanyInfo）の取得サービス
+
+注文書・請求書などのPDF生成やメール送信で毎回参照する自社情報を、
+プロセス内に保持して使い回す（書類1件ごとに CompanyInfo を問い合わせない）。
+
+- 自社情報の保存・削除時に Django のキャッシュ上の世代番号を進める（core/signals.py）。
+  各プロセスは取得のたびに世代番号を確かめ、変わっていれば読み直す（CACHE_URL に共有キャッシュを
+  指定していれば、gunicorn の別ワーカー・ジョブワーカーでも変更直後から新しい自社情報で原本・PDFを作成する）
+- 保持期間（settings.COMPANY_INFO_CACHE_TIMEOUT 秒）を過ぎた場合も読み直す（キャッシュを共有しない構成での上限）
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'company_info:generation'
+
+_lock = threading.Lock()
+_cached = None  # (CompanyInfo or None, 読み込んだ時刻, 世代番号)
+
+
+def _current_generation():
+    try:
+        return cache.get(GENERATION_KEY, 0)
+    except Exception as e:
+        logger.warning(f"Company info generation lookup failed: {e}")
+        return None
+
+
+def _is_fresh(cached, generation, timeout):
+    return (
+        cached is not None and generation is not None and cached[2] == generation
+        and time.monotonic() - cached[1] < timeout
+    )
+
+
+def get_company_info():
+    """
+    自社情報を取得する（未登録の場合は None）。
+
+    取得したインスタンスは複数の処理で共有されるため、変更して保存しないこと。
+    """
+    global _cached
+    timeout = getattr(settings, 'COMPANY_INFO_CACHE_TIMEOUT', 300)
+    generation = _current_generation()
+    cached = _cached
+    if _is_fresh(cached, generation, timeout):
+        return cached[0]
+
+    from core.domain.models import CompanyInfo
+    with _lock:
+        cached = _cached
+        if not _is_fresh(cached, generation, timeout):
+            cached = (CompanyInfo.objects.first(), time.monotonic(), generation)
+            _cached = cached
+    return cached[0]
+
+
+def invalidate_company_info():
+    """世代番号を進め、すべてのプロセスで次回の取得時に自社情報を読み直させる"""
+    global _cached
+    with _lock:
+        _cached = None
+    try:
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.set(GENERATION_KEY, 1, None)
+    except Exception as e:
+        logger.warning(f"Company info invalidation failed: {e}")
@@ -0,0 +1,174 @@
+"""
+書類ファイルのダウンロードサービス
+
+保存済みの書類原本（注文書・注文請書PDFなど）をメモリに読み込まずに返す。
+
+- FileResponse でファイルを少しずつ送り出す
+- Range リクエスト（1区間のみ）に 206 Partial Content で応答する
+- ETag（書類ハッシュ、なければファイル名・サイズ・更新日時から算出）と Last-Modified による
+  条件付きリクエストに 304 Not Modified で応答する
+- settings.DOCUMENT_DOWNLOAD_OFFLOAD を指定すると、ファイルの送信を前段のWebサーバーに任せる
+    'none'       : Django（gunicorn）から送信する（既定）
+    'x-accel'    : nginx の X-Accel-Redirect（DOCUMENT_DOWNLOAD_ACCEL_PREFIX + ファイル名）
+    'x-sendfile' : Apache などの X-Sendfile（ファイルの絶対パス）
+"""
+import hashlib
+import logging
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+logger = logging.getLogger(__name__)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _RangeFile:
+    """ファイルの指定区間だけを読み出すラッパー（FileResponse に渡す）"""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _content_disposition(filename, as_attachment):
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        filename.encode('ascii')
+        return f'{disposition}; filename="{filename}"'
+    except UnicodeEncodeError:
+        return f"{disposition}; filename*=utf-8''{quote(filename)}"
+
+
+def _parse_range(header, size):
+    """
+    Range ヘッダーを (開始, 終了) に変換する。
+
+    Returns:
+        tuple or None: 対象外（ヘッダーなし・複数区間・書式不正）は None、
+                       満たせない範囲は (None, None)
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # 末尾から指定バイト数（bytes=-500）
+        length = int(last)
+        if length == 0:
+            return None, None
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return None, None
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    """If-Range が現在のファイルと一致するか（一致しない場合は全体を返す）"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag and not etag.startswith('W/')
+    since = parse_http_date_safe(if_range)
+    return since is not None and last_modified is not None and int(last_modified) <= since
+
+
+def serve_document(request, field_file, filename, as_attachment=True, document_hash=None,
+                   content_type='application/pdf', before_send=None):
+    """
+    保存済みのファイルを返す。
+
+    Args:
+        field_file: FileField の値（order.order_pdf など）
+        filename: ダウンロード時のファイル名
+        as_attachment: True はダウンロード、False はブラウザ内で表示
+        document_hash: ファイル内容のSHA-256（ETag に使う）
+        before_send: 本文を返す場合だけ（304 以外）呼ぶ関数。レスポンスを返した場合はファイルの代わりに返す
+    """
+    storage = field_file.storage
+    name = field_file.name
+    size = field_file.size
+
+    try:
+        last_modified = storage.get_modified_time(name).timestamp()
+    except (NotImplementedError, AttributeError, OSError):
+        last_modified = None
+
+    if document_hash:
+        etag = quote_etag(document_hash)
+    else:
+        seed = f"{name}:{size}:{last_modified}".encode()
+        etag = 'W/' + quote_etag(hashlib.sha256(seed).hexdigest()[:32])
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        rejected = before_send() if before_send else None
+        if rejected is not None:
+            return rejected
+        response = _file_response(request, field_file, size, etag, last_modified, as_attachment, filename, content_type)
+
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # 認証が必要な書類のため共有キャッシュには保存させない
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _file_response(request, field_file, size, etag, last_modified, as_attachment, filename, content_type):
+    offload = getattr(settings, 'DOCUMENT_DOWNLOAD_OFFLOAD', 'none')
+    if offload in ('x-accel', 'x-sendfile'):
+        # 送信（Range 対応を含む）は前段のWebサーバーが行う
+        response = HttpResponse(content_type=content_type)
+        if offload == 'x-accel':
+            prefix = getattr(settings, 'DOCUMENT_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = quote(prefix.rstrip('/') + '/' + field_file.name)
+        else:
+            response['X-Sendfile'] = field_file.path
+        response['Content-Disposition'] = _content_disposition(filename, as_attachment)
+        return response
+
+    byte_range = None
+    if request.method in ('GET', 'HEAD') and _if_range_matches(request, etag, last_modified):
+        byte_range = _parse_range(request.META.get('HTTP_RANGE'), size)
+
+    if byte_range == (None, None):
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = field_file.storage.open(field_file.name, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(_RangeFile(file, start, length), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = length
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = _content_disposition(filename, as_attachment)
+    return response
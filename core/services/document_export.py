@@ -0,0 +1,236 @@
+"""
+書類PDFの一括出力サービス
+
+対象月・パートナーで絞り込んだ注文書・注文請書・請求書・支払通知書を1つのファイルにまとめて出力する。
+
+原本を確定する状態の書類（core.services.document_lifecycle.FROZEN_DOCUMENTS）は、保存済みの原本を
+ハッシュ値と照合して出力する（原本がなければその場で確定する。現在のデータで描画し直すと発行済みの
+内容と変わるため）。それ以外の書類だけをワーカープロセスで並列に描画する（core.services.batch_render）。
+
+- zip: 描画が終わった書類から順にZIPへ書き込み、そのまま送り出す（全書類をメモリに置かない）
+- pdf: 書類を番号順に1つのPDFに結合する。結合はすべての書類を描画し終えるまでメモリ上で行うため、
+       manage.py export_documents からのみ行う（画面・管理画面からのダウンロードは zip のみ）
+
+描画・照合に失敗した書類は、ZIPでは errors.txt に記録し、PDFでは除外してログに残す。
+"""
+import datetime
+import io
+import logging
+import multiprocessing
+import tempfile
+import zipfile
+
+from django.apps import apps
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from core.services.batch_render import DOCUMENT_KINDS, iter_rendered
+from core.services.document_lifecycle import FROZEN_DOCUMENTS, freeze, read_verified
+
+logger = logging.getLogger(__name__)
+
+ORDER_KINDS = ('order', 'acceptance')
+
+# 送り出す1回あたりのバイト数
+CHUNK_SIZE = 64 * 1024
+
+# PDF結合時、この大きさまではメモリ上で組み立てる
+SPOOL_MAX_BYTES = 32 * 1024 * 1024
+
+FORMATS = {
+    'pdf': 'application/pdf',
+    'zip': 'application/zip',
+}
+
+
+def select_documents(kind, month=None, partner_id=None, statuses=None):
+    """
+    出力対象の書類を絞り込む。
+
+    Args:
+        kind: 書類種別（DOCUMENT_KINDS のキー）
+        month: 対象年月（date）。注文は注文終了年月、請求は対象年月で絞り込む
+        partner_id: パートナーID
+        statuses: ステータスのリスト
+    """
+    from orders.models import Order
+    from invoices.models import Invoice
+
+    if kind not in DOCUMENT_KINDS:
+        raise ValueError(f"Unknown document kind: {kind}")
+    if kind in ORDER_KINDS:
+        queryset = Order.objects.all()
+        month_field, partner_field = 'order_end_ym', 'partner_id'
+    else:
+        queryset = Invoice.objects.all()
+        month_field, partner_field = 'target_month', 'order__partner_id'
+
+    if month:
+        queryset = queryset.filter(**{
+            f'{month_field}__year': month.year,
+            f'{month_field}__month': month.month,
+        })
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    if partner_id:
+        queryset = queryset.filter(**{partner_field: partner_id})
+    return queryset.order_by('pk')
+
+
+def parse_month(value):
+    """'YYYY-MM' を月初日の date に変換する（不正な形式は ValueError）"""
+    return datetime.datetime.strptime(value, '%Y-%m').date()
+
+
+def document_filenames(kind, pks):
+    """書類ごとの出力ファイル名（例: invoice_INV-202601-0001.pdf）"""
+    from orders.models import Order
+    from invoices.models import Invoice
+
+    if kind in ORDER_KINDS:
+        numbers = Order.objects.filter(pk__in=pks).values_list('pk', 'order_id')
+    else:
+        numbers = Invoice.objects.filter(pk__in=pks).values_list('pk', 'invoice_no')
+    return {pk: f"{kind}_{number}.pdf" for pk, number in numbers}
+
+
+def iter_documents(kind, pks, workers=None, mp_context=None):
+    """
+    書類のPDFを順に返す（順序は主キーの順とは限らない）。
+
+    原本を確定する状態の書類は、原本がなければ確定してから、保存済みの原本を照合して返す。
+    それ以外の書類（下書き・支払通知書など）はワーカープロセスで描画する。
+
+    Yields:
+        tuple: (pk, PDFのバイト列 or None, 例外 or None)
+    """
+    pks = list(pks)
+    if kind in FROZEN_DOCUMENTS:
+        model_label, related, _generator = DOCUMENT_KINDS[kind]
+        frozen = (
+            apps.get_model(model_label).objects
+            .filter(pk__in=pks, status__in=FROZEN_DOCUMENTS[kind]['statuses'])
+            .select_related(*related)
+        )
+        frozen_pks = set()
+        for obj in frozen:
+            frozen_pks.add(obj.pk)
+            try:
+                freeze(obj, kind)
+                yield obj.pk, read_verified(obj, kind), None
+            except Exception as e:
+                yield obj.pk, None, e
+        pks = [pk for pk in pks if pk not in frozen_pks]
+
+    if pks:
+        for pk, content, _elapsed, error in iter_rendered(kind, pks, workers=workers, mp_context=mp_context):
+            yield pk, content, error
+
+
+class _ChunkStream(io.RawIOBase):
+    """ZipFile の書き込み先。書き込まれたバイト列を溜め、drain() で取り出す"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(targets, workers=None, mp_context=None, failures=None):
+    """
+    書類をZIPにまとめながらバイト列を順に返す。
+
+    Args:
+        targets: [(書類種別, 主キーのリスト), ...]。種別ごとにフォルダを分けて格納する
+        failures: 描画・照合に失敗した書類を (ファイル名, 例外) で追加するリスト
+    """
+    failures = [] if failures is None else failures
+    stream = _ChunkStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for kind, pks in targets:
+            names = document_filenames(kind, pks)
+            for pk, content, error in iter_documents(kind, pks, workers=workers, mp_context=mp_context):
+                name = names.get(pk, f"{kind}_{pk}.pdf")
+                if error is not None:
+                    logger.warning(f"Export failed: {name}: {error}")
+                    failures.append((name, error))
+                    continue
+                archive.writestr(f"{kind}/{name}", content)
+                yield stream.drain()
+        if failures:
+            archive.writestr('errors.txt', "\n".join(f"{name}: {error}" for name, error in failures))
+    yield stream.drain()
+
+
+def iter_merged_pdf(kind, pks, workers=None, mp_context=None, failures=None):
+    """
+    書類を主キーの順に1つのPDFへ結合し、バイト列を順に返す。
+
+    Args:
+        failures: 描画・照合に失敗した書類を (ファイル名, 例外) で追加するリスト
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    failures = [] if failures is None else failures
+    pks = list(pks)
+    names = document_filenames(kind, pks)
+    writer = PdfWriter()
+
+    # 原本・描画結果は完了順に返るため、番号順に並ぶまで待たせてから結合する
+    waiting = {}
+    position = 0
+    for pk, content, error in iter_documents(kind, pks, workers=workers, mp_context=mp_context):
+        if error is not None:
+            name = names.get(pk, f"{kind}_{pk}.pdf")
+            logger.warning(f"Export failed: {name}: {error}")
+            failures.append((name, error))
+        waiting[pk] = content
+        while position < len(pks) and pks[position] in waiting:
+            content = waiting.pop(pks[position])
+            position += 1
+            if content is not None:
+                writer.append(PdfReader(io.BytesIO(content)))
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as output:
+        writer.write(output)
+        writer.close()
+        output.seek(0)
+        while True:
+            chunk = output.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def export_workers():
+    """Webリクエストからの出力に使うワーカープロセス数"""
+    return getattr(settings, 'DOCUMENT_EXPORT_WORKERS', 2)
+
+
+def streaming_export_response(targets, filename, workers=None):
+    """
+    書類の一括出力をZIPの StreamingHttpResponse で返す（画面・管理画面からのダウンロード用）。
+
+    描画が終わった書類から順に送り出すため、件数が多くても最初の書類の描画後すぐに送信が始まる。
+    Webワーカーはスレッドで動作しているため、描画プロセスは spawn で起動する。
+
+    Args:
+        targets: [(書類種別, 主キーのリスト), ...]
+        filename: 拡張子を除いたダウンロードファイル名
+    """
+    workers = workers or export_workers()
+    mp_context = multiprocessing.get_context('spawn') if workers > 1 else None
+    content = iter_zip(targets, workers=workers, mp_context=mp_context)
+    response = StreamingHttpResponse(content, content_type=FORMATS['zip'])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.zip"'
+    return response
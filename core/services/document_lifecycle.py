@@ -0,0 +1,234 @@
+"""
+書類原本の確定サービス
+
+書類が下書きを離れた時点で描画したPDFを原本として保存し、SHA-256 ハッシュ値を記録する。
+以降の表示・ダウンロードは保存した原本を返し、返す前にハッシュ値を照合する
+（描画処理の省略と、電子帳簿保存法の改ざん防止のため）。
+原本の再生成は管理画面から明示的に指示した場合のみ行う。
+
+    注文書   : 未確認（発行済）以降   Order.order_pdf / order_pdf_hash
+    注文請書 : 承認済                 Order.acceptance_pdf / document_hash
+    請求書   : 発行済以降             Invoice.invoice_pdf / invoice_pdf_hash
+
+確定の対象となる状態で原本がまだない書類（本機能の導入前に発行された書類など）は、
+最初に表示した時点で原本を保存する。保存済みのPDFがありハッシュ値だけがない書類は、
+描画し直さずに保存済みのPDFのハッシュ値を記録する（発行済みの内容を差し替えないため）。
+
+状態の変更と原本の保存は、discard_on_rollback と transaction.atomic() で1つの処理として行う
+（途中で失敗した場合は、書き込んだ原本ファイルを削除して参照されないファイルを残さない）。
+"""
+import hashlib
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+from core.services.document_download import serve_document
+
+logger = logging.getLogger(__name__)
+
+# 書類種別 → 原本の保存先と確定する状態
+FROZEN_DOCUMENTS = {
+    'order': {
+        'file_field': 'order_pdf',
+        'hash_field': 'order_pdf_hash',
+        'statuses': ('UNCONFIRMED', 'CONFIRMING', 'RECEIVED', 'APPROVED'),
+        'generator': 'orders.services.pdf_generator.generate_order_pdf',
+        'number_field': 'order_id',
+    },
+    'acceptance': {
+        'file_field': 'acceptance_pdf',
+        'hash_field': 'document_hash',
+        'statuses': ('APPROVED',),
+        'generator': 'orders.services.pdf_generator.generate_acceptance_pdf',
+        'number_field': 'order_id',
+    },
+    'invoice': {
+        'file_field': 'invoice_pdf',
+        'hash_field': 'invoice_pdf_hash',
+        'statuses': ('ISSUED', 'SENT', 'CONFIRMED', 'PAID'),
+        'generator': 'invoices.services.pdf_generator.generate_invoice_pdf',
+        'number_field': 'invoice_no',
+    },
+}
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class DocumentIntegrityError(Exception):
+    """保存済みの原本がハッシュ値と一致しない（改ざん・破損の可能性）"""
+
+
+def should_freeze(obj, kind):
+    """書類の状態が原本を確定する段階にあるか"""
+    return obj.status in FROZEN_DOCUMENTS[kind]['statuses']
+
+
+def is_frozen(obj, kind):
+    """原本とハッシュ値が保存済みか"""
+    spec = FROZEN_DOCUMENTS[kind]
+    return bool(getattr(obj, spec['file_field'])) and bool(getattr(obj, spec['hash_field']))
+
+
+def document_filename(obj, kind):
+    return f"{kind}_{getattr(obj, FROZEN_DOCUMENTS[kind]['number_field'])}.pdf"
+
+
+@contextmanager
+def discard_on_rollback(obj, kind):
+    """
+    ブロック内で freeze() が書き込んだ原本ファイルを、例外でブロックを抜けた場合に削除する。
+
+    transaction.atomic() の外側で使う（ロールバックの後に削除する）:
+
+        with discard_on_rollback(order, 'acceptance'), transaction.atomic():
+            freeze(order, 'acceptance', force=True, save=False)
+            order.save(...)
+    """
+    file_field = FROZEN_DOCUMENTS[kind]['file_field']
+    before = getattr(obj, file_field).name
+    try:
+        yield
+    except BaseException:
+        field_file = getattr(obj, file_field)
+        if field_file.name and field_file.name != before:
+            field_file.storage.delete(field_file.name)
+            logger.info(f"Discarded document written before rollback: {field_file.name}")
+        raise
+
+
+def freeze(obj, kind, content=None, force=False, save=True):
+    """
+    書類を描画して原本として保存する。
+
+    Args:
+        content: 描画済みのPDF（省略時はここで描画する）
+        force: 保存済みの原本があっても作り直す（管理者による再生成）。
+               以前の原本ファイルは削除せずに残す
+        save: False の場合はモデルを保存しない（呼び出し側で他の変更とまとめて保存する）
+
+    Returns:
+        bool: 原本またはハッシュ値を保存したかどうか
+    """
+    if is_frozen(obj, kind) and not force:
+        return False
+    spec = FROZEN_DOCUMENTS[kind]
+    field_file = getattr(obj, spec['file_field'])
+    if not force and field_file and field_file.storage.exists(field_file.name):
+        # ハッシュ値の記録前に保存したPDFが原本。現在のデータで描画し直すと発行済みの内容が変わるため、
+        # 保存済みのPDFのハッシュ値を記録する
+        setattr(obj, spec['hash_field'], compute_hash(field_file))
+        if save:
+            obj.save(update_fields=[spec['hash_field'], 'updated_at'])
+        logger.info(f"Document hash recorded for stored original: {document_filename(obj, kind)}")
+        return True
+    if content is None:
+        content = import_string(spec['generator'])(obj).getvalue()
+
+    with discard_on_rollback(obj, kind):
+        getattr(obj, spec['file_field']).save(document_filename(obj, kind), ContentFile(content), save=False)
+        setattr(obj, spec['hash_field'], hashlib.sha256(content).hexdigest())
+        if save:
+            obj.save(update_fields=[spec['file_field'], spec['hash_field'], 'updated_at'])
+    logger.info(f"Document frozen: {document_filename(obj, kind)}{' (re-rendered)' if force else ''}")
+    return True
+
+
+def compute_hash(field_file):
+    """保存済みファイルの SHA-256 を少しずつ読み込んで算出する"""
+    digest = hashlib.sha256()
+    with field_file.storage.open(field_file.name, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _check_hash(obj, kind, actual):
+    expected = getattr(obj, FROZEN_DOCUMENTS[kind]['hash_field'])
+    if actual != expected:
+        raise DocumentIntegrityError(
+            f"{document_filename(obj, kind)}: ハッシュ値が一致しません（記録 {expected[:12]}… / 実際 {actual[:12]}…）"
+        )
+
+
+def verify(obj, kind):
+    """保存済みの原本がハッシュ値と一致することを確認する（一致しない場合は DocumentIntegrityError）"""
+    try:
+        actual = compute_hash(getattr(obj, FROZEN_DOCUMENTS[kind]['file_field']))
+    except FileNotFoundError:
+        raise DocumentIntegrityError(f"{document_filename(obj, kind)}: 保存されている原本のファイルがありません")
+    _check_hash(obj, kind, actual)
+
+
+def read_verified(obj, kind):
+    """
+    保存済みの原本を読み込み、ハッシュ値と照合してから返す（一致しない場合は DocumentIntegrityError）。
+
+    読み込んだバイト列そのものを照合するため、照合後にファイルが差し替えられても照合していない内容は返さない。
+    """
+    field_file = getattr(obj, FROZEN_DOCUMENTS[kind]['file_field'])
+    try:
+        with field_file.storage.open(field_file.name, 'rb') as f:
+            content = f.read()
+    except FileNotFoundError:
+        raise DocumentIntegrityError(f"{document_filename(obj, kind)}: 保存されている原本のファイルがありません")
+    _check_hash(obj, kind, hashlib.sha256(content).hexdigest())
+    return content
+
+
+def _verified_cache_key(field_file, expected):
+    """照合済みの結果のキャッシュキー（ファイルの名前・サイズ・更新日時・ハッシュ値のいずれかが変われば照合し直す）"""
+    storage = field_file.storage
+    try:
+        modified = storage.get_modified_time(field_file.name).timestamp()
+    except (NotImplementedError, AttributeError):
+        return None
+    scope = hashlib.sha256(f"{field_file.name}:{storage.size(field_file.name)}:{modified}:{expected}".encode())
+    return f"document_verified:{scope.hexdigest()}"
+
+
+def _integrity_error_response(error):
+    logger.critical(f"Document integrity check failed: {error}")
+    return HttpResponse(
+        "保存されている書類の原本がないか、ハッシュ値と一致しません。管理者にお問い合わせください。",
+        status=409, content_type='text/plain; charset=utf-8',
+    )
+
+
+def _verify_before_send(obj, kind):
+    """本文を返す直前に原本を照合する（照合済みでファイルが変わっていなければ読み込まない）"""
+    spec = FROZEN_DOCUMENTS[kind]
+    key = _verified_cache_key(getattr(obj, spec['file_field']), getattr(obj, spec['hash_field']))
+    if key and cache.get(key):
+        return None
+    try:
+        verify(obj, kind)
+    except DocumentIntegrityError as e:
+        return _integrity_error_response(e)
+    if key:
+        cache.set(key, True, getattr(settings, 'DOCUMENT_VERIFY_CACHE_TIMEOUT', 3600))
+    return None
+
+
+def frozen_document_response(request, obj, kind, as_attachment=True):
+    """
+    確定済みの原本を照合してから返す（原本がなければここで確定する）。
+
+    照合はファイルの本文を返す場合だけ行い（304 では読み込まない）、照合済みの結果はファイルの
+    名前・サイズ・更新日時が変わるまで settings.DOCUMENT_VERIFY_CACHE_TIMEOUT 秒キャッシュする。
+    照合に失敗した場合は書類を返さず 409 を返す。
+    """
+    freeze(obj, kind)
+    spec = FROZEN_DOCUMENTS[kind]
+    field_file = getattr(obj, spec['file_field'])
+    if not field_file.storage.exists(field_file.name):
+        return _integrity_error_response(f"{document_filename(obj, kind)}: 保存されている原本のファイルがありません")
+    return serve_document(
+        request, field_file, document_filename(obj, kind),
+        as_attachment=as_attachment, document_hash=getattr(obj, spec['hash_field']),
+        before_send=lambda: _verify_before_send(obj, kind),
+    )
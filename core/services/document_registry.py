@@ -0,0 +1,295 @@
+"""
+書類台帳サービス（電子帳簿保存法の検索要件）
+
+発行済みの注文書・注文請書・請求書・売上請求書を、取引年月日・取引金額・取引先・書類種別・
+原本の保存先・ハッシュ値をそろえた1行（DocumentRecord）として登録する。
+書類ごとに金額の求め方が異なり（注文書は明細の合計、売上請求書は保存済みの合計）、
+そのままでは横断して範囲検索できないため、台帳の列にインデックスを張って検索する。
+
+- 書類が発行済みの状態になった時点・原本を保存した時点で登録・更新する（core/signals.py）
+- 元の書類が削除されても台帳の行は残す（保存義務のため）
+- 導入前に発行した書類は manage.py backfill_document_registry で登録する
+- 取引先は正規化し法人格を除いた名前（counterparty_key）の前方一致で検索する
+- DOCUMENT_HASH_CHAIN が有効な場合、原本のハッシュ値が登録・変更された行をハッシュチェーンに追記する
+"""
+from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
+
+from core.services.document_lifecycle import FROZEN_DOCUMENTS, compute_hash
+from core.services.search import normalize, target_id
+
+BATCH_SIZE = 500
+
+# 取引先名の検索で無視する法人格（normalize 後の表記）
+_COMPANY_FORMS = (
+    '株式会社', '有限会社', '合同会社', '合資会社', '合名会社',
+    '一般社団法人', '一般財団法人', '特定非営利活動法人',
+)
+
+RECORD_FIELDS = (
+    'document_no', 'transaction_date', 'amount', 'counterparty_id', 'counterparty_name',
+    'counterparty_key', 'storage_key', 'sha256',
+)
+
+
+def counterparty_key(name):
+    """取引先名の検索用キー（正規化し法人格を除く。'㈱ＡＢＣ' と 'ABC株式会社' が同じキーになる）"""
+    key = normalize(name)
+    for form in _COMPANY_FORMS:
+        key = key.replace(form, '')
+    return key
+
+
+def _order_amount(order):
+    """注文書に記載の金額（明細の合計。明細がない場合は月額基本料金）。税抜"""
+    items = list(order.items.all())
+    return sum(item.price for item in items) if items else order.base_fee
+
+
+def _order_record(order):
+    return {
+        'document_no': order.order_id,
+        'transaction_date': order.order_date,
+        'amount': _order_amount(order),
+        'counterparty_id': order.partner_id,
+        'counterparty_name': order.partner.name,
+        'storage_key': order.order_pdf.name or '',
+        'sha256': order.order_pdf_hash,
+    }
+
+
+def _acceptance_record(order):
+    return {
+        'document_no': order.order_id,
+        'transaction_date': order.finalized_at.date() if order.finalized_at else order.order_date,
+        'amount': _order_amount(order),
+        'counterparty_id': order.partner_id,
+        'counterparty_name': order.partner.name,
+        'storage_key': order.acceptance_pdf.name or '',
+        'sha256': order.document_hash,
+    }
+
+
+def _invoice_record(invoice):
+    return {
+        'document_no': invoice.invoice_no,
+        'transaction_date': invoice.issue_date,
+        'amount': invoice.total_amount,
+        'counterparty_id': invoice.order.partner_id,
+        'counterparty_name': invoice.order.partner.name,
+        'storage_key': invoice.invoice_pdf.name or '',
+        'sha256': invoice.invoice_pdf_hash,
+    }
+
+
+def _billing_invoice_record(invoice):
+    # 売上請求書は原本のハッシュ値を保持していないため、sha256 は register_documents で算出する（hash_file_field）
+    return {
+        'document_no': invoice.invoice_number,
+        'transaction_date': invoice.issue_date,
+        'amount': invoice.total_amount,
+        'counterparty_id': str(invoice.customer_id),
+        'counterparty_name': invoice.customer.name,
+        'storage_key': invoice.pdf_file.name or '',
+    }
+
+
+def _file_hash(field_file, record, file_field, update_fields):
+    """
+    原本のハッシュ値を保持していない書類の原本のハッシュ値。
+
+    台帳の行と原本のファイル名が同じで、保存時に原本のフィールドを更新していなければ、
+    台帳に記録済みの値を使う（金額の再計算などの保存のたびに原本を読み込まない）。
+    """
+    if not field_file:
+        return ''
+    if (
+        record is not None and record.sha256 and record.storage_key == field_file.name
+        and (update_fields is None or file_field not in update_fields)
+    ):
+        return record.sha256
+    return compute_hash(field_file)
+
+
+# 書類種別 → 元のモデル・台帳に載せる状態・取得する関連・台帳の値・原本のフィールド
+#   watch: 保存時（update_fields 指定時）に台帳の更新が必要なフィールド
+#   hash_file_field: 原本のハッシュ値を書類に保持していないため、台帳の登録時に原本から算出する
+DOCUMENT_TYPES = {
+    'order': {
+        'model': 'orders.Order',
+        'statuses': FROZEN_DOCUMENTS['order']['statuses'],
+        'select_related': ('partner',),
+        'prefetch_related': ('items',),
+        'record': _order_record,
+        'file_field': 'order_pdf',
+        'watch': ('status', 'order_date', 'partner', 'base_fee', 'order_pdf', 'order_pdf_hash'),
+    },
+    'acceptance': {
+        'model': 'orders.Order',
+        'statuses': FROZEN_DOCUMENTS['acceptance']['statuses'],
+        'select_related': ('partner',),
+        'prefetch_related': ('items',),
+        'record': _acceptance_record,
+        'file_field': 'acceptance_pdf',
+        'watch': ('status', 'finalized_at', 'partner', 'base_fee', 'acceptance_pdf', 'document_hash'),
+    },
+    'invoice': {
+        'model': 'invoices.Invoice',
+        'statuses': FROZEN_DOCUMENTS['invoice']['statuses'],
+        'select_related': ('order__partner',),
+        'prefetch_related': (),
+        'record': _invoice_record,
+        'file_field': 'invoice_pdf',
+        'watch': ('status', 'issue_date', 'total_amount', 'invoice_pdf', 'invoice_pdf_hash'),
+    },
+    'billing_invoice': {
+        'model': 'billing.BillingInvoice',
+        'statuses': ('ISSUED', 'SENT', 'PAID'),
+        'select_related': ('customer',),
+        'prefetch_related': (),
+        'record': _billing_invoice_record,
+        'file_field': 'pdf_file',
+        'watch': ('status', 'issue_date', 'total_amount', 'customer', 'pdf_file'),
+        'hash_file_field': True,
+    },
+}
+
+
+def doc_types_for(model_label):
+    return [doc_type for doc_type, spec in DOCUMENT_TYPES.items() if spec['model'] == model_label]
+
+
+def register_documents(model_label, pks, update_fields=None, doc_types=None):
+    """
+    書類を台帳に登録・更新する（発行済みの状態でない書類は対象外。内容が変わらない行は書き込まない）。
+
+    Args:
+        model_label: 元のモデル（例: 'orders.Order'）
+        pks: 元の書類の主キー
+        update_fields: 保存時の update_fields（台帳に関係しない項目だけの保存は何もしない）
+        doc_types: 対象の書類種別（省略時はモデルのすべての書類種別）
+
+    Returns:
+        int: 登録・更新した行数
+    """
+    from core.domain.models import DocumentRecord
+    from core.services.document_verification import append_to_chain, hash_chain_enabled
+
+    pks = list(pks)
+    written = 0
+    for doc_type in doc_types or doc_types_for(model_label):
+        spec = DOCUMENT_TYPES[doc_type]
+        if update_fields is not None and not set(spec['watch']) & set(update_fields):
+            continue
+        model = apps.get_model(model_label)
+        for start in range(0, len(pks), BATCH_SIZE):
+            batch = pks[start:start + BATCH_SIZE]
+            documents = (
+                model._default_manager.filter(pk__in=batch, status__in=spec['statuses'])
+                .select_related(*spec['select_related']).prefetch_related(*spec['prefetch_related'])
+            )
+            existing = {
+                record.source_id: record
+                for record in DocumentRecord.objects.filter(
+                    doc_type=doc_type, source_id__in=[target_id(pk) for pk in batch],
+                )
+            }
+            created, changed, hashed = [], [], []
+            now = timezone.now()
+            for document in documents:
+                values = spec['record'](document)
+                values['counterparty_key'] = counterparty_key(values['counterparty_name'])
+                record = existing.get(target_id(document.pk))
+                if spec.get('hash_file_field'):
+                    field = spec['file_field']
+                    values['sha256'] = _file_hash(getattr(document, field), record, field, update_fields)
+                if record is None:
+                    record = DocumentRecord(
+                        doc_type=doc_type, source_model=model_label, source_id=target_id(document.pk), **values,
+                    )
+                    created.append(record)
+                elif any(getattr(record, field) != value for field, value in values.items()):
+                    previous_hash = record.sha256
+                    for field, value in values.items():
+                        setattr(record, field, value)
+                    record.updated_at = now  # bulk_update は auto_now を設定しない
+                    changed.append(record)
+                    if record.sha256 == previous_hash:
+                        continue
+                else:
+                    continue
+                if record.sha256:
+                    hashed.append(record)
+            with transaction.atomic():
+                DocumentRecord.objects.bulk_create(created)
+                DocumentRecord.objects.bulk_update(changed, [*RECORD_FIELDS, 'updated_at'])
+                if hashed and hash_chain_enabled():
+                    append_to_chain(hashed)
+            written += len(created) + len(changed)
+    return written
+
+
+def backfill(doc_types=None, batch_size=BATCH_SIZE, stdout=None):
+    """発行済みの書類をすべて台帳に登録する（登録済みの行は内容が変わった場合のみ更新する）"""
+    counts = {}
+    for doc_type in doc_types or DOCUMENT_TYPES:
+        spec = DOCUMENT_TYPES[doc_type]
+        model = apps.get_model(spec['model'])
+        pks = list(
+            model._default_manager.filter(status__in=spec['statuses']).order_by('pk').values_list('pk', flat=True)
+        )
+        written = 0
+        for start in range(0, len(pks), batch_size):
+            written += register_documents(spec['model'], pks[start:start + batch_size], doc_types=[doc_type])
+        counts[doc_type] = (len(pks), written)
+        if stdout:
+            stdout.write(f"{spec['model']} ({doc_type}): 対象 {len(pks)}件 / 登録・更新 {written}件")
+    return counts
+
+
+def find_documents(date_from=None, date_to=None, amount_min=None, amount_max=None,
+                   counterparty=None, counterparty_id=None, doc_types=None):
+    """
+    台帳を検索する（条件はすべて AND。範囲は両端を含む）。
+
+    Args:
+        counterparty: 取引先名（表記揺れ・法人格を無視した前方一致）
+        counterparty_id: 取引先ID（パートナーID・請求先ID）
+        doc_types: 書類種別のリスト（省略時はすべて）
+
+    Returns:
+        QuerySet: 取引年月日の新しい順
+    """
+    from core.domain.models import DocumentRecord
+
+    records = DocumentRecord.objects.all()
+    if date_from:
+        records = records.filter(transaction_date__gte=date_from)
+    if date_to:
+        records = records.filter(transaction_date__lte=date_to)
+    if amount_min is not None:
+        records = records.filter(amount__gte=amount_min)
+    if amount_max is not None:
+        records = records.filter(amount__lte=amount_max)
+    if counterparty:
+        key = counterparty_key(counterparty)
+        if key:
+            # 前方一致を範囲条件にしてインデックスを使う（LIKE 'x%' は SQLite では大文字小文字を
+            # 区別しないためインデックスを使えない）。キーは正規化済みのため大文字を含まない
+            records = records.filter(counterparty_key__gte=key, counterparty_key__lt=key + '\U0010ffff')
+    if counterparty_id:
+        records = records.filter(counterparty_id=counterparty_id)
+    if doc_types:
+        records = records.filter(doc_type__in=list(doc_types))
+    return records.order_by('-transaction_date', '-id')
+
+
+def on_save(sender, instance, update_fields=None, **kwargs):
+    """書類の保存時に台帳を更新する（発行済みの状態の書類のみ）"""
+    register_documents(sender._meta.label, [instance.pk], update_fields=update_fields)
+
+
+def on_order_item_change(sender, instance, **kwargs):
+    """注文明細の保存・削除時に、発行済みの注文書・注文請書の金額を更新する"""
+    register_documents('orders.Order', [instance.order_id])
@@ -0,0 +1,259 @@
+"""
+保存済み書類の改ざん検知
+
+- verify_stored_documents: 保存済みの原本（注文書・注文請書・請求書）を ProcessPoolExecutor で少しずつ読み込んで
+  SHA-256 を算出し、書類に記録したハッシュ値と照合する（manage.py verify_documents）
+- ハッシュチェーン（DOCUMENT_HASH_CHAIN）: 書類台帳に原本のハッシュ値を登録するたびに、前の行のハッシュ値と
+  つなげて DocumentHashChain に追記する。監査では前回控えた先頭（連番とハッシュ値）より後の行だけ、
+  つながりと原本を確かめればよい（manage.py verify_documents --since）
+"""
+import hashlib
+import logging
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.services.document_lifecycle import FROZEN_DOCUMENTS
+from core.services.document_registry import DOCUMENT_TYPES
+
+logger = logging.getLogger(__name__)
+
+# 原本を読み込む単位（ファイル全体をメモリに載せない）
+READ_CHUNK_SIZE = 1024 * 1024
+# ワーカープロセスに一度に渡すファイル数
+MAP_CHUNK_SIZE = 16
+# 同時に追記して前の行が重なった場合にやり直す回数
+CHAIN_APPEND_ATTEMPTS = 5
+
+# 照合結果
+OK = 'ok'
+MISMATCH = 'mismatch'        # ハッシュ値が一致しない（改ざん・破損の可能性）
+MISSING = 'missing'          # 原本のファイルがない
+UNRECORDED = 'unrecorded'    # 原本はあるがハッシュ値が記録されていない
+ERROR = 'error'              # 読み込みに失敗した
+
+VerificationResult = namedtuple(
+    'VerificationResult', ['doc_type', 'source_id', 'document_no', 'name', 'status', 'expected', 'actual', 'error'],
+)
+
+# 照合する原本（storage は原本のフィールドのストレージ）
+_Target = namedtuple('_Target', ['doc_type', 'source_id', 'document_no', 'name', 'expected', 'storage'])
+
+
+def hash_file(path):
+    """
+    ファイルの SHA-256 を少しずつ読み込んで算出する（ワーカープロセスで実行される）。
+
+    Returns:
+        tuple: (ハッシュ値 or None, 照合結果 or None, エラー or None)
+    """
+    digest = hashlib.sha256()
+    buffer = bytearray(READ_CHUNK_SIZE)
+    view = memoryview(buffer)
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            while size := f.readinto(buffer):
+                digest.update(view[:size])
+    except FileNotFoundError:
+        return None, MISSING, None
+    except OSError as e:
+        return None, ERROR, str(e)
+    return digest.hexdigest(), None, None
+
+
+def _hash_storage_file(storage, name):
+    """ローカルのパスを持たないストレージのファイルをこのプロセスで読み込む"""
+    if not storage.exists(name):
+        return None, MISSING, None
+    digest = hashlib.sha256()
+    try:
+        with storage.open(name, 'rb') as f:
+            for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except OSError as e:
+        return None, ERROR, str(e)
+    return digest.hexdigest(), None, None
+
+
+def _local_path(storage, name):
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        return None
+
+
+def _iter_hashes(paths, workers=None, mp_context=None):
+    """パスのハッシュ値を順に返す（workers が1以下の場合はこのプロセスで算出する）"""
+    if workers is not None and workers <= 1:
+        yield from map(hash_file, paths)
+        return
+
+    from django.db import connections
+
+    # 親プロセスのDB接続を子プロセスに引き継がないよう、fork前に閉じておく
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+        yield from executor.map(hash_file, paths, chunksize=MAP_CHUNK_SIZE)
+
+
+def _verify(targets, workers=None, mp_context=None):
+    """原本を読み込んで記録済みのハッシュ値と照合する"""
+    local, results = [], []
+    for target in targets:
+        if not target.name:
+            results.append(_result(target, status=MISSING))
+        elif not target.expected:
+            results.append(_result(target, status=UNRECORDED))
+        else:
+            path = _local_path(target.storage, target.name)
+            if path is None:
+                results.append(_result(target, *_hash_storage_file(target.storage, target.name)))
+            else:
+                local.append((target, path))
+    yield from results
+
+    hashes = _iter_hashes([path for _target, path in local], workers, mp_context)
+    for (target, _path), hashed in zip(local, hashes):
+        yield _result(target, *hashed)
+
+
+def _result(target, actual=None, status=None, error=None):
+    if status is None:
+        status = OK if actual == target.expected else MISMATCH
+    return VerificationResult(
+        target.doc_type, target.source_id, target.document_no, target.name, status, target.expected, actual, error,
+    )
+
+
+def _file_storage(doc_type):
+    spec = DOCUMENT_TYPES[doc_type]
+    return apps.get_model(spec['model'])._meta.get_field(spec['file_field']).storage
+
+
+def stored_documents(doc_types=None):
+    """原本のファイルかハッシュ値のどちらかが記録されている書類"""
+    for doc_type in doc_types or FROZEN_DOCUMENTS:
+        spec = FROZEN_DOCUMENTS[doc_type]
+        model = apps.get_model(DOCUMENT_TYPES[doc_type]['model'])
+        storage = _file_storage(doc_type)
+        rows = (
+            model._default_manager
+            .filter(Q(**{f"{spec['file_field']}__gt": ''}) | Q(**{f"{spec['hash_field']}__gt": ''}))
+            .order_by('pk')
+            .values_list('pk', spec['number_field'], spec['file_field'], spec['hash_field'])
+        )
+        for pk, number, name, expected in rows.iterator(chunk_size=2000):
+            yield _Target(doc_type, str(pk), number, name or '', expected or '', storage)
+
+
+def verify_stored_documents(doc_types=None, workers=None, mp_context=None):
+    """
+    保存済みの原本をすべて読み込み、書類に記録したハッシュ値と照合する。
+
+    Args:
+        doc_types: 書類種別（'order' / 'acceptance' / 'invoice'。省略時はすべて）
+        workers: 読み込みに使うワーカープロセス数（1でこのプロセスで実行）
+
+    Yields:
+        VerificationResult
+    """
+    yield from _verify(list(stored_documents(doc_types)), workers, mp_context)
+
+
+# ============================================================
+# ハッシュチェーン
+# ============================================================
+
+def hash_chain_enabled():
+    return getattr(settings, 'DOCUMENT_HASH_CHAIN', False)
+
+
+def append_to_chain(records):
+    """
+    書類台帳の行の原本のハッシュ値をハッシュチェーンに追記する（呼び出し側のトランザクション内で実行する）。
+
+    前の行が同じになる行を別のプロセスが先に追記した場合は一意制約で失敗するため、最後の行を読み直してやり直す。
+    """
+    from core.domain.models import DocumentHashChain
+
+    for record in records:
+        for attempt in range(1, CHAIN_APPEND_ATTEMPTS + 1):
+            previous = DocumentHashChain.objects.order_by('-pk').values_list('chain_hash', flat=True).first()
+            entry = DocumentHashChain(
+                doc_type=record.doc_type, source_id=record.source_id, document_no=record.document_no,
+                storage_key=record.storage_key, sha256=record.sha256, recorded_at=timezone.now(),
+                previous_hash=previous or DocumentHashChain.GENESIS_HASH,
+            )
+            entry.chain_hash = entry.compute_chain_hash()
+            try:
+                with transaction.atomic():
+                    entry.save()
+                break
+            except IntegrityError:
+                if attempt == CHAIN_APPEND_ATTEMPTS:
+                    raise
+                logger.info(f"Hash chain append conflicted, retrying ({attempt}): {record.doc_type} {record.document_no}")
+
+
+def verify_chain(since=None, head=None):
+    """
+    ハッシュチェーンのつながりを確かめる（原本は読み込まない）。
+
+    Args:
+        since: 前回の監査で控えた最後の行の連番（省略時は最初の行から）
+        head: since の行のハッシュ値（前回の監査で控えた値）
+
+    Returns:
+        tuple: (確かめた行数, 最後の行 or None, エラーのリスト)
+    """
+    from core.domain.models import DocumentHashChain
+
+    errors = []
+    previous, last = DocumentHashChain.GENESIS_HASH, None
+    entries = DocumentHashChain.objects.order_by('pk')
+    if since:
+        last = DocumentHashChain.objects.filter(pk=since).first()
+        if last is None:
+            return 0, None, [f"#{since}: 行がありません（削除された可能性があります）"]
+        if head and last.chain_hash != head:
+            errors.append(f"#{since}: 前回の監査で控えたハッシュ値と一致しません")
+        if last.compute_chain_hash() != last.chain_hash:
+            errors.append(f"#{since}: 内容がハッシュ値と一致しません（書き換えの可能性があります）")
+        previous = last.chain_hash
+        entries = entries.filter(pk__gt=since)
+
+    count = 0
+    for entry in entries.iterator(chunk_size=2000):
+        if entry.previous_hash != previous:
+            errors.append(f"#{entry.pk}: 前の行とつながっていません（行の削除・挿入の可能性があります）")
+        if entry.compute_chain_hash() != entry.chain_hash:
+            errors.append(f"#{entry.pk}: 内容がハッシュ値と一致しません（書き換えの可能性があります）")
+        previous, last = entry.chain_hash, entry
+        count += 1
+    return count, last, errors
+
+
+def verify_chain_documents(since=None, workers=None, mp_context=None):
+    """
+    ハッシュチェーンの since より後の行の原本を読み込み、追記時のハッシュ値と照合する。
+
+    Yields:
+        VerificationResult
+    """
+    from core.domain.models import DocumentHashChain
+
+    storages = {}
+    targets = []
+    entries = DocumentHashChain.objects.filter(pk__gt=since or 0).order_by('pk').values_list(
+        'doc_type', 'source_id', 'document_no', 'storage_key', 'sha256',
+    )
+    for doc_type, source_id, document_no, name, expected in entries.iterator(chunk_size=2000):
+        if doc_type not in storages:
+            storages[doc_type] = _file_storage(doc_type)
+        targets.append(_Target(doc_type, source_id, document_no, name, expected, storages[doc_type]))
+    yield from _verify(targets, workers, mp_context)
@@ -0,0 +1,266 @@
+"""
+Google Drive クライアント共通サービス
+
+注文書（orders）と売上請求書（billing）のアップロードで共有する。
+
+- 認証情報はプロセス内で1度だけ作成して使い回す（アクセストークンは期限切れ時のみ更新される）。
+  Drive API クライアント（httplib2）はスレッドセーフではないため、スレッドごとに作成して保持する。
+- 親フォルダ内のフォルダ名 → フォルダID を DriveFolderCache テーブルに保存し、
+  アップロードのたびにフォルダを検索しない。キャッシュしたフォルダが削除されていた場合（404）は
+  キャッシュを破棄して検索・作成し直す。
+- 計測・検証では override_drive_service で Drive API クライアントを差し替える
+  （擬似 Drive は manage.py bench_drive_upload にある）
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# 認証プロファイル → スコープ
+SCOPES = {
+    # 注文書: 共有フォルダ配下にパートナー別フォルダを作成する
+    'orders': ['https://www.googleapis.com/auth/drive'],
+    # 売上請求書: 指定フォルダ（またはマイドライブ）へ保存する
+    'billing': ['https://www.googleapis.com/auth/drive.file'],
+}
+
+_credentials = {}
+_credentials_lock = threading.Lock()
+_local = threading.local()
+_override_service = None
+
+
+# ============================================================
+# クライアント
+# ============================================================
+
+def _build_credentials(profile):
+    import google.auth
+
+    scopes = SCOPES[profile]
+    if profile == 'orders':
+        sa_email = getattr(settings, 'GOOGLE_DRIVE_SERVICE_ACCOUNT', None)
+        # サービスアカウント偽装（組織ポリシーでJSON鍵作成が禁止されている場合）
+        if sa_email:
+            from google.auth import impersonated_credentials
+            source_credentials, _ = google.auth.default()
+            return impersonated_credentials.Credentials(
+                source_credentials=source_credentials,
+                target_principal=sa_email,
+                target_scopes=scopes,
+            )
+    else:
+        # サービスアカウントJSONが存在し、中身がある場合はそれを使用
+        cred_path = os.path.join(settings.BASE_DIR, 'credentials', 'drive-service-account.json')
+        if os.path.exists(cred_path) and os.path.getsize(cred_path) > 0:
+            from google.oauth2 import service_account
+            return service_account.Credentials.from_service_account_file(cred_path, scopes=scopes)
+
+    # ADC（Application Default Credentials）を直接使用
+    credentials, _ = google.auth.default(scopes=scopes)
+    return credentials
+
+
+def _get_credentials(profile):
+    """認証情報を取得する（プロセス内で共有）"""
+    credentials = _credentials.get(profile)
+    if credentials is None:
+        with _credentials_lock:
+            credentials = _credentials.get(profile)
+            if credentials is None:
+                credentials = _credentials[profile] = _build_credentials(profile)
+    return credentials
+
+
+def get_drive_service(profile='orders'):
+    """
+    Drive API クライアントを取得する（スレッドごとに1つ作成して再利用する）。
+
+    Args:
+        profile: 認証プロファイル（'orders' / 'billing'）
+    """
+    if _override_service is not None:
+        return _override_service
+
+    services = getattr(_local, 'services', None)
+    if services is None:
+        services = _local.services = {}
+    service = services.get(profile)
+    if service is None:
+        from googleapiclient.discovery import build
+        service = services[profile] = build(
+            'drive', 'v3', credentials=_get_credentials(profile), cache_discovery=False,
+        )
+    return service
+
+
+def reset_drive_clients():
+    """認証情報・クライアントを破棄する（認証設定の変更時や検証用）"""
+    with _credentials_lock:
+        _credentials.clear()
+    _local.services = {}
+
+
+@contextmanager
+def override_drive_service(service):
+    """ブロック内ではすべてのプロファイル・スレッドで service を Drive API クライアントとして使う（計測・検証用）"""
+    global _override_service
+    previous, _override_service = _override_service, service
+    try:
+        yield service
+    finally:
+        _override_service = previous
+
+
+def is_not_found(error):
+    """Drive API のエラーが 404（ファイル・フォルダが存在しない）かどうか"""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    return str(status) == '404'
+
+
+def _quote(value):
+    """検索クエリ内の文字列リテラルをエスケープする"""
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+# ============================================================
+# フォルダIDキャッシュ
+# ============================================================
+
+def find_or_create_folder(service, name, parent_id):
+    """
+    親フォルダ内のフォルダIDを取得する（なければ作成する）。
+    一度取得したフォルダIDは DriveFolderCache に保存し、次回以降は API を呼ばない。
+    """
+    from core.domain.models import DriveFolderCache
+
+    cached = DriveFolderCache.objects.filter(parent_id=parent_id, name=name).values_list('folder_id', flat=True).first()
+    if cached:
+        return cached
+
+    files = _folder_query(service, name, parent_id).execute().get('files', [])
+    if files:
+        folder_id = files[0]['id']
+    else:
+        folder_id = _folder_create(service, name, parent_id).execute()['id']
+        logger.info(f"Created Drive folder: {name} (id={folder_id})")
+
+    _store_folder_ids(parent_id, {name: folder_id})
+    return folder_id
+
+
+def find_or_create_folders(service, names, parent_id):
+    """
+    親フォルダ内の複数のフォルダIDをまとめて取得する（なければ作成する）。
+    キャッシュにないフォルダの検索・作成はそれぞれバッチリクエストで実行する。
+
+    Returns:
+        dict: {フォルダ名: フォルダID}
+    """
+    from core.domain.models import DriveFolderCache
+
+    names = list(dict.fromkeys(names))
+    folder_ids = dict(
+        DriveFolderCache.objects.filter(parent_id=parent_id, name__in=names).values_list('name', 'folder_id')
+    )
+    missing = [name for name in names if name not in folder_ids]
+    if not missing:
+        return folder_ids
+
+    to_create = []
+    found = execute_batch(service, [_folder_query(service, name, parent_id) for name in missing])
+    for name, (response, exception) in zip(missing, found):
+        if exception is not None:
+            raise exception
+        files = response.get('files', [])
+        if files:
+            folder_ids[name] = files[0]['id']
+        else:
+            to_create.append(name)
+
+    created = execute_batch(service, [_folder_create(service, name, parent_id) for name in to_create])
+    for name, (response, exception) in zip(to_create, created):
+        if exception is not None:
+            raise exception
+        folder_ids[name] = response['id']
+        logger.info(f"Created Drive folder: {name} (id={response['id']})")
+
+    _store_folder_ids(parent_id, {name: folder_ids[name] for name in missing})
+    return folder_ids
+
+
+def _folder_query(service, name, parent_id):
+    query = (
+        f"name='{_quote(name)}' and "
+        f"'{parent_id}' in parents and "
+        f"mimeType='{FOLDER_MIME_TYPE}' and "
+        f"trashed=false"
+    )
+    return service.files().list(
+        q=query, spaces='drive', fields='files(id, name)', pageSize=1,
+        supportsAllDrives=True, includeItemsFromAllDrives=True
+    )
+
+
+def _folder_create(service, name, parent_id):
+    file_metadata = {
+        'name': name,
+        'mimeType': FOLDER_MIME_TYPE,
+        'parents': [parent_id],
+    }
+    return service.files().create(body=file_metadata, fields='id', supportsAllDrives=True)
+
+
+def _store_folder_ids(parent_id, folder_ids):
+    from core.domain.models import DriveFolderCache
+    for name, folder_id in folder_ids.items():
+        try:
+            DriveFolderCache.objects.update_or_create(
+                parent_id=parent_id, name=name, defaults={'folder_id': folder_id},
+            )
+        except IntegrityError:
+            # 他のスレッド・プロセスが同時に登録した
+            pass
+
+
+def invalidate_folder(folder_id):
+    """削除・移動されたフォルダのキャッシュを破棄する（配下のフォルダも含む）"""
+    from core.domain.models import DriveFolderCache
+    DriveFolderCache.objects.filter(folder_id=folder_id).delete()
+    DriveFolderCache.objects.filter(parent_id=folder_id).delete()
+
+
+# ============================================================
+# バッチリクエスト
+# ============================================================
+
+# Drive API のバッチリクエストに含められる最大件数
+BATCH_SIZE = 100
+
+
+def execute_batch(service, requests):
+    """
+    メタデータ操作（検索・フォルダ作成・ファイル作成など、ファイル本体を送らない操作）を
+    バッチリクエストにまとめて実行する。
+
+    Returns:
+        list: 各リクエストの (レスポンス, 例外) を requests と同じ順序で返す
+    """
+    results = [(None, None)] * len(requests)
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    for start in range(0, len(requests), BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=callback)
+        for index, request in enumerate(requests[start:start + BATCH_SIZE], start):
+            batch.add(request, request_id=str(index))
+        batch.execute()
+    return results
@@ -0,0 +1,231 @@
+"""
+バックグラウンドジョブサービス
+
+Googleドライブへのアップロード・メール送信・電子署名依頼など、外部サービスの応答を待つ処理を
+リクエスト処理から切り離し、BackgroundJob テーブルに登録してワーカー（manage.py run_jobs）で実行する。
+
+- 失敗したジョブは指数バックオフ（JOB_RETRY_BASE_SECONDS × 2^(試行回数-1)）で再実行し、
+  最大試行回数に達したら FAILED とする。
+- 冪等キーを指定したジョブは一度だけ登録される（二重送信・二重アップロードの防止）。
+  失敗（FAILED）したジョブのみ、同じキーで再登録できる。
+- 実行中のジョブは JOB_HEARTBEAT_INTERVAL 秒ごとに locked_at を更新する（長時間の処理でも他のワーカーに
+  取得されない）。更新が JOB_LOCK_TIMEOUT 秒途絶えたジョブはワーカーが停止したとみなし、再実行対象に戻す。
+
+バックエンド（settings.JOB_QUEUE_BACKEND）:
+  'database'  : ジョブを登録し、ワーカーで実行する（本番用）
+  'immediate' : 登録したトランザクションのコミット直後に同じプロセスで実行する（ローカル・検証用）
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.domain.models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _target_fields(target):
+    if target is None:
+        return {'target_model': '', 'target_id': ''}
+    return {'target_model': target._meta.label, 'target_id': str(target.pk)}
+
+
+def enqueue(task, payload=None, *, label='', target=None, idempotency_key=None, max_attempts=None, delay=0):
+    """
+    ジョブを登録する。
+
+    Args:
+        task: 実行する関数のパス（例: 'orders.services.tasks.upload_order_pdf_to_drive'）
+        payload: 関数にキーワード引数として渡す値（JSONに変換できること）
+        label: 画面に表示する処理名
+        target: 処理対象の書類（注文・請求書など）。画面でのステータス表示に使う
+        idempotency_key: 冪等キー。同じキーのジョブが登録済みなら新たに登録せずそれを返す
+        max_attempts: 最大試行回数（省略時は settings.JOB_MAX_ATTEMPTS）
+        delay: 実行を遅らせる秒数
+
+    Returns:
+        BackgroundJob
+    """
+    fields = {
+        'task': task,
+        'label': label,
+        'payload': payload or {},
+        'max_attempts': max_attempts or _setting('JOB_MAX_ATTEMPTS', 5),
+        'run_at': timezone.now() + timedelta(seconds=delay),
+        **_target_fields(target),
+    }
+    if idempotency_key:
+        try:
+            with transaction.atomic():
+                job, created = BackgroundJob.objects.get_or_create(idempotency_key=idempotency_key, defaults=fields)
+        except IntegrityError:
+            # 他のリクエストが同時に登録した
+            job, created = BackgroundJob.objects.get(idempotency_key=idempotency_key), False
+        if not created:
+            if job.status != 'FAILED':
+                logger.info(f"Job already enqueued: {idempotency_key} ({job.get_status_display()})")
+                return job
+            # 失敗済みのジョブは引数を更新して再登録する
+            BackgroundJob.objects.filter(pk=job.pk, status='FAILED').update(
+                attempts=0, status='PENDING', finished_at=None, updated_at=timezone.now(), **fields,
+            )
+            job.refresh_from_db()
+    else:
+        job = BackgroundJob.objects.create(**fields)
+
+    if _setting('JOB_QUEUE_BACKEND', 'database') == 'immediate':
+        transaction.on_commit(lambda: _run_immediately(job.pk))
+    return job
+
+
+def _run_immediately(job_id):
+    """immediate バックエンド: コミット直後にその場で実行する（再試行は行わない）"""
+    job = _claim(BackgroundJob.objects.get(pk=job_id), f"immediate:{os.getpid()}")
+    if job is not None:
+        run_job(job, retry=False)
+
+
+def _claim(job, worker_id):
+    """ジョブを実行中に更新する。他のワーカーが先に取得していた場合は None を返す"""
+    now = timezone.now()
+    claimed = BackgroundJob.objects.filter(pk=job.pk, status='PENDING').update(
+        status='RUNNING', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def backoff_seconds(attempts):
+    """試行回数に応じた再実行までの待ち時間（指数バックオフ＋ゆらぎ）"""
+    base = _setting('JOB_RETRY_BASE_SECONDS', 30)
+    limit = _setting('JOB_RETRY_MAX_SECONDS', 3600)
+    delay = min(limit, base * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class _Heartbeat:
+    """ジョブの実行中、別スレッドで locked_at を定期的に更新する"""
+
+    def __init__(self, job):
+        self.job = job
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"job-heartbeat-{job.pk}", daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        interval = _setting('JOB_HEARTBEAT_INTERVAL', 60)
+        try:
+            while not self.stopped.wait(interval):
+                try:
+                    extended = BackgroundJob.objects.filter(
+                        pk=self.job.pk, status='RUNNING', locked_by=self.job.locked_by,
+                    ).update(locked_at=timezone.now())
+                except Exception as e:
+                    logger.warning(f"Job {self.job.pk} heartbeat failed: {e}")
+                    continue
+                if not extended:
+                    logger.warning(f"Job {self.job.pk} ({self.job.task}) is no longer locked by {self.job.locked_by}")
+                    return
+        finally:
+            connection.close()
+
+
+def run_job(job, retry=True):
+    """
+    取得済み（RUNNING）のジョブを実行し、結果を記録する。
+
+    Returns:
+        bool: 成功したかどうか
+    """
+    try:
+        func = import_string(job.task)
+        with _Heartbeat(job):
+            func(**job.payload)
+    except Exception as e:
+        error = f"{e.__class__.__name__}: {e}\n{traceback.format_exc(limit=5)}"
+        logger.warning(f"Job {job.pk} ({job.task}) failed (attempt {job.attempts}/{job.max_attempts}): {e}")
+        if retry and job.attempts < job.max_attempts:
+            BackgroundJob.objects.filter(pk=job.pk).update(
+                status='PENDING', locked_by='', locked_at=None, last_error=error,
+                run_at=timezone.now() + timedelta(seconds=backoff_seconds(job.attempts)),
+                updated_at=timezone.now(),
+            )
+        else:
+            BackgroundJob.objects.filter(pk=job.pk).update(
+                status='FAILED', locked_by='', locked_at=None, last_error=error,
+                finished_at=timezone.now(), updated_at=timezone.now(),
+            )
+        return False
+
+    BackgroundJob.objects.filter(pk=job.pk).update(
+        status='SUCCEEDED', locked_by='', locked_at=None, last_error='',
+        finished_at=timezone.now(), updated_at=timezone.now(),
+    )
+    return True
+
+
+def release_stale_jobs():
+    """ワーカー停止などで実行中のまま残った（locked_at の更新が途絶えた）ジョブを再実行対象に戻す"""
+    timeout = _setting('JOB_LOCK_TIMEOUT', 600)
+    stale = timezone.now() - timedelta(seconds=timeout)
+    return BackgroundJob.objects.filter(status='RUNNING', locked_at__lt=stale).update(
+        status='PENDING', locked_by='', locked_at=None, run_at=timezone.now(),
+        last_error='実行中にワーカーが停止したため再実行します。',
+    )
+
+
+def run_pending_jobs(worker_id=None, limit=10):
+    """
+    実行予定日時を過ぎたジョブを最大 limit 件取得して実行する。
+
+    Returns:
+        int: 実行したジョブの件数
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    candidates = BackgroundJob.objects.filter(
+        status='PENDING', run_at__lte=timezone.now()
+    ).order_by('run_at', 'pk')[:limit]
+
+    executed = 0
+    for job in list(candidates):
+        job = _claim(job, worker_id)
+        if job is None:
+            continue
+        run_job(job)
+        executed += 1
+    return executed
+
+
+def retry_job(job):
+    """失敗したジョブを再実行対象に戻す（試行回数はリセットする）"""
+    BackgroundJob.objects.filter(pk=job.pk).exclude(status='RUNNING').update(
+        status='PENDING', attempts=0, run_at=timezone.now(), finished_at=None, updated_at=timezone.now(),
+    )
+
+
+def jobs_for(target, limit=10):
+    """書類に紐付くジョブを新しい順に取得する（詳細画面での状況表示用）"""
+    return BackgroundJob.objects.filter(**_target_fields(target)).order_by('-created_at')[:limit]
@@ -0,0 +1,129 @@
+"""
+一覧画面のキーセット（カーソル）ページ送り
+
+OFFSET による件数指定のページ送りと異なり、前ページの最後の行の並び順キー
+（例: 注文日・注文番号）より後ろの行を取得するため、履歴が増えても1ページの取得にかかる
+時間・メモリは一定になる。並び順キーと同じ列の複合インデックスを用意すること。
+
+- 並び順キーは NULL を含まず、最後のキー（主キーなど）で一意に定まること
+- カーソルは最後の行のキーの値を JSON にして URL 用 Base64 にしたもの
+  （条件の絞り込みはビュー側のクエリセットで行うため、カーソルを書き換えても
+  閲覧できる範囲は変わらない）
+- 画面には「さらに表示」リンクを出し、core/_load_more.html で次のページの行を追記する
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+
+
+class InvalidCursor(ValueError):
+    """カーソルの形式が不正"""
+
+
+class KeysetPage:
+    """キーセットページ送りの1ページ分"""
+
+    def __init__(self, object_list, next_cursor, cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return not self.cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _parse_keys(model, keys):
+    """('-order_date', 'order_id') → [(フィールド, 降順か)]"""
+    return [(model._meta.get_field(key.lstrip('-')), key.startswith('-')) for key in keys]
+
+
+def encode_cursor(obj, keys):
+    fields = _parse_keys(type(obj), keys)
+    values = [field.value_to_string(obj) for field, _descending in fields]
+    return base64.urlsafe_b64encode(json.dumps(values, ensure_ascii=False).encode()).decode().rstrip('=')
+
+
+def decode_cursor(model, keys, cursor):
+    fields = _parse_keys(model, keys)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise InvalidCursor(cursor)
+        return [field.to_python(value) for (field, _descending), value in zip(fields, values)]
+    except (ValueError, TypeError, ValidationError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def _after(keys, fields, values):
+    """並び順で values より後ろの行の条件（(a, b, c) の辞書式比較を OR/AND に展開する）"""
+    condition = Q()
+    for position, (field, descending) in enumerate(fields):
+        step = Q(**{f"{field.attname}__{'lt' if descending else 'gt'}": values[position]})
+        for (prev_field, _descending), prev_value in zip(fields[:position], values[:position]):
+            step &= Q(**{prev_field.attname: prev_value})
+        condition |= step
+    return condition
+
+
+def paginate_keyset(queryset, keys, cursor=None, per_page=DEFAULT_PAGE_SIZE):
+    """
+    クエリセットをキーセットでページ送りする。
+
+    Args:
+        keys: 並び順キー（例: ('-order_date', '-order_id')）。最後のキーで行が一意に定まること
+        cursor: 前ページの next_cursor（先頭ページは None）
+
+    Returns:
+        KeysetPage
+
+    Raises:
+        InvalidCursor: カーソルの形式が不正
+    """
+    fields = _parse_keys(queryset.model, keys)
+    queryset = queryset.order_by(*keys)
+    if cursor:
+        queryset = queryset.filter(_after(keys, fields, decode_cursor(queryset.model, keys, cursor)))
+
+    rows = list(queryset[:per_page + 1])
+    next_cursor = encode_cursor(rows[per_page - 1], keys) if len(rows) > per_page else None
+    return KeysetPage(rows[:per_page], next_cursor, cursor)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView / TemplateView 用のキーセットページ送り。
+
+    ListView では paginate_queryset を置き換え、テンプレートには通常のページ送りと同じく
+    object_list（context_object_name）と page_obj（KeysetPage）・is_paginated を渡す。
+    TemplateView では get_keyset_page(queryset) を呼ぶ。
+    """
+    keyset_ordering = None
+    paginate_by = DEFAULT_PAGE_SIZE
+    cursor_kwarg = 'cursor'
+
+    def get_keyset_page(self, queryset):
+        cursor = self.request.GET.get(self.cursor_kwarg) or None
+        try:
+            return paginate_keyset(queryset, self.keyset_ordering, cursor, self.paginate_by)
+        except InvalidCursor:
+            # 不正なカーソルは先頭ページとして扱う
+            return paginate_keyset(queryset, self.keyset_ordering, None, self.paginate_by)
+
+    def paginate_queryset(self, queryset, page_size):
+        page = self.get_keyset_page(queryset)
+        return None, page, page.object_list, page.has_next or not page.is_first
@@ -0,0 +1,344 @@
+"""
+PDFレンダリングキャッシュ
+
+注文書・注文請書・請求書・支払通知書・売上請求書のPDFを、
+PDFに反映されるすべての入力（書類本体・明細・自社情報・印影画像など）の
+フィンガープリントをキーとして保存し、同一内容の再描画を省略する。
+
+キーは入力内容から算出されるため、入力が変わればキーも変わり古いエントリは参照されなくなる
+（コンテンツアドレス方式）。参照されなくなったエントリは容量上限を超えた時点で
+最終アクセスの古い順（LRU）に削除される。容量の確認（全エントリの走査）は書き込みのたびには行わず、
+推定容量が上限を超えた場合と settings.PDF_CACHE_EVICT_INTERVAL 秒ごとにだけ行う。
+
+バックエンド（settings.PDF_CACHE_BACKEND）:
+  'local' : ローカルディスク（settings.PDF_CACHE_DIR）
+  'media' : メディアストレージ（default_storage の pdf_cache/ 配下）
+  'none'  : キャッシュしない
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models.fields.files import FieldFile
+
+logger = logging.getLogger(__name__)
+
+# 描画ロジックを変更した場合はこの値を上げ、既存キャッシュを無効化する
+RENDER_VERSION = 1
+
+# 容量上限を超えた場合に、上限のこの割合まで削除する（上限付近で書き込みのたびに走査しない）
+EVICT_TARGET_RATIO = 0.9
+
+
+# ============================================================
+# フィンガープリント
+# ============================================================
+
+def _file_signature(field_file):
+    """ファイルフィールドの識別情報（名前＋サイズ）"""
+    if not field_file:
+        return None
+    try:
+        size = field_file.storage.size(field_file.name)
+    except Exception:
+        size = None
+    return {'name': field_file.name, 'size': size}
+
+
+def _serialize(value):
+    """フィンガープリント用にモデル・クエリセット等をJSON化可能な値へ変換する"""
+    if value is None:
+        return None
+    if isinstance(value, models.Model):
+        data = {'__model__': value._meta.label}
+        for field in value._meta.concrete_fields:
+            field_value = getattr(value, field.attname)
+            if isinstance(field_value, FieldFile):
+                # 印影・ロゴ等の画像は差し替えを検知するためサイズも含める
+                field_value = _file_signature(field_value)
+            data[field.attname] = field_value
+        return data
+    if isinstance(value, (models.QuerySet, list, tuple)):
+        return [_serialize(v) for v in value]
+    return value
+
+
+def fingerprint(kind, inputs):
+    """
+    書類種別と入力一式からキャッシュキー（SHA-256）を算出する。
+
+    Args:
+        kind: 書類種別（'order', 'order_draft', 'acceptance', 'invoice' など）
+        inputs: PDFに反映されるモデルインスタンス・クエリセットのリスト
+    """
+    payload = json.dumps(
+        {'version': RENDER_VERSION, 'kind': kind, 'inputs': _serialize(list(inputs))},
+        cls=DjangoJSONEncoder, sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# ============================================================
+# バックエンド
+# ============================================================
+
+class BasePDFCacheBackend:
+    """PDFキャッシュバックエンドの基底クラス"""
+
+    def get(self, key):
+        raise NotImplementedError()
+
+    def set(self, key, data):
+        raise NotImplementedError()
+
+    def clear(self):
+        raise NotImplementedError()
+
+
+class NullPDFCacheBackend(BasePDFCacheBackend):
+    """キャッシュ無効時のバックエンド"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, data):
+        pass
+
+    def clear(self):
+        pass
+
+
+class SizeLimitedPDFCacheBackend(BasePDFCacheBackend):
+    """
+    容量上限を持つキャッシュの基底クラス。
+
+    前回の走査で得た容量にこのプロセスで書き込んだ容量を加えて推定し、推定容量が上限を超えた場合か、
+    前回の走査から settings.PDF_CACHE_EVICT_INTERVAL 秒が過ぎた場合（他のプロセスでの書き込みを反映する）
+    にだけ全エントリを走査して、最終アクセスの古い順に上限の EVICT_TARGET_RATIO まで削除する。
+    サブクラスは _entries（名前・サイズ・最終アクセス日時）と _remove を実装する。
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._estimated_bytes = None  # 前回の走査以降の書き込みを加えた推定容量（未走査は None）
+        self._scanned_at = 0.0
+
+    def _entries(self):
+        raise NotImplementedError()
+
+    def _remove(self, name):
+        raise NotImplementedError()
+
+    def _record_write(self, size):
+        """書き込んだ容量を推定容量に加え、必要な場合だけ走査・削除する"""
+        interval = getattr(settings, 'PDF_CACHE_EVICT_INTERVAL', 300)
+        with self._lock:
+            if self._estimated_bytes is not None:
+                self._estimated_bytes += size
+                if self._estimated_bytes <= self.max_bytes and time.monotonic() - self._scanned_at < interval:
+                    return
+            self._evict()
+
+    def _evict(self):
+        """全エントリを走査し、上限を超えていれば古い順に削除する（ロックを取得して呼ぶ）"""
+        entries = list(self._entries())
+        total = sum(size for _name, size, _accessed in entries)
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_TARGET_RATIO
+            for name, size, _accessed in sorted(entries, key=lambda e: e[2]):
+                self._remove(name)
+                total -= size
+                if total <= target:
+                    break
+        self._estimated_bytes = total
+        self._scanned_at = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            for name, _size, _accessed in list(self._entries()):
+                self._remove(name)
+            self._estimated_bytes = 0
+            self._scanned_at = time.monotonic()
+
+
+class LocalDiskPDFCacheBackend(SizeLimitedPDFCacheBackend):
+    """
+    ローカルディスク上のキャッシュ。
+    ファイルの更新日時を最終アクセス日時として扱い、容量超過時に古い順に削除する。
+    """
+
+    def __init__(self, location, max_bytes):
+        super().__init__(max_bytes)
+        self.location = str(location)
+
+    def _path(self, key):
+        return os.path.join(self.location, key[:2], f"{key}.pdf")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # LRU用に最終アクセス日時を更新
+        except OSError:
+            pass
+        return data
+
+    def set(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._record_write(len(data))
+
+    def _entries(self):
+        for root, _dirs, files in os.walk(self.location):
+            for name in files:
+                if not name.endswith('.pdf'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class MediaStoragePDFCacheBackend(SizeLimitedPDFCacheBackend):
+    """
+    メディアストレージ（default_storage）上のキャッシュ。
+    ストレージAPIでは最終アクセス日時を更新できないため、
+    プロセス内で記録したアクセス日時と作成日時の新しい方を基準に削除する。
+    """
+
+    prefix = 'pdf_cache'
+
+    def __init__(self, max_bytes, storage=None):
+        from django.core.files.storage import default_storage
+        super().__init__(max_bytes)
+        self.storage = storage or default_storage
+        self._last_access = {}
+
+    def _name(self, key):
+        return f"{self.prefix}/{key}.pdf"
+
+    def get(self, key):
+        name = self._name(key)
+        try:
+            with self.storage.open(name, 'rb') as f:
+                data = f.read()
+        except (FileNotFoundError, OSError):
+            return None
+        self._last_access[name] = time.time()
+        return data
+
+    def set(self, key, data):
+        from django.core.files.base import ContentFile
+        name = self._name(key)
+        if self.storage.exists(name):
+            self.storage.delete(name)
+        self.storage.save(name, ContentFile(data))
+        self._last_access[name] = time.time()
+        self._record_write(len(data))
+
+    def _entries(self):
+        try:
+            _dirs, files = self.storage.listdir(self.prefix)
+        except (FileNotFoundError, OSError):
+            return
+        for filename in files:
+            name = f"{self.prefix}/{filename}"
+            try:
+                size = self.storage.size(name)
+                modified = self.storage.get_modified_time(name).timestamp()
+            except (FileNotFoundError, OSError, NotImplementedError):
+                continue
+            yield name, size, max(modified, self._last_access.get(name, 0))
+
+    def _remove(self, name):
+        self.storage.delete(name)
+        self._last_access.pop(name, None)
+
+    def clear(self):
+        super().clear()
+        self._last_access.clear()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_pdf_cache():
+    """settings に従ってキャッシュバックエンドを取得する（プロセス内で共有）"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_type = getattr(settings, 'PDF_CACHE_BACKEND', 'local')
+                max_bytes = getattr(settings, 'PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+                if backend_type == 'local':
+                    location = getattr(settings, 'PDF_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'pdf'))
+                    _backend = LocalDiskPDFCacheBackend(location, max_bytes)
+                elif backend_type == 'media':
+                    _backend = MediaStoragePDFCacheBackend(max_bytes)
+                else:
+                    _backend = NullPDFCacheBackend()
+    return _backend
+
+
+def get_or_render(kind, inputs, render):
+    """
+    キャッシュ済みのPDFがあればそれを返し、なければ描画してキャッシュする。
+
+    Args:
+        kind: 書類種別
+        inputs: PDFに反映される入力一式（fingerprint() を参照）
+        render: PDFを描画して BytesIO を返す関数
+
+    Returns:
+        io.BytesIO: PDFデータ
+    """
+    cache = get_pdf_cache()
+    key = fingerprint(kind, inputs)
+    try:
+        data = cache.get(key)
+    except Exception as e:
+        logger.warning(f"PDF cache read failed ({kind}, {key}): {e}")
+        data = None
+
+    if data is None:
+        data = render().getvalue()
+        try:
+            cache.set(key, data)
+        except Exception as e:
+            # キャッシュの書き込み失敗は描画結果の返却を妨げない
+            logger.warning(f"PDF cache write failed ({kind}, {key}): {e}")
+
+    return io.BytesIO(data)
+
+
+def clear_pdf_cache():
+    """キャッシュを全削除する（自社情報の変更時など）"""
+    try:
+        get_pdf_cache().clear()
+    except Exception as e:
+        logger.warning(f"PDF cache clear failed: {e}")
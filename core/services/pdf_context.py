@@ -0,0 +1,125 @@
+"""
+PDF描画コンテキスト（ReportLab）
+
+注文書・注文請書・請求書・支払通知書の生成で共通に使うフォントと画像を、
+プロセスごとに一度だけ準備して使い回す。
+
+- 日本語CIDフォントの登録（初回はCMapの読み込みに時間がかかる）
+- 自社情報の印影・ロゴ画像を ImageReader として読み込み、デコード済みの状態で保持する
+  （画像の差し替えはファイル名・更新日時・サイズの変化で検知して読み直す）
+
+warm_up() は gunicorn のワーカー起動時（gunicorn.conf.py の post_worker_init）と
+一括生成のワーカープロセス起動時（core.services.batch_render）に呼び出し、
+起動直後の最初のPDF生成でも準備済みの状態で描画できるようにする。
+"""
+import io
+import logging
+import os
+import threading
+
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+logger = logging.getLogger(__name__)
+
+# 帳票で使う日本語フォント
+FONT_NAME = "HeiseiMin-W3"
+
+# 保持する画像の上限（印影・ロゴの差し替え前後が残る程度）
+MAX_IMAGES = 8
+
+_lock = threading.Lock()
+_images = {}
+
+
+def register_fonts():
+    """日本語フォントを登録する（登録済みなら何もしない）。フォント名を返す"""
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        with _lock:
+            if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+                pdfmetrics.registerFont(UnicodeCIDFont(FONT_NAME))
+    return FONT_NAME
+
+
+def _image_key(field):
+    """画像の差し替えを検知するためのキー"""
+    try:
+        stat = os.stat(field.path)
+        return (field.name, stat.st_mtime_ns, stat.st_size)
+    except (NotImplementedError, AttributeError):
+        # ローカルパスを持たないストレージ（GCS など）はファイル名で判定する
+        return (field.name, None, None)
+
+
+def _load_image(field):
+    try:
+        source = field.path
+    except (NotImplementedError, AttributeError):
+        with field.open('rb') as f:
+            source = io.BytesIO(f.read())
+    reader = ImageReader(source)
+    # 描画のたびにデコードしないよう、ここで画素データを展開しておく
+    reader.getRGBData()
+    return reader
+
+
+def get_image(field):
+    """
+    ImageField の画像を ImageReader として返す（未設定・読み込み失敗時は None）。
+
+    canvas.drawImage() にそのまま渡せる。
+    """
+    if not field:
+        return None
+    try:
+        key = _image_key(field)
+    except OSError as e:
+        logger.warning(f"PDF image not found: {field.name} ({e})")
+        return None
+
+    reader = _images.get(key)
+    if reader is not None:
+        return reader
+    with _lock:
+        reader = _images.get(key)
+        if reader is None:
+            try:
+                reader = _load_image(field)
+            except Exception as e:
+                logger.warning(f"PDF image load failed: {field.name} ({e})")
+                return None
+            if len(_images) >= MAX_IMAGES:
+                _images.clear()
+            _images[key] = reader
+    return reader
+
+
+def get_stamp_image(company):
+    """自社の印影画像（ImageReader）"""
+    return get_image(company.stamp_image) if company else None
+
+
+def get_logo_image(company):
+    """自社のロゴ画像（ImageReader）"""
+    return get_image(company.logo_image) if company else None
+
+
+def warm_up():
+    """
+    フォント登録と自社画像の読み込みを行う（プロセス起動時に1回呼び出す）。
+
+    DBに接続できない場合も起動は止めず、画像は最初の描画時に読み込む。
+    """
+    register_fonts()
+    # CIDフォントの文字幅テーブルを展開しておく
+    pdfmetrics.stringWidth("注文書請求書", FONT_NAME, 10)
+
+    try:
+        from core.services.company import get_company_info
+        company = get_company_info()
+    except Exception as e:
+        logger.warning(f"PDF warm-up skipped company images: {e}")
+        return
+    get_stamp_image(company)
+    get_logo_image(company)
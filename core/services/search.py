@@ -0,0 +1,388 @@
+"""
+横断検索サービス
+
+注文・請求書・パートナー・取引先・プロジェクト・売上請求書・請求先を1つの索引（SearchEntry）で
+部分一致検索する。索引の本文と検索語は同じ正規化（normalize）を通すため、全角・半角、
+カタカナ・ひらがな、空白の有無、（株）・㈱ と 株式会社 などの表記揺れを区別しない。
+
+- SQLite     : FTS5（trigram トークナイザ）の仮想テーブルをトリガーで SearchEntry と同期する
+- PostgreSQL : pg_trgm の GIN インデックスで LIKE '%語%' を索引検索にする
+- 上記が使えない場合・3文字未満の語は LIKE で検索する
+- 索引は書類・マスタの保存・削除時に更新する（core/signals.py）。bulk_create などシグナルを
+  送らない一括処理では update_search_index を呼ぶ。全件の作り直しは manage.py rebuild_search_index
+"""
+import functools
+import logging
+import re
+import unicodedata
+import uuid
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db import DatabaseError, connection, transaction
+from django.db.models import CharField, TextField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 50
+REBUILD_BATCH_SIZE = 500
+
+# モデル → 索引に含める値（__ で関連先をたどる。プロパティも可）と検索結果の表示名
+SEARCH_SOURCES = {
+    'core.Partner': {
+        'fields': ('partner_id', 'name', 'name_kana', 'email', 'registration_no'),
+        'title': ('name',),
+    },
+    'core.Customer': {
+        'fields': ('name', 'registration_no'),
+        'title': ('name',),
+    },
+    'orders.Project': {
+        'fields': ('project_id', 'name', 'customer__name'),
+        'title': ('name',),
+    },
+    'orders.Order': {
+        'fields': ('order_id', 'partner__name', 'partner__name_kana', 'project__name', 'remarks'),
+        'title': ('order_id', 'partner__name', 'project__name'),
+    },
+    'invoices.Invoice': {
+        'fields': (
+            'invoice_no', 'acceptance_no', 'order__order_id',
+            'order__partner__name', 'order__partner__name_kana', 'order__project__name',
+        ),
+        'title': ('invoice_no', 'order__partner__name', 'order__project__name'),
+    },
+    'billing.BillingCustomer': {
+        'fields': ('name', 'contact_person'),
+        'title': ('name',),
+    },
+    'billing.BillingInvoice': {
+        'fields': ('invoice_number', 'subject', 'notes', 'customer__name'),
+        'title': ('invoice_number', 'customer__name', 'subject'),
+    },
+}
+
+FTS_TABLE = 'core_searchentry_fts'
+TRGM_INDEX = 'core_searchentry_text_trgm'
+
+# 法人格の略記（NFKC 後の表記）→ 正式表記
+_COMPANY_ABBREVIATIONS = {
+    '(株)': '株式会社',
+    '(有)': '有限会社',
+    '(合)': '合同会社',
+    '(資)': '合資会社',
+    '(名)': '合名会社',
+}
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord('ァ'), ord('ヶ') + 1)}
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(value):
+    """検索用に正規化する（NFKC・小文字化・カタカナ→ひらがな・法人格の略記の展開・空白除去）"""
+    text = unicodedata.normalize('NFKC', str(value or '')).casefold()
+    for abbreviation, full in _COMPANY_ABBREVIATIONS.items():
+        text = text.replace(abbreviation, full)
+    return _SPACES.sub('', text.translate(_KATAKANA_TO_HIRAGANA))
+
+
+def _resolve(obj, path):
+    for name in path.split('__'):
+        if obj is None:
+            return ''
+        obj = getattr(obj, name, None)
+    return '' if obj is None else obj
+
+
+def _related_paths(label):
+    """select_related に渡す関連のパス（'order__partner__name' → 'order__partner'）"""
+    paths = {path.rsplit('__', 1)[0] for path in SEARCH_SOURCES[label]['fields'] if '__' in path}
+    return sorted(paths)
+
+
+def target_id(pk):
+    """索引の対象ID（UUID は区切りなしの16進。SQLite の保存形式と同じで、PostgreSQL でも uuid に変換できる）"""
+    return pk.hex if isinstance(pk, uuid.UUID) else str(pk)
+
+
+def build_entry(label, obj):
+    """インスタンスから (表示名, 検索用テキスト) を作る。値ごとに改行で区切り、値をまたいで一致させない"""
+    source = SEARCH_SOURCES[label]
+    title = ' '.join(str(value) for value in (_resolve(obj, path) for path in source['title']) if value)
+    text = '\n'.join(filter(None, (normalize(_resolve(obj, path)) for path in source['fields'])))
+    return title[:255], text
+
+
+# ----------------------------------------------------------------------
+# 索引の更新
+# ----------------------------------------------------------------------
+
+def update_search_index(label, pks):
+    """
+    指定した書類・マスタの索引を作成・更新する（内容が変わらない行は書き込まない）。
+    存在しなくなった行の索引は削除する。
+    """
+    from core.domain.models import SearchEntry
+
+    pks = list(pks)
+    if not pks or label not in SEARCH_SOURCES:
+        return
+    model = apps.get_model(label)
+    objects = {
+        target_id(obj.pk): obj
+        for obj in model._default_manager.select_related(*_related_paths(label)).filter(pk__in=pks)
+    }
+    existing = {
+        entry.target_id: entry
+        for entry in SearchEntry.objects.filter(target_model=label, target_id__in=[target_id(pk) for pk in pks])
+    }
+
+    created, changed = [], []
+    now = timezone.now()
+    for key, obj in objects.items():
+        title, text = build_entry(label, obj)
+        entry = existing.get(key)
+        if entry is None:
+            created.append(SearchEntry(target_model=label, target_id=key, title=title, text=text))
+        elif (entry.title, entry.text) != (title, text):
+            entry.title, entry.text = title, text
+            entry.updated_at = now  # bulk_update は auto_now を設定しない
+            changed.append(entry)
+    removed = [entry.pk for key, entry in existing.items() if key not in objects]
+
+    with transaction.atomic():
+        # FTS5 のトリガーは行単位で動くため、bulk_create / bulk_update でも索引が同期される
+        SearchEntry.objects.bulk_create(created, batch_size=REBUILD_BATCH_SIZE)
+        SearchEntry.objects.bulk_update(changed, ['title', 'text', 'updated_at'], batch_size=REBUILD_BATCH_SIZE)
+        if removed:
+            SearchEntry.objects.filter(pk__in=removed).delete()
+
+
+def _update_in_batches(label, pks, batch_size=REBUILD_BATCH_SIZE):
+    pks = list(pks)
+    for start in range(0, len(pks), batch_size):
+        update_search_index(label, pks[start:start + batch_size])
+
+
+def remove_from_search_index(label, pks):
+    from core.domain.models import SearchEntry
+    SearchEntry.objects.filter(target_model=label, target_id__in=[target_id(pk) for pk in pks]).delete()
+
+
+@functools.lru_cache(maxsize=None)
+def _dependents():
+    """
+    関連先モデル → {(索引対象のモデル, 関連先までのパス)}
+    （例: パートナー名を変更したら、そのパートナーの注文・請求書の索引も更新する）
+    """
+    result = {}
+    for label, source in SEARCH_SOURCES.items():
+        model = apps.get_model(label)
+        for path in source['fields']:
+            current, prefix = model, []
+            for name in path.split('__')[:-1]:
+                current = current._meta.get_field(name).related_model
+                prefix.append(name)
+                result.setdefault(current._meta.label, set()).add((label, '__'.join(prefix)))
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def _watched_fields(label):
+    """
+    保存時に索引の更新が必要なフィールド名（自モデル・関連元の索引に含まれる値）。
+    モデルのフィールドでない値（プロパティ）を含む場合は None（常に更新する）
+    """
+    model = apps.get_model(label)
+    names = {path.split('__')[0] for path in SEARCH_SOURCES.get(label, {}).get('fields', ())}
+    for dependent, prefix in _dependents().get(label, ()):
+        for path in SEARCH_SOURCES[dependent]['fields']:
+            if path.startswith(prefix + '__'):
+                names.add(path[len(prefix) + 2:].split('__')[0])
+    fields = set()
+    for name in names:
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        fields.update({field.name, field.attname})
+    return frozenset(fields)
+
+
+def on_save(sender, instance, update_fields=None, **kwargs):
+    """保存されたインスタンスと、その値を索引に含む関連元の索引を更新する"""
+    label = sender._meta.label
+    if update_fields is not None:
+        watched = _watched_fields(label)
+        if watched is not None and not watched & set(update_fields):
+            return
+    update_search_index(label, [instance.pk])
+    for dependent, prefix in _dependents().get(label, ()):
+        model = apps.get_model(dependent)
+        _update_in_batches(dependent, model._default_manager.filter(**{prefix: instance}).values_list('pk', flat=True))
+
+
+def on_delete(sender, instance, **kwargs):
+    remove_from_search_index(sender._meta.label, [instance.pk])
+
+
+def rebuild_search_index(labels=None, batch_size=REBUILD_BATCH_SIZE, stdout=None):
+    """索引を作り直す（対象の全件を batch_size 件ずつ更新し、存在しない行の索引を削除する）"""
+    from core.domain.models import SearchEntry
+
+    counts = {}
+    for label in labels or SEARCH_SOURCES:
+        model = apps.get_model(label)
+        pks = list(model._default_manager.order_by('pk').values_list('pk', flat=True))
+        _update_in_batches(label, pks, batch_size)
+        valid = {target_id(pk) for pk in pks}
+        stale = [
+            key for key in SearchEntry.objects.filter(target_model=label).values_list('target_id', flat=True)
+            if key not in valid
+        ]
+        remove_from_search_index(label, stale)
+        counts[label] = len(pks)
+        if stdout:
+            stdout.write(f"{label}: {len(pks)}件")
+    return counts
+
+
+# ----------------------------------------------------------------------
+# 検索エンジン（FTS5 / pg_trgm）の準備
+# ----------------------------------------------------------------------
+
+def ensure_search_backend(conn=None):
+    """
+    データベースに応じた全文検索の仕組みを作成する（マイグレーション・scripts/create_tables.py から呼ぶ）。
+
+    Returns:
+        str: 'fts5' / 'pg_trgm' / 'like'
+    """
+    conn = conn or connection
+    try:
+        with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+            if conn.vendor == 'sqlite':
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                    f"text, content='core_searchentry', content_rowid='id', tokenize='trigram')"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON core_searchentry BEGIN "
+                    f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON core_searchentry BEGIN "
+                    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF text ON core_searchentry BEGIN "
+                    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); "
+                    f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END"
+                )
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+                conn._search_has_fts = True
+                return 'fts5'
+            if conn.vendor == 'postgresql':
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON core_searchentry USING gin (text gin_trgm_ops)"
+                )
+                return 'pg_trgm'
+    except DatabaseError as e:
+        # FTS5 の trigram（SQLite 3.34 以降）や pg_trgm の拡張を作成する権限がない場合
+        logger.warning(f"Search backend unavailable, falling back to LIKE: {e}")
+    return 'like'
+
+
+def drop_search_backend(conn=None):
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+            conn._search_has_fts = False
+        elif conn.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {TRGM_INDEX}")
+
+
+def _has_fts(conn):
+    if conn.vendor != 'sqlite':
+        return False
+    if not hasattr(conn, '_search_has_fts'):
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            conn._search_has_fts = cursor.fetchone() is not None
+    return conn._search_has_fts
+
+
+# ----------------------------------------------------------------------
+# 検索
+# ----------------------------------------------------------------------
+
+def _terms(query):
+    """検索語を空白で区切り、それぞれ正規化する（すべての語を含む行を探す）"""
+    return [term for term in (normalize(word) for word in str(query or '').split()) if term]
+
+
+def search_entries(query, labels=None):
+    """
+    検索語に一致する索引のクエリセットを返す（並び順は未指定）。
+
+    Args:
+        query: 検索語（空白区切りで AND 検索）
+        labels: 対象のモデル（例: ['orders.Order']。省略時はすべて）
+    """
+    from core.domain.models import SearchEntry
+
+    terms = _terms(query)
+    entries = SearchEntry.objects.all()
+    if labels:
+        entries = entries.filter(target_model__in=list(labels))
+    if not terms:
+        return entries.none()
+
+    use_fts = _has_fts(connection)
+    for term in terms:
+        if use_fts and len(term) >= 3:
+            phrase = '"' + term.replace('"', '""') + '"'
+            entries = entries.filter(pk__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [phrase]
+            ))
+        else:
+            # PostgreSQL では pg_trgm の GIN インデックスが LIKE に使われる（3文字以上の語）
+            entries = entries.filter(text__contains=term)
+    return entries
+
+
+def search_ids(label, query):
+    """
+    検索語に一致する書類・マスタの主キーのサブクエリを返す。
+
+    例: BillingInvoice.objects.filter(pk__in=search_ids('billing.BillingInvoice', q))
+    """
+    pk_field = apps.get_model(label)._meta.pk
+    entries = search_entries(query, [label])
+    if isinstance(pk_field, (CharField, TextField)):
+        return entries.values('target_id')
+    # 数値の主キーと比較できるよう型を合わせる（PostgreSQL は文字列と数値を暗黙に比較しない）
+    return entries.annotate(target_pk=Cast('target_id', output_field=pk_field.__class__())).values('target_pk')
+
+
+def search(query, labels=None, limit=DEFAULT_LIMIT):
+    """検索語に一致する索引を、更新日時の新しい順に最大 limit 件返す"""
+    return list(search_entries(query, labels).order_by('-updated_at', '-id')[:limit])
+
+
+class SearchIndexAdminMixin:
+    """
+    ModelAdmin の検索欄を横断検索の索引で検索する（結合をまたぐ icontains の代わり）。
+    検索欄を表示するため search_fields は残しておく。
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=search_ids(self.model._meta.label, search_term)), False
@@ -0,0 +1,117 @@
+"""
+書類番号の採番サービス
+
+注文番号（MP+YYYYMMDD+連番）・請求番号（YYMM+連番）・プロジェクトID（PRJ+連番）・
+パートナーIDの連番を、キーごとのカウンタ行（DocumentSequence）を原子的に加算して払い出す。
+既存データの最大値を毎回検索する方式と異なり、1回の更新で採番でき、
+複数スレッド・複数プロセスから同時に採番しても番号は重複しない。
+
+カウンタ行が未作成のキーは、初回のみ seed で既存データの最大値を取得して作成する。
+以降に手入力などで採番を経ずに登録された番号は observe でカウンタに反映し、後の採番と重複させない。
+採番後に登録が失敗した場合、その番号は欠番となる（再利用しない）。
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.domain.models import DocumentSequence
+
+
+def _supports_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        import sqlite3
+        return sqlite3.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def _increment(key, count):
+    """カウンタを count だけ加算し、加算後の値を返す（行がなければ None）"""
+    if _supports_returning():
+        table = connection.ops.quote_name(DocumentSequence._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET last_value = last_value + %s, updated_at = %s "
+                f"WHERE {connection.ops.quote_name('key')} = %s RETURNING last_value",
+                [count, timezone.now(), key],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    # RETURNING 非対応のDBでは行ロックを取得してから加算する
+    sequence = DocumentSequence.objects.select_for_update().filter(key=key).first()
+    if sequence is None:
+        return None
+    DocumentSequence.objects.filter(pk=sequence.pk).update(
+        last_value=F('last_value') + count, updated_at=timezone.now()
+    )
+    return sequence.last_value + count
+
+
+def allocate(key, count=1, seed=None):
+    """
+    連番を count 件まとめて払い出し、先頭の番号を返す。
+
+    Args:
+        key: 採番キー（例: 'order:MP20260301'）
+        count: 払い出す件数（一括登録時のブロック確保用）
+        seed: カウンタ行の初回作成時に、既存データの最終番号を返す関数
+
+    Returns:
+        int: 払い出した番号の先頭（first から first + count - 1 までが確保される）
+    """
+    if count < 1:
+        raise ValueError("count は1以上を指定してください。")
+
+    with transaction.atomic():
+        last_value = _increment(key, count)
+        if last_value is None:
+            initial = seed() if seed else 0
+            try:
+                with transaction.atomic():
+                    DocumentSequence.objects.create(key=key, last_value=initial + count)
+                last_value = initial + count
+            except IntegrityError:
+                # 他のスレッド・プロセスが先に作成した
+                last_value = _increment(key, count)
+    return last_value - count + 1
+
+
+def observe(key, value):
+    """
+    採番を経ずに登録された番号をカウンタに反映する（カウンタがその番号より小さい場合のみ進める）。
+
+    カウンタ行が未作成の場合は何もしない（初回の採番時に seed で既存データの最大値から始まるため）。
+    """
+    DocumentSequence.objects.filter(key=key, last_value__lt=value).update(
+        last_value=value, updated_at=timezone.now()
+    )
+
+
+def sequence_number(value, prefix=''):
+    """接頭辞に続く連番部分を数値として返す（連番の形式でない場合は None）"""
+    if not value or not value.startswith(prefix):
+        return None
+    number = value[len(prefix):]
+    return int(number) if number.isdigit() else None
+
+
+def seed_from_last(queryset, field, prefix_length):
+    """
+    既存データの最大値（固定長の文字列ID）から連番部分を取り出す seed 関数を作る。
+
+    Args:
+        queryset: 同じ接頭辞のデータに絞り込んだクエリセット
+        field: IDのフィールド名
+        prefix_length: 連番より前の接頭辞の長さ
+    """
+    def seed():
+        last = queryset.order_by(f'-{field}').values_list(field, flat=True).first()
+        if not last:
+            return 0
+        try:
+            return int(last[prefix_length:])
+        except ValueError:
+            return 0
+    return seed
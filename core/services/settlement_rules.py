@@ -0,0 +1,63 @@
+"""
+SES精算ルール（基準時間に対する超過・不足の調整金）
+
+注文明細（OrderItem）と請求明細（InvoiceItem）の調整金はここで計算する。
+モデルやDBに依存しない純粋な関数で、1行ずつでも一括（明細のリスト）でも使える。
+
+    超過金額 = 切り捨て(超過単価 × (実稼働時間 - 上限))
+    控除金額 = 切り捨て(不足単価 × (下限 - 実稼働時間))
+    （切り捨ては 0 方向。従来の int(Decimal) と同じ）
+
+時間・工数は Decimal のまま計算する（C実装の decimal は整数への換算より速い）。
+
+注文明細と請求明細では、精算を行う条件が従来から異なるため、明細ごとの関数に直接書いている
+（一括計算の内側で呼ばれるため、明細ごとに型の変換やルールの判定をしない）。
+    order_item_price     : 実稼働時間が入力されている（> 0）場合のみ精算し、下限・上限は 0 でも判定する。
+                           下限・上限を両方満たす（下限 > 上限の）場合は不足を優先する
+    invoice_item_amounts : 下限・上限が設定されている（> 0）場合のみ、それぞれを判定する。
+                           実稼働時間 0 も不足として精算し、両方満たす場合は超過を優先する
+"""
+from decimal import Decimal
+
+
+def to_decimal(value):
+    """保存前のモデルの既定値（float）などを Decimal にそろえる（DBから読み込んだ値は変換不要）"""
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def base_amount(effort, base_fee):
+    """工数 × 基本料金（切り捨て）"""
+    return int(to_decimal(effort) * base_fee)
+
+
+def order_item_price(effort, base_fee, actual_hours, time_lower_limit, time_upper_limit, shortage_rate, excess_rate):
+    """
+    注文明細の金額を計算する。時間・工数は Decimal で渡す（保存前の既定値は to_decimal で変換する）。
+
+    Returns:
+        tuple: (工数 × 基本料金, 調整金（超過は正・不足は負）, 金額)
+    """
+    adjustment = 0
+    if actual_hours > 0:
+        if actual_hours < time_lower_limit:
+            adjustment = -int(shortage_rate * (time_lower_limit - actual_hours))
+        elif actual_hours > time_upper_limit:
+            adjustment = int(excess_rate * (actual_hours - time_upper_limit))
+    base = int(effort * base_fee)
+    return base, adjustment, base + adjustment
+
+
+def invoice_item_amounts(work_time, base_fee, time_lower_limit, time_upper_limit, shortage_rate, excess_rate):
+    """
+    請求明細の精算額を計算する。時間は Decimal で渡す。
+
+    Returns:
+        tuple: (超過金額, 控除金額, 明細金額)
+    """
+    if work_time > time_upper_limit and time_upper_limit > 0:
+        excess = int(excess_rate * (work_time - time_upper_limit))
+        return excess, 0, base_fee + excess
+    if work_time < time_lower_limit and time_lower_limit > 0:
+        shortage = int(shortage_rate * (time_lower_limit - work_time))
+        return 0, shortage, base_fee - shortage
+    return 0, 0, base_fee
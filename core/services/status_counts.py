@@ -0,0 +1,117 @@
+"""
+ステータス別件数・金額の集計サービス
+
+ダッシュボードに表示するステータス別件数と、未入金（未払）合計・期日超過合計を
+条件付き集計（COUNT/SUM ... FILTER）によりモデルごとに1クエリで取得する。
+
+集計結果は Django のキャッシュに短時間（settings.STATUS_COUNTS_CACHE_TIMEOUT 秒）保存する。
+キャッシュキーにはモデルごとの世代番号を含め、書類の保存・削除時に世代番号を
+進めることで古い集計結果を参照しないようにする（core/signals.py）。
+"""
+import datetime
+import hashlib
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+logger = logging.getLogger(__name__)
+
+# モデル → 集計設定
+#   amount_field: 金額の集計に使うフィールド（None の場合は件数のみ）
+#   due_field: 期日のフィールド
+#   unpaid_statuses: 未入金（未払）として扱うステータス
+STATUS_COUNT_SPECS = {
+    'orders.Order': {
+        'amount_field': None,
+    },
+    'invoices.Invoice': {
+        'amount_field': 'total_amount',
+        'due_field': 'payment_deadline',
+        'unpaid_statuses': ('ISSUED', 'SENT', 'CONFIRMED'),
+    },
+    'billing.BillingInvoice': {
+        'amount_field': 'total_amount',
+        'due_field': 'due_date',
+        'unpaid_statuses': ('ISSUED', 'SENT'),
+    },
+}
+
+
+def _generation_key(label):
+    return f"status_counts:generation:{label}"
+
+
+def _cache_key(label, filters, today):
+    generation = cache.get(_generation_key(label), 0)
+    scope = hashlib.sha256(repr(sorted(filters.items())).encode()).hexdigest()[:16]
+    return f"status_counts:{label}:{generation}:{today.isoformat()}:{scope}"
+
+
+def _aggregate(model, spec, filters, today):
+    statuses = [value for value, _label in model._meta.get_field('status').choices]
+    expressions = {'total': Count('pk')}
+    for status in statuses:
+        expressions[status] = Count('pk', filter=Q(status=status))
+
+    amount_field = spec['amount_field']
+    if amount_field:
+        unpaid = Q(status__in=spec['unpaid_statuses'])
+        overdue = unpaid & Q(**{f"{spec['due_field']}__lt": today})
+        expressions['unpaid_amount'] = Sum(amount_field, filter=unpaid)
+        expressions['overdue_amount'] = Sum(amount_field, filter=overdue)
+        expressions['overdue_count'] = Count('pk', filter=overdue)
+
+    row = model.objects.filter(**filters).aggregate(**expressions)
+    result = {
+        'total': row['total'],
+        'by_status': {status: row[status] for status in statuses},
+    }
+    if amount_field:
+        result['unpaid_amount'] = row['unpaid_amount'] or 0
+        result['overdue_amount'] = row['overdue_amount'] or 0
+        result['overdue_count'] = row['overdue_count']
+    return result
+
+
+def get_status_counts(model_label, **filters):
+    """
+    ステータス別件数と未入金・期日超過の合計を取得する。
+
+    Args:
+        model_label: STATUS_COUNT_SPECS のキー（例: 'billing.BillingInvoice'）
+        **filters: 集計対象の絞り込み条件（例: partner_id='0000000001'）
+
+    Returns:
+        dict: {
+            'total': 全件数,
+            'by_status': {ステータス: 件数},
+            'unpaid_amount': 未入金（未払）合計,   # 金額を持つモデルのみ
+            'overdue_amount': 期日超過合計,
+            'overdue_count': 期日超過件数,
+        }
+    """
+    spec = STATUS_COUNT_SPECS[model_label]
+    model = apps.get_model(model_label)
+    today = datetime.date.today()
+
+    key = _cache_key(model_label, filters, today)
+    result = cache.get(key)
+    if result is None:
+        result = _aggregate(model, spec, filters, today)
+        cache.set(key, result, getattr(settings, 'STATUS_COUNTS_CACHE_TIMEOUT', 60))
+    return result
+
+
+def invalidate_status_counts(model_label):
+    """集計キャッシュの世代番号を進め、以降の取得で再集計させる"""
+    key = _generation_key(model_label)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+    except Exception as e:
+        logger.warning(f"Status counts invalidation failed: {e}")
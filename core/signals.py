@@ -1 +1,77 @@
-# Signals removed to avoid IntegrityError. Profile creation is handled in forms.
+"""
+モデルの保存・削除に連動する処理（キャッシュの破棄・横断検索の索引・書類台帳の更新）
+
+ユーザープロフィールの作成はシグナルでは行わない（IntegrityError を避けるためフォームで作成する）。
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .domain.models import CompanyInfo
+from .services.search import SEARCH_SOURCES
+
+
+@receiver(post_save, sender=CompanyInfo)
+@receiver(post_delete, sender=CompanyInfo)
+def invalidate_company_dependent_caches(sender, instance, **kwargs):
+    """自社情報（社名・印影等）が変わったら保持している自社情報とすべての書類PDFキャッシュを破棄する"""
+    from .services.company import invalidate_company_info
+    from .services.pdf_cache import clear_pdf_cache
+    invalidate_company_info()
+    clear_pdf_cache()
+
+
+def _invalidate_status_counts(sender, **kwargs):
+    """書類の保存・削除時にダッシュボードのステータス別集計キャッシュを破棄する"""
+    from .services.status_counts import invalidate_status_counts
+    invalidate_status_counts(sender._meta.label)
+
+
+for _label in ('orders.Order', 'invoices.Invoice', 'billing.BillingInvoice'):
+    post_save.connect(_invalidate_status_counts, sender=_label, dispatch_uid=f'status_counts:{_label}:save')
+    post_delete.connect(_invalidate_status_counts, sender=_label, dispatch_uid=f'status_counts:{_label}:delete')
+
+
+def _invalidate_terms(sender, **kwargs):
+    """支払条件・契約条件の保存・削除時に、保持している条件の対応表を破棄する"""
+    from orders.services.term_resolution import invalidate_terms
+    invalidate_terms()
+
+
+for _label in ('orders.PaymentTerm', 'orders.ContractTerm'):
+    post_save.connect(_invalidate_terms, sender=_label, dispatch_uid=f'terms:{_label}:save')
+    post_delete.connect(_invalidate_terms, sender=_label, dispatch_uid=f'terms:{_label}:delete')
+
+
+def _update_search_index(sender, **kwargs):
+    """書類・マスタの保存時に横断検索の索引（関連する書類の分も含む）を更新する"""
+    from .services.search import on_save
+    on_save(sender, **kwargs)
+
+
+def _remove_from_search_index(sender, **kwargs):
+    from .services.search import on_delete
+    on_delete(sender, **kwargs)
+
+
+# 索引の値はすべて索引対象のモデル自身か、同じく索引対象の関連先に含まれる
+for _label in SEARCH_SOURCES:
+    post_save.connect(_update_search_index, sender=_label, dispatch_uid=f'search:{_label}:save')
+    post_delete.connect(_remove_from_search_index, sender=_label, dispatch_uid=f'search:{_label}:delete')
+
+
+def _register_documents(sender, **kwargs):
+    """書類の発行・原本の保存時に書類台帳（電子帳簿保存法の検索用）を更新する"""
+    from .services.document_registry import on_save
+    on_save(sender, **kwargs)
+
+
+def _register_order_documents(sender, **kwargs):
+    """注文明細の変更で注文書・注文請書の金額が変わるため書類台帳を更新する"""
+    from .services.document_registry import on_order_item_change
+    on_order_item_change(sender, **kwargs)
+
+
+for _label in ('orders.Order', 'invoices.Invoice', 'billing.BillingInvoice'):
+    post_save.connect(_register_documents, sender=_label, dispatch_uid=f'document_registry:{_label}:save')
+post_save.connect(_register_order_documents, sender='orders.OrderItem', dispatch_uid='document_registry:orders.OrderItem:save')
+post_delete.connect(_register_order_documents, sender='orders.OrderItem', dispatch_uid='document_registry:orders.OrderItem:delete')
@@ -8,3 +8,14 @@ def format_currency(value):
         return "{:,}".format(int(value))
     except (ValueError, TypeError):
         return value
+
+
+@register.simple_tag(takes_context=True)
+def keyset_url(context, cursor):
+    """現在の絞り込み条件を保ったまま、キーセットページ送りのカーソルだけを差し替えたURL"""
+    params = context['request'].GET.copy()
+    params.pop('cursor', None)
+    if cursor:
+        params['cursor'] = cursor
+    query = params.urlencode()
+    return f"?{query}" if query else context['request'].path
@@ -12,5 +12,9 @@ urlpatterns = [
     path('staff/register-partner/', views.QuickPartnerRegistrationView.as_view(), name='quick_partner_registration'),
     path('staff/registration-success/', views.RegistrationSuccessView.as_view(), name='registration_success'),
     path('staff/partner-email-log/<str:customer_id>/', views.PartnerEmailLogView.as_view(), name='partner_email_log'),
+    path('staff/export-documents/', views.DocumentExportView.as_view(), name='document_export'),
+    path('staff/search/', views.SearchView.as_view(), name='search'),
+    path('staff/documents/', views.DocumentRegistryView.as_view(), name='document_registry'),
+    path('staff/documents/<int:pk>/download/', views.DocumentRecordDownloadView.as_view(), name='document_record_download'),
     path('contract-progress/', views.ContractProgressListView.as_view(), name='contract_progress_list'),
 ]
@@ -1,20 +1,26 @@
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib import messages
-from django.http import Http404
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.contrib.auth.views import PasswordChangeView
-from django.urls import reverse_lazy
+from django.urls import NoReverseMatch, reverse, reverse_lazy
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.db.models import Count, Q
 
+from django.views import View
 from django.views.generic import CreateView, UpdateView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from .forms import AdminCreationForm, PartnerUserCreationForm, PartnerOnboardingForm, QuickPartnerRegistrationForm
-from .domain.models import Partner, MasterContractProgress, SentEmailLog
+from .forms import AdminCreationForm, DocumentSearchForm, PartnerUserCreationForm, PartnerOnboardingForm, QuickPartnerRegistrationForm
+from .domain.models import DocumentRecord, Partner, MasterContractProgress, SentEmailLog
 from orders.models import Order
 from invoices.models import Invoice
+from .services.keyset import KeysetPaginationMixin
+from .services.status_counts import get_status_counts
+
+# ダッシュボードの各一覧に表示する最大件数
+DASHBOARD_LIST_LIMIT = 50
 
 @login_required
 def dashboard(request):
@@ -22,26 +28,35 @@ def dashboard(request):
     user = request.user
     partner = None
     if hasattr(user, 'profile') and user.profile.partner:
-        customer = user.profile.partner
+        partner = user.profile.partner
 
     # フィルター条件の構築
-    order_filter = Q()
-    invoice_filter = Q()
-
-    if not user.is_staff:
-        if hasattr(user, 'profile') and user.profile.partner:
-            customer = user.profile.partner
-            order_filter &= Q(partner=partner)
-            invoice_filter &= Q(order__partner=partner)
-        else:
-            # パートナーが紐付いていないユーザーは何も表示しない
-            order_filter = Q(pk__in=[])
-            invoice_filter = Q(pk__in=[])
-    
-    # 統計情報の取得
-    unconfirmed_orders = Order.objects.filter(order_filter, status='UNCONFIRMED').select_related('partner', 'project')
-    received_orders = Order.objects.filter(order_filter, status__in=['RECEIVED', 'APPROVED']).select_related('partner', 'project')
-    confirming_invoices = Invoice.objects.filter(invoice_filter, status__in=['ISSUED', 'SENT']).select_related('order__partner', 'order__project')
+    order_filter = {}
+    invoice_filter = {}
+    is_authorized = user.is_staff or (partner is not None)
+
+    if not user.is_staff and partner is not None:
+        order_filter = {'partner_id': partner.pk}
+        invoice_filter = {'order__partner_id': partner.pk}
+
+    if is_authorized:
+        # 統計情報の取得（ステータス別件数はモデルごとに1クエリで集計し、短時間キャッシュする）
+        order_counts = get_status_counts('orders.Order', **order_filter)['by_status']
+        invoice_counts = get_status_counts('invoices.Invoice', **invoice_filter)['by_status']
+        unconfirmed_count = order_counts['UNCONFIRMED']
+        received_count = order_counts['RECEIVED'] + order_counts['APPROVED']
+        confirming_count = invoice_counts['ISSUED'] + invoice_counts['SENT']
+
+        # 一覧は最新の一定件数のみ表示する
+        orders = Order.objects.filter(**order_filter).select_related('partner', 'project').order_by('-order_date')
+        invoices = Invoice.objects.filter(**invoice_filter).select_related('order__partner', 'order__project').order_by('-issue_date')
+        unconfirmed_orders = list(orders.filter(status='UNCONFIRMED')[:DASHBOARD_LIST_LIMIT])
+        received_orders = list(orders.filter(status__in=['RECEIVED', 'APPROVED'])[:DASHBOARD_LIST_LIMIT])
+        confirming_invoices = list(invoices.filter(status__in=['ISSUED', 'SENT'])[:DASHBOARD_LIST_LIMIT])
+    else:
+        # パートナーが紐付いていないユーザーは何も表示しない
+        unconfirmed_count = received_count = confirming_count = 0
+        unconfirmed_orders, received_orders, confirming_invoices = [], [], []
 
     # スタッフ用：契約進捗リスト
     contract_progress_list = []
@@ -49,13 +64,13 @@ def dashboard(request):
         contract_progress_list = MasterContractProgress.objects.select_related('partner').all().order_by('-updated_at')
 
     context = {
-        'unconfirmed_orders_count': unconfirmed_orders.count(),
-        'received_orders_count': received_orders.count(),
-        'confirming_invoices_count': confirming_invoices.count(),
+        'unconfirmed_orders_count': unconfirmed_count,
+        'received_orders_count': received_count,
+        'confirming_invoices_count': confirming_count,
         'unconfirmed_orders': unconfirmed_orders,
         'received_orders': received_orders,
         'confirming_invoices': confirming_invoices,
-        'is_authorized': user.is_staff or (partner is not None),
+        'is_authorized': is_authorized,
         'contract_progress_list': contract_progress_list,
     }
     return render(request, 'core/dashboard.html', context)
@@ -160,21 +175,25 @@ class RegistrationSuccessView(LoginRequiredMixin, StaffOnlyMixin, TemplateView):
         context['registered_password'] = self.request.session.get('last_registered_password', '')
         return context
 
-class PartnerEmailLogView(LoginRequiredMixin, StaffOnlyMixin, TemplateView):
+class PartnerEmailLogView(LoginRequiredMixin, StaffOnlyMixin, KeysetPaginationMixin, TemplateView):
     """送信済みメールの閲覧"""
     template_name = 'core/partner_email_log.html'
+    keyset_ordering = ('-sent_at', '-id')
+    paginate_by = 20
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        customer_id = self.kwargs.get('customer_id')
-        customer = Customer.objects.get(customer_id=customer_id)
-        context['customer'] = customer
-        context['email_logs'] = SentEmailLog.objects.filter(customer=customer).order_by('-sent_at')
+        # URLの customer_id はパートナーID（メールログはパートナーに紐付く）
+        partner = get_object_or_404(Partner, partner_id=self.kwargs.get('customer_id'))
+        context['customer'] = partner
+        context['page_obj'] = self.get_keyset_page(SentEmailLog.objects.filter(partner=partner))
+        context['email_logs'] = context['page_obj'].object_list
         return context
 
-class ContractProgressListView(LoginRequiredMixin, TemplateView):
+class ContractProgressListView(LoginRequiredMixin, KeysetPaginationMixin, TemplateView):
     """基本契約進捗一覧"""
     template_name = 'core/contract_progress_list.html'
+    keyset_ordering = ('-updated_at', '-id')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -182,7 +201,7 @@ class ContractProgressListView(LoginRequiredMixin, TemplateView):
         
         # スタッフユーザーのみ全ての進捗を表示、非スタッフは自分の進捗のみ表示
         if user.is_staff:
-            contract_progress_list = MasterContractProgress.objects.select_related('partner').all().order_by('-updated_at')
+            contract_progress_list = MasterContractProgress.objects.select_related('partner').all()
         else:
             # 非スタッフの場合、自分の顧客情報の進捗のみ表示
             if hasattr(user, 'profile') and user.profile.partner:
@@ -192,6 +211,137 @@ class ContractProgressListView(LoginRequiredMixin, TemplateView):
             else:
                 contract_progress_list = MasterContractProgress.objects.none()
         
-        context['contract_progress_list'] = contract_progress_list
+        context['page_obj'] = self.get_keyset_page(contract_progress_list)
+        context['contract_progress_list'] = context['page_obj'].object_list
         context['is_staff'] = user.is_staff
         return context
+
+
+class DocumentExportView(LoginRequiredMixin, StaffOnlyMixin, View):
+    """
+    書類PDFの一括ダウンロード（スタッフのみ。ZIP）
+
+    例: ?kind=invoice&month=2026-01
+        ?kind=invoice&kind=payment_notice&month=2026-01&partner=0000000001
+
+    1つのPDFへの結合は描画をすべて終えるまで送信を始められないため、manage.py export_documents で行う。
+    """
+
+    def get(self, request):
+        from .services.batch_render import DOCUMENT_KINDS
+        from .services.document_export import parse_month, select_documents, streaming_export_response
+
+        kinds = request.GET.getlist('kind')
+        if not kinds or any(kind not in DOCUMENT_KINDS for kind in kinds):
+            return HttpResponseBadRequest(f"kind は {', '.join(sorted(DOCUMENT_KINDS))} のいずれかを指定してください。")
+        if request.GET.get('format', 'zip') != 'zip':
+            return HttpResponseBadRequest(
+                "画面からのダウンロードは ZIP のみです。1つのPDFへの結合は manage.py export_documents --format pdf で行ってください。"
+            )
+
+        month = None
+        if request.GET.get('month'):
+            try:
+                month = parse_month(request.GET['month'])
+            except ValueError:
+                return HttpResponseBadRequest("month は YYYY-MM 形式で指定してください。")
+        statuses = request.GET.getlist('status') or None
+
+        targets = []
+        for kind in kinds:
+            pks = list(select_documents(kind, month, request.GET.get('partner'), statuses).values_list('pk', flat=True))
+            if pks:
+                targets.append((kind, pks))
+        if not targets:
+            raise Http404("対象の書類がありません。")
+
+        filename = f"{'_'.join(kinds)}_{request.GET.get('month') or 'all'}"
+        return streaming_export_response(targets, filename)
+
+
+class SearchView(LoginRequiredMixin, StaffOnlyMixin, View):
+    """
+    横断検索（注文・請求書・パートナー・取引先・プロジェクト・売上請求書・請求先）
+
+    GET パラメータ:
+        q: 検索語（空白区切りで AND 検索。全角・半角、カタカナ・ひらがなを区別しない）
+        model: 対象のモデル（例: orders.Order。複数指定可、省略時はすべて）
+        limit: 最大件数（既定 50、最大 200）
+    """
+    max_limit = 200
+
+    def get(self, request):
+        from .services.search import DEFAULT_LIMIT, SEARCH_SOURCES, search
+
+        labels = request.GET.getlist('model')
+        if any(label not in SEARCH_SOURCES for label in labels):
+            return HttpResponseBadRequest(f"model は {', '.join(SEARCH_SOURCES)} のいずれかを指定してください。")
+        try:
+            limit = min(int(request.GET.get('limit', DEFAULT_LIMIT)), self.max_limit)
+        except ValueError:
+            return HttpResponseBadRequest("limit は数値で指定してください。")
+
+        results = []
+        for entry in search(request.GET.get('q', ''), labels, limit):
+            app_label, model_name = entry.target_model.lower().split('.')
+            try:
+                url = reverse(f'admin:{app_label}_{model_name}_change', args=[entry.target_id])
+            except NoReverseMatch:
+                url = ''
+            results.append({
+                'model': entry.target_model,
+                'id': entry.target_id,
+                'title': entry.title,
+                'url': url,
+            })
+        return JsonResponse({'results': results})
+
+
+class DocumentRegistryView(LoginRequiredMixin, StaffOnlyMixin, KeysetPaginationMixin, TemplateView):
+    """
+    書類台帳の検索（電子帳簿保存法の検索要件）
+
+    取引年月日・取引金額の範囲と取引先で、注文書・注文請書・請求書・売上請求書を横断して検索する。
+    """
+    template_name = 'core/document_registry.html'
+    keyset_ordering = ('-transaction_date', '-id')
+
+    def get_context_data(self, **kwargs):
+        from .services.document_registry import find_documents
+
+        context = super().get_context_data(**kwargs)
+        form = DocumentSearchForm(self.request.GET or None)
+        if form.is_bound and not form.is_valid():
+            records = DocumentRecord.objects.none()
+        else:
+            conditions = form.cleaned_data if form.is_bound else {}
+            records = find_documents(
+                date_from=conditions.get('date_from'), date_to=conditions.get('date_to'),
+                amount_min=conditions.get('amount_min'), amount_max=conditions.get('amount_max'),
+                counterparty=conditions.get('counterparty'), doc_types=conditions.get('doc_type'),
+            )
+        context['form'] = form
+        context['page_obj'] = self.get_keyset_page(records)
+        context['records'] = context['page_obj'].object_list
+        return context
+
+
+class DocumentRecordDownloadView(LoginRequiredMixin, StaffOnlyMixin, View):
+    """書類台帳の行の原本を返す（元の書類が削除済みの場合は 404）"""
+
+    def get(self, request, pk):
+        from django.apps import apps
+        from .services.document_download import serve_document
+        from .services.document_lifecycle import FROZEN_DOCUMENTS, frozen_document_response
+
+        record = get_object_or_404(DocumentRecord, pk=pk)
+        model = apps.get_model(record.source_model)
+        source = model._default_manager.filter(pk=record.source_id).first()
+        if source is None:
+            raise Http404("元の書類は削除されています。")
+        if record.doc_type in FROZEN_DOCUMENTS:
+            return frozen_document_response(request, source, record.doc_type)
+        if source.pdf_file:
+            return serve_document(request, source.pdf_file, f"invoice_{source.invoice_number}.pdf")
+        # 売上請求書はPDFを保存していない場合、請求書の内容から描画する
+        return redirect('billing:invoice_pdf_download', pk=source.pk)
@@ -0,0 +1,20 @@
+"""
+gunicorn 設定
+
+起動コマンドの引数（--bind / --workers など）はそのまま使い、ここではワーカー起動時の処理のみ定義する。
+gunicorn は作業ディレクトリの gunicorn.conf.py を自動で読み込む。
+"""
+
+
+def post_worker_init(worker):
+    """ワーカー起動時にPDF生成用のフォント・画像を準備しておく（起動直後のPDF生成を速くする）"""
+    from django.db import connections
+    from core.services.pdf_context import warm_up
+
+    try:
+        warm_up()
+    except Exception as e:
+        worker.log.warning(f"PDF warm-up failed: {e}")
+    finally:
+        # 準備に使ったDB接続はリクエスト処理のスレッドでは使わないため閉じておく
+        connections.close_all()
@@ -3,6 +3,9 @@ from django.utils.html import format_html
 from django.urls import reverse
 from .models import Invoice, InvoiceItem
 from .services.billing_calculator import BillingCalculator
+from core.services.document_export import streaming_export_response
+from core.services.document_lifecycle import freeze, should_freeze
+from core.services.search import SearchIndexAdminMixin
 
 class InvoiceItemInline(admin.TabularInline):
     model = InvoiceItem
@@ -11,7 +14,7 @@ class InvoiceItemInline(admin.TabularInline):
     extra = 0
 
 @admin.register(Invoice)
-class InvoiceAdmin(admin.ModelAdmin):
+class InvoiceAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
     list_display = ('invoice_no', 'order', 'target_month', 'total_amount', 'status', 'view_pdf_links')
     list_filter = ('status', 'target_month')
     search_fields = ('invoice_no', 'order__order_id', 'order__partner__name')
@@ -39,6 +42,10 @@ class InvoiceAdmin(admin.ModelAdmin):
         super().save_related(request, form, formsets, change)
         # 明細保存後に、各明細の計算と請求合計の算出を行う
         BillingCalculator.calculate_invoice(form.instance)
+        # 発行済みになった請求書は、計算後の内容で原本を保存する
+        if should_freeze(form.instance, 'invoice'):
+            form.instance.refresh_from_db(fields=['subtotal_amount', 'tax_amount', 'total_amount'])
+            freeze(form.instance, 'invoice')
 
     def view_pdf_links(self, obj):
         if obj.pk:
@@ -52,3 +59,19 @@ class InvoiceAdmin(admin.ModelAdmin):
             )
         return "-"
     view_pdf_links.short_description = "PDF発行"
+
+    actions = ['export_documents_zip', 'rerender_originals']
+
+    def rerender_originals(self, request, queryset):
+        count = 0
+        for invoice in queryset.select_related('order__partner', 'order__project'):
+            if should_freeze(invoice, 'invoice'):
+                freeze(invoice, 'invoice', force=True)
+                count += 1
+        self.message_user(request, f"{count}件の請求書の原本PDFを再生成しました（下書きは対象外）。")
+    rerender_originals.short_description = "選択した請求書の原本PDFを再生成"
+
+    def export_documents_zip(self, request, queryset):
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+        return streaming_export_response([('invoice', pks), ('payment_notice', pks)], 'invoices')
+    export_documents_zip.short_description = "選択した請求書・支払通知書をZIPでダウンロード"
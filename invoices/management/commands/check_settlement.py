@@ -0,0 +1,154 @@
+import random
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from core.services.settlement_rules import invoice_item_amounts, order_item_price
+from invoices.models import Invoice
+from invoices.services.settlement import compute_settlement
+from orders.models import OrderItem
+
+# 境界値として必ず試す時間（明細の桁数の範囲内）
+EDGE_HOURS = ['0.00', '0.01', '0.99', '1.00', '139.99', '140.00', '140.01', '179.99', '180.00', '180.01', '999.99']
+EDGE_RATES = [0, 1, 99, 100, 101, 3333, 5555, 9999, 1234567]
+EDGE_EFFORTS = ['0.00', '0.01', '0.33', '0.50', '1.00', '9.99']
+
+
+def legacy_order_item(effort, base_fee, actual_hours, time_lower_limit, time_upper_limit, shortage_rate, excess_rate):
+    """変更前の OrderItem.save の計算（比較用）"""
+    adjustment = 0
+    if actual_hours > 0:
+        if actual_hours < time_lower_limit:
+            shortage_hours = time_lower_limit - actual_hours
+            adjustment = -int(shortage_hours * shortage_rate)
+        elif actual_hours > time_upper_limit:
+            excess_hours = actual_hours - time_upper_limit
+            adjustment = int(excess_hours * excess_rate)
+    base = int(effort * base_fee)
+    return base, adjustment, base + adjustment
+
+
+def legacy_invoice_item(work_time, base_fee, time_lower_limit, time_upper_limit, shortage_rate, excess_rate):
+    """変更前の BillingCalculator.calculate_invoice の明細計算（比較用）"""
+    excess_amount = 0
+    shortage_amount = 0
+    if work_time > time_upper_limit and time_upper_limit > 0:
+        over_time = work_time - time_upper_limit
+        excess_amount = int(Decimal(excess_rate) * over_time)
+    elif work_time < time_lower_limit and time_lower_limit > 0:
+        short_time = time_lower_limit - work_time
+        shortage_amount = int(Decimal(shortage_rate) * short_time)
+    return excess_amount, shortage_amount, base_fee + excess_amount - shortage_amount
+
+
+def _random_hours(rng, limit):
+    if rng.random() < 0.3:
+        return Decimal(rng.choice(EDGE_HOURS))
+    return Decimal(rng.randint(0, limit)) / 100
+
+
+def _random_rate(rng):
+    if rng.random() < 0.3:
+        return rng.choice(EDGE_RATES) * rng.choice([1, 1, 1, -1])
+    return rng.randint(0, 2000000)
+
+
+def _random_effort(rng):
+    if rng.random() < 0.3:
+        return Decimal(rng.choice(EDGE_EFFORTS))
+    return Decimal(rng.randint(0, 999)) / 100
+
+
+class Command(BaseCommand):
+    help = '精算ルール（core.services.settlement_rules）の計算結果が変更前の注文明細・請求明細の計算と完全に一致することを無作為の入力で検証し、処理時間を比較する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cases', type=int, default=100000, help='検証する明細の件数')
+        parser.add_argument('--seed', type=int, help='乱数の種（再現用）')
+        parser.add_argument('--existing', action='store_true', help='保存済みの全請求書・注文明細についても計算結果を照合する')
+
+    def handle(self, *args, **options):
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        rng = random.Random(seed)
+        self.stdout.write(f"{options['cases']}件の明細で検証します（--seed {seed}）...")
+
+        invoice_inputs = []
+        order_inputs = []
+        for _ in range(options['cases']):
+            hours = (
+                _random_hours(rng, 999999),                   # 実稼働時間
+                _random_hours(rng, 99999),                    # 下限
+                _random_hours(rng, 99999),                    # 上限
+            )
+            rates = (_random_rate(rng), _random_rate(rng))    # 不足単価・超過単価
+            base_fee = rng.randint(-1000000, 3000000)
+            invoice_inputs.append((hours[0], base_fee, hours[1], hours[2], *rates))
+            order_inputs.append((_random_effort(rng), base_fee, *hours, *rates))
+
+        mismatches = []
+        mismatches += self._compare("請求明細", legacy_invoice_item, invoice_item_amounts, invoice_inputs)
+        mismatches += self._compare("注文明細", legacy_order_item, order_item_price, order_inputs)
+        if options['existing']:
+            mismatches += self._check_invoices()
+            mismatches += self._check_order_items()
+
+        for line in mismatches[:20]:
+            self.stdout.write(self.style.ERROR(line))
+        if mismatches:
+            raise CommandError(f"{len(mismatches)}件の計算結果が一致しません（--seed {seed}）。")
+        self.stdout.write(self.style.SUCCESS("すべての計算結果が一致しました。"))
+
+    def _compare(self, title, legacy, current, inputs):
+        started = time.perf_counter()
+        expected = [legacy(*args) for args in inputs]
+        legacy_elapsed = time.perf_counter() - started
+        started = time.perf_counter()
+        actual = [current(*args) for args in inputs]
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{title}: 変更前 {legacy_elapsed / len(inputs) * 1e6:.2f}µs/件 / "
+            f"精算ルール {elapsed / len(inputs) * 1e6:.2f}µs/件"
+        )
+        return [
+            f"{title} {args}: 期待値 {e} / 結果 {a}"
+            for args, e, a in zip(inputs, expected, actual)
+            if a != e or not all(type(v) is int for v in a)
+        ]
+
+    def _check_invoices(self):
+        """保存済みの請求書を変更前の計算で求め直し、一括計算の結果と照合する"""
+        mismatches = []
+        invoices = Invoice.objects.prefetch_related('items').order_by('pk')
+        for invoice in invoices.iterator(chunk_size=500):
+            items, totals = compute_settlement([invoice.pk])
+            subtotal = 0
+            for item in invoice.items.all():
+                expected = legacy_invoice_item(
+                    item.work_time, item.base_fee, item.time_lower_limit,
+                    item.time_upper_limit, item.shortage_rate, item.excess_rate,
+                )
+                subtotal += expected[2]
+                if items[item.pk][1] != expected:
+                    mismatches.append(f"{invoice.invoice_no} / {item.person_name}: 期待値 {expected} / 結果 {items[item.pk][1]}")
+            tax = int(subtotal * 0.1)
+            if totals[invoice.pk] != (subtotal, tax, subtotal + tax):
+                mismatches.append(f"{invoice.invoice_no}: 期待値 {(subtotal, tax, subtotal + tax)} / 結果 {totals[invoice.pk]}")
+        self.stdout.write(f"保存済みの請求書 {invoices.count()}件を照合しました。")
+        return mismatches
+
+    def _check_order_items(self):
+        """保存済みの注文明細の金額・調整金（PDFに表示する値）を変更前の計算と照合する"""
+        mismatches = []
+        items = OrderItem.objects.select_related('order').order_by('pk')
+        for item in items.iterator(chunk_size=500):
+            _base, adjustment, price = legacy_order_item(
+                item.effort, item.base_fee, item.actual_hours, item.time_lower_limit,
+                item.time_upper_limit, item.shortage_rate, item.excess_rate,
+            )
+            if (item.price, item.adjustment) != (price, adjustment):
+                mismatches.append(
+                    f"{item.order.order_id} / {item.person_name}: 期待値 ￥{price:,}（調整金 {adjustment:,}） / "
+                    f"保存済み ￥{item.price:,}（調整金 {item.adjustment:,}）"
+                )
+        self.stdout.write(f"保存済みの注文明細 {items.count()}件を照合しました。")
+        return mismatches
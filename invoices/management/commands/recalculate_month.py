@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.services.document_export import parse_month
+from invoices.models import Invoice
+from invoices.services.settlement import DEFAULT_BATCH_SIZE, settle_invoices
+
+
+class Command(BaseCommand):
+    help = '対象月の請求書（支払通知）の精算額（超過・控除・明細金額）と合計金額を一括で再計算する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('month', help='対象年月 (YYYY-MM)')
+        parser.add_argument('--partner', help='パートナーID')
+        parser.add_argument('--include-paid', action='store_true', help='支払済の請求書も再計算する')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='一度に処理する請求書の件数')
+        parser.add_argument('--dry-run', action='store_true', help='差異の報告のみ行い、保存しない')
+
+    def handle(self, *args, **options):
+        try:
+            month = parse_month(options['month'])
+        except ValueError:
+            raise CommandError("対象年月は YYYY-MM 形式で指定してください。")
+
+        invoices = Invoice.objects.filter(target_month__year=month.year, target_month__month=month.month)
+        if options['partner']:
+            invoices = invoices.filter(order__partner_id=options['partner'])
+        if not options['include_paid']:
+            invoices = invoices.exclude(status='PAID')
+
+        started = time.perf_counter()
+        summary = settle_invoices(invoices, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        elapsed = time.perf_counter() - started
+
+        numbers = dict(Invoice.objects.filter(pk__in=summary['changed']).values_list('pk', 'invoice_no'))
+        for pk, (before, after) in summary['changed'].items():
+            self.stdout.write(f"{numbers.get(pk, pk)}: ¥{before:,} -> ¥{after:,}")
+
+        result = (
+            f"{summary['invoices']}件（明細{summary['items']}件）を{elapsed:.2f}秒で確認し、"
+            f"{len(summary['changed'])}件（明細{summary['changed_items']}件）"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{result}に差異があります（未保存）。"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{result}を更新しました。"))
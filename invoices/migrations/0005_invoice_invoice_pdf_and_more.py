@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0004_invoice_payment_date_invoice_work_report_file_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='invoice_pdf',
+            field=models.FileField(blank=True, null=True, upload_to='invoices/pdfs/originals/', verbose_name='請求書PDF'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='invoice_pdf_hash',
+            field=models.CharField(blank=True, help_text='改ざん防止用のハッシュ値', max_length=64, verbose_name='請求書PDFハッシュ'),
+        ),
+    ]
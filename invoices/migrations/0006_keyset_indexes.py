@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0005_invoice_invoice_pdf_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['-issue_date', '-created_at', '-id'], name='inv_issue_created_id_idx'),
+        ),
+    ]
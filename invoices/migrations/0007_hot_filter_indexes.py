@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0006_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', '-issue_date'], name='inv_status_issue_idx'),
+        ),
+    ]
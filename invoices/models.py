@@ -15,6 +15,12 @@ class Invoice(models.Model):
     class Meta:
         verbose_name = _("請求・支払通知書")
         verbose_name_plural = _("請求・支払通知書")
+        indexes = [
+            # 請求書一覧のキーセットページ送り
+            models.Index(fields=['-issue_date', '-created_at', '-id'], name='inv_issue_created_id_idx'),
+            # ダッシュボードのステータス別一覧（パートナーの絞り込みは注文の orders_partner_* を使う）
+            models.Index(fields=['status', '-issue_date'], name='inv_status_issue_idx'),
+        ]
 
     order = models.OneToOneField(Order, on_delete=models.CASCADE, verbose_name=_("注文"), related_name='invoice')
     
@@ -39,6 +45,10 @@ class Invoice(models.Model):
     total_amount = models.IntegerField(_("税込合計"), default=0)
     
     status = models.CharField(_("ステータス"), max_length=20, choices=STATUS_CHOICES, default='DRAFT')
+
+    # 発行時に確定した請求書PDF（電帳法対応：原本の保持）
+    invoice_pdf = models.FileField(_("請求書PDF"), upload_to='invoices/pdfs/originals/', null=True, blank=True)
+    invoice_pdf_hash = models.CharField(_("請求書PDFハッシュ"), max_length=64, blank=True, help_text="改ざん防止用のハッシュ値")
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -46,21 +56,20 @@ class Invoice(models.Model):
     def __str__(self):
         return f"{self.invoice_no} ({self.order.project.name})"
 
+    @classmethod
+    def allocate_invoice_nos(cls, count=1, date=None):
+        """請求番号（YYMM+3桁連番）を count 件まとめて確保する"""
+        from core.services.sequences import allocate, seed_from_last
+        prefix = (date or datetime.date.today()).strftime('%y%m')
+        first = allocate(
+            f"invoice:{prefix}", count,
+            seed=seed_from_last(cls.objects.filter(invoice_no__startswith=prefix), 'invoice_no', len(prefix)),
+        )
+        return [f"{prefix}{str(n).zfill(3)}" for n in range(first, first + count)]
+
     def save(self, *args, **kwargs):
         if not self.invoice_no:
-            # YYMM形式の接頭辞を作成
-            prefix = datetime.date.today().strftime('%y%m')
-            # 同一接頭辞の最大値を取得
-            last_invoice = Invoice.objects.filter(invoice_no__startswith=prefix).order_by('-invoice_no').first()
-            if last_invoice:
-                try:
-                    last_seq = int(last_invoice.invoice_no[4:])
-                    next_seq = last_seq + 1
-                except ValueError:
-                    next_seq = 1
-            else:
-                next_seq = 1
-            self.invoice_no = f"{prefix}{str(next_seq).zfill(3)}"
+            self.invoice_no = self.allocate_invoice_nos()[0]
         
         if self.invoice_no:
             self.acceptance_no = f"MP{self.invoice_no}"
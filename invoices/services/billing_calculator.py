@@ -1,58 +1,32 @@
-from decimal import Decimal
-from math import floor
-
 class BillingCalculator:
     """SES精算計算ロジック（明細対応版）"""
 
+    @staticmethod
+    def settle(work_time, base_fee, time_lower_limit, time_upper_limit, shortage_rate, excess_rate):
+        """
+        明細1行の超過金額・控除金額・明細金額を計算する。
+        精算ルールは core.services.settlement_rules（invoice_item_amounts）。
+
+        Returns:
+            tuple: (超過金額, 控除金額, 明細金額)
+        """
+        # 明細合計 = (単価 * 1.0) + 超過 - 控除
+        # ※ 工数は現在の InvoiceItem には記録していない（OrderのOrderItemにある）が、
+        # 基本的には工数は1.0として、単価（base_fee）を調整済みとして扱うか、
+        # 将来的には InvoiceItem にも effort を持たせる検討が必要。
+        # 現状はシンプルに base_fee + excess - shortage とする。
+        from core.services.settlement_rules import invoice_item_amounts, to_decimal
+        return invoice_item_amounts(
+            to_decimal(work_time), base_fee, to_decimal(time_lower_limit), to_decimal(time_upper_limit),
+            shortage_rate, excess_rate,
+        )
+
     @staticmethod
     def calculate_invoice(invoice):
         """
         Invoiceに関連付くすべてのInvoiceItemを計算し、Invoice本体の合計金額を更新する。
         """
-        subtotal = 0
-        
-        # 各明細の計算
-        for item in invoice.items.all():
-            excess_amount = 0
-            shortage_amount = 0
-            
-            # 精算幅のチェック
-            if item.work_time > item.time_upper_limit and item.time_upper_limit > 0:
-                # 超過
-                over_time = item.work_time - item.time_upper_limit
-                amount = Decimal(item.excess_rate) * over_time
-                excess_amount = int(amount)
-            elif item.work_time < item.time_lower_limit and item.time_lower_limit > 0:
-                # 不足
-                short_time = item.time_lower_limit - item.work_time
-                amount = Decimal(item.shortage_rate) * short_time
-                shortage_amount = int(amount)
-            
-            # 明細合計 = (単価 * 1.0) + 超過 - 控除
-            # ※ 工数は現在の InvoiceItem には記録していない（OrderのOrderItemにある）が、
-            # 基本的には工数は1.0として、単価（base_fee）を調整済みとして扱うか、
-            # 将来的には InvoiceItem にも effort を持たせる検討が必要。
-            # 現状はシンプルに base_fee + excess - shortage とする。
-            item_subtotal = item.base_fee + excess_amount - shortage_amount
-            
-            # 明細を更新
-            item.excess_amount = excess_amount
-            item.shortage_amount = shortage_amount
-            item.item_subtotal = item_subtotal
-            item.save()
-            
-            subtotal += item_subtotal
-            
-        # Invoice（親）の合計値を計算
-        tax = int(subtotal * 0.1)
-        total = subtotal + tax
-        
-        # データベースを直接更新（無限ループ回避のため）
-        from invoices.models import Invoice
-        Invoice.objects.filter(pk=invoice.pk).update(
-            subtotal_amount=subtotal,
-            tax_amount=tax,
-            total_amount=total
-        )
-        
+        # 明細の読み込み・保存は一括で行う（データベースを直接更新するため save() の無限ループは起きない）
+        from invoices.services.settlement import settle_invoices
+        settle_invoices([invoice])
         return invoice
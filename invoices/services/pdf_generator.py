@@ -1,27 +1,22 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.cidfonts import UnicodeCIDFont
 from reportlab.platypus import Table, TableStyle
 from reportlab.lib import colors
 import io
 import datetime
 from django.conf import settings
-from core.domain.models import CompanyInfo
+from core.services.company import get_company_info
+from core.services.pdf_context import get_stamp_image, register_fonts
 
 def _setup_fonts(p):
-    # フォント登録（日本語対応）
-    font_name = "HeiseiMin-W3"
-    try:
-        pdfmetrics.getFont(font_name)
-    except:
-        pdfmetrics.registerFont(UnicodeCIDFont("HeiseiMin-W3"))
-    return font_name
-
-def _draw_company_info(p, x, y, font_name, side="自社"):
+    # フォント登録（日本語対応）。登録はプロセスごとに一度だけ行われる（core.services.pdf_context）
+    return register_fonts()
+
+def _draw_company_info(p, x, y, font_name, side="自社", company=None):
     p.setFont(font_name, 10)
-    company = CompanyInfo.objects.first()
+    if company is None:
+        company = get_company_info()
     if not company:
         name = "有限会社 マックプランニング"
         post = "〒116-0012"
@@ -49,8 +44,20 @@ def _draw_company_info(p, x, y, font_name, side="自社"):
     
     return name, rep
 
-def generate_invoice_pdf(invoice):
+def invoice_pdf_inputs(invoice):
+    """請求書・支払通知書PDFに反映される入力一式（PDFキャッシュのキー算出用）"""
+    return [
+        invoice,
+        invoice.items.all(),
+        invoice.order.partner,
+        invoice.order.project,
+        get_company_info(),
+    ]
+
+def generate_invoice_pdf(invoice, company=None):
     """請求書PDFの生成 (11列構成)"""
+    if company is None:
+        company = get_company_info()
     buffer = io.BytesIO()
     p = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
@@ -74,15 +81,12 @@ def generate_invoice_pdf(invoice):
         p.drawString(20*mm, height - 61*mm, f"{invoice.department}")
 
     # 4. 発行人 (自社)
-    _draw_company_info(p, 120*mm, height - 55*mm, font_name)
+    _draw_company_info(p, 120*mm, height - 55*mm, font_name, company=company)
 
     # 5. 印影表示
-    company = CompanyInfo.objects.first()
-    if company and company.stamp_image:
-        try:
-            p.drawImage(company.stamp_image.path, 165*mm, height - 80*mm, width=22*mm, height=22*mm, mask='auto', preserveAspectRatio=True)
-        except:
-            pass
+    stamp = get_stamp_image(company)
+    if stamp:
+        p.drawImage(stamp, 165*mm, height - 80*mm, width=22*mm, height=22*mm, mask='auto', preserveAspectRatio=True)
 
     # 6. ご請求額サマリ
     p.setFont(font_name, 12)
@@ -154,8 +158,10 @@ def generate_invoice_pdf(invoice):
     buffer.seek(0)
     return buffer
 
-def generate_payment_notice_pdf(invoice):
+def generate_payment_notice_pdf(invoice, company=None):
     """支払い通知書PDFの生成 (8列構成)"""
+    if company is None:
+        company = get_company_info()
     buffer = io.BytesIO()
     p = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
@@ -177,7 +183,7 @@ def generate_payment_notice_pdf(invoice):
     p.drawString(20*mm, height - 55*mm, f"{customer.name}  殿")
 
     # 4. 発行人 (取引先 -> 自社名義)
-    _draw_company_info(p, 120*mm, height - 55*mm, font_name)
+    _draw_company_info(p, 120*mm, height - 55*mm, font_name, company=company)
 
     # 5. メッセージ
     p.setFont(font_name, 10)
@@ -0,0 +1,124 @@
+"""
+SES精算の一括計算サービス
+
+複数の請求書（1か月分など）の明細を1クエリでまとめて読み込み、
+超過金額・控除金額・明細金額と請求書の合計金額を1回の走査で算出する。
+結果は1トランザクション内で bulk_update により保存する（変更のあった行のみ）。
+
+明細ごとの計算規則は core.services.settlement_rules（invoice_item_amounts）。
+    消費税 = int(税抜合計 × 0.1)
+変更前の計算結果と一致することは check_settlement コマンドで確認できる。
+"""
+import logging
+
+from django.db import transaction
+
+from core.services.document_registry import register_documents
+from core.services.settlement_rules import invoice_item_amounts
+
+logger = logging.getLogger(__name__)
+
+ITEM_INPUT_FIELDS = ('work_time', 'base_fee', 'time_lower_limit', 'time_upper_limit', 'shortage_rate', 'excess_rate')
+ITEM_RESULT_FIELDS = ['excess_amount', 'shortage_amount', 'item_subtotal']
+INVOICE_TOTAL_FIELDS = ['subtotal_amount', 'tax_amount', 'total_amount']
+
+# 一度に読み込む請求書の件数
+DEFAULT_BATCH_SIZE = 500
+
+
+def invoice_totals(subtotal):
+    """税抜合計から (税抜合計, 消費税, 税込合計) を求める"""
+    tax = int(subtotal * 0.1)
+    return subtotal, tax, subtotal + tax
+
+
+def compute_settlement(invoice_ids):
+    """
+    請求書の明細を読み込んで精算額を計算する（保存はしない）。
+
+    Returns:
+        tuple: (明細の計算結果, 請求書の合計金額)
+            明細: {明細ID: (保存済みの値, 計算結果)}（値は ITEM_RESULT_FIELDS の順）
+            請求書: {請求書ID: (税抜合計, 消費税, 税込合計)}
+    """
+    from invoices.models import InvoiceItem
+
+    subtotals = dict.fromkeys(invoice_ids, 0)
+    items = {}
+    rows = (
+        InvoiceItem.objects.filter(invoice_id__in=subtotals)
+        .order_by('pk')
+        .values_list('pk', 'invoice_id', *ITEM_INPUT_FIELDS, *ITEM_RESULT_FIELDS)
+    )
+    for pk, invoice_id, *values in rows:
+        inputs, stored = values[:len(ITEM_INPUT_FIELDS)], tuple(values[len(ITEM_INPUT_FIELDS):])
+        result = invoice_item_amounts(*inputs)
+        items[pk] = (stored, result)
+        subtotals[invoice_id] += result[2]
+
+    totals = {invoice_id: invoice_totals(subtotal) for invoice_id, subtotal in subtotals.items()}
+    return items, totals
+
+
+def settle_invoices(invoices, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    請求書の明細と合計金額をまとめて再計算し、変更のあった行を保存する。
+
+    Args:
+        invoices: 請求書のクエリセットまたはリスト
+        dry_run: True の場合は計算のみ行い保存しない
+
+    Returns:
+        dict: invoices（対象件数）, items（明細件数）, changed（合計金額が変わった請求書
+              {請求書ID: (変更前の税込合計, 変更後の税込合計)}）, changed_items（更新した明細件数）
+    """
+    from invoices.models import Invoice, InvoiceItem
+
+    if not hasattr(invoices, 'values_list'):
+        # 画面で編集中のインスタンスではなく、保存済みの合計金額と比較する
+        invoices = Invoice.objects.filter(pk__in=[invoice.pk for invoice in invoices])
+    stored_totals = {
+        pk: tuple(values)
+        for pk, *values in invoices.order_by('pk').values_list('pk', *INVOICE_TOTAL_FIELDS)
+    }
+
+    invoice_ids = list(stored_totals)
+    summary = {'invoices': len(invoice_ids), 'items': 0, 'changed': {}, 'changed_items': 0}
+
+    with transaction.atomic():
+        for start in range(0, len(invoice_ids), batch_size):
+            batch = invoice_ids[start:start + batch_size]
+            items, totals = compute_settlement(batch)
+            summary['items'] += len(items)
+
+            changed_items = [
+                InvoiceItem(pk=pk, **dict(zip(ITEM_RESULT_FIELDS, result)))
+                for pk, (stored, result) in items.items() if stored != result
+            ]
+            changed_invoices = [
+                Invoice(pk=pk, **dict(zip(INVOICE_TOTAL_FIELDS, total)))
+                for pk, total in totals.items() if stored_totals[pk] != total
+            ]
+            summary['changed_items'] += len(changed_items)
+            summary['changed'].update(
+                (invoice.pk, (stored_totals[invoice.pk][2], invoice.total_amount)) for invoice in changed_invoices
+            )
+            if dry_run:
+                continue
+            if changed_items:
+                InvoiceItem.objects.bulk_update(changed_items, ITEM_RESULT_FIELDS, batch_size=batch_size)
+            if changed_invoices:
+                Invoice.objects.bulk_update(changed_invoices, INVOICE_TOTAL_FIELDS, batch_size=batch_size)
+                # bulk_update は post_save を送らないため、発行済みの請求書の書類台帳をここで更新する
+                register_documents(
+                    Invoice._meta.label, [invoice.pk for invoice in changed_invoices], update_fields=INVOICE_TOTAL_FIELDS,
+                )
+
+    if summary['changed'] and not dry_run:
+        from core.services.status_counts import invalidate_status_counts
+        invalidate_status_counts(Invoice._meta.label)
+    logger.info(
+        f"Settled {summary['invoices']} invoices / {summary['items']} items "
+        f"({len(summary['changed'])} invoices, {summary['changed_items']} items changed{', dry run' if dry_run else ''})"
+    )
+    return summary
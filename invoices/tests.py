@@ -1,3 +1,114 @@
+"""
+invoices のテスト
+
+python manage.py test --settings=EDI_MP.test_settings で実行する。
+"""
+import datetime
+import io
+import random
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
 
-# Create your tests here.
+from core.domain.models import Customer, Partner
+from invoices.management.commands.check_settlement import legacy_invoice_item, legacy_order_item
+from invoices.models import Invoice, InvoiceItem
+from invoices.services.settlement import invoice_totals
+from orders.models import Order, OrderItem, Project
+
+MONTH = datetime.date(2026, 9, 1)
+
+
+def run_command(name, *args):
+    """管理コマンドを実行し、(成功したか, 出力) を返す"""
+    out = io.StringIO()
+    try:
+        call_command(name, *args, stdout=out)
+    except CommandError as e:
+        return False, f"{out.getvalue()}\n{e}"
+    return True, out.getvalue()
+
+
+def random_hours(rng, max_digits):
+    """DecimalField（小数2桁）に保存できる時間。境界値を多めに含める"""
+    if rng.random() < 0.3:
+        return Decimal(rng.choice(['0.00', '0.01', '139.99', '140.00', '140.01', '179.99', '180.00', '180.01']))
+    return Decimal(rng.randint(0, 10 ** max_digits - 1)) / 100
+
+
+class SettlementRuleEquivalenceTests(TestCase):
+    """精算ルール（core.services.settlement_rules）が変更前の計算と完全に一致すること"""
+
+    def setUp(self):
+        customer = Customer.objects.create(name='テスト顧客')
+        self.partner = Partner.objects.create(name='テストパートナー', email='p@example.com')
+        self.project = Project.objects.create(customer=customer, name='テストプロジェクト')
+
+    def _order(self):
+        return Order.objects.create(
+            partner=self.partner, project=self.project, order_end_ym=MONTH,
+            work_start=MONTH, work_end=MONTH.replace(day=30),
+        )
+
+    def test_random_inputs_match_legacy_rules(self):
+        for seed in (0, 1, 2):
+            ok, output = run_command('check_settlement', '--cases', '20000', '--seed', str(seed))
+            self.assertTrue(ok, output)
+
+    def test_recalculate_month_matches_legacy_invoice_calculation(self):
+        rng = random.Random(20261017)
+        for _ in range(20):
+            invoice = Invoice.objects.create(order=self._order(), target_month=MONTH)
+            for i in range(rng.randint(1, 4)):
+                InvoiceItem.objects.create(
+                    invoice=invoice, person_name=f"作業者{i}", base_fee=rng.randint(0, 2000000),
+                    work_time=random_hours(rng, 6), time_lower_limit=random_hours(rng, 5),
+                    time_upper_limit=random_hours(rng, 5),
+                    shortage_rate=rng.randint(0, 10000), excess_rate=rng.randint(0, 10000),
+                )
+
+        ok, output = run_command('recalculate_month', MONTH.strftime('%Y-%m'))
+        self.assertTrue(ok, output)
+
+        for invoice in Invoice.objects.prefetch_related('items'):
+            subtotal = 0
+            for item in invoice.items.all():
+                expected = legacy_invoice_item(
+                    item.work_time, item.base_fee, item.time_lower_limit,
+                    item.time_upper_limit, item.shortage_rate, item.excess_rate,
+                )
+                self.assertEqual((item.excess_amount, item.shortage_amount, item.item_subtotal), expected)
+                subtotal += expected[2]
+            self.assertEqual(
+                (invoice.subtotal_amount, invoice.tax_amount, invoice.total_amount), invoice_totals(subtotal),
+            )
+
+    def test_order_item_price_matches_legacy_calculation(self):
+        rng = random.Random(20261018)
+        order = self._order()
+        for i in range(200):
+            item = OrderItem.objects.create(
+                order=order, person_name=f"作業者{i}",
+                effort=Decimal(rng.randint(0, 999)) / 100, base_fee=rng.randint(0, 2000000),
+                actual_hours=random_hours(rng, 6), time_lower_limit=random_hours(rng, 5),
+                time_upper_limit=random_hours(rng, 5),
+                shortage_rate=rng.randint(0, 10000), excess_rate=rng.randint(0, 10000),
+            )
+            item.refresh_from_db()
+            _base, adjustment, price = legacy_order_item(
+                item.effort, item.base_fee, item.actual_hours, item.time_lower_limit,
+                item.time_upper_limit, item.shortage_rate, item.excess_rate,
+            )
+            self.assertEqual((item.price, item.adjustment), (price, adjustment))
+
+    def test_stored_documents_match_legacy_rules(self):
+        invoice = Invoice.objects.create(order=self._order(), target_month=MONTH)
+        InvoiceItem.objects.create(
+            invoice=invoice, person_name='作業者', base_fee=500000, work_time=Decimal('130.25'),
+            time_lower_limit=140, time_upper_limit=180, shortage_rate=2500, excess_rate=3000,
+        )
+        run_command('recalculate_month', MONTH.strftime('%Y-%m'))
+        ok, output = run_command('check_settlement', '--cases', '1', '--seed', '0', '--existing')
+        self.assertTrue(ok, output)
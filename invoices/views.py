@@ -6,7 +6,10 @@ from django.contrib import messages
 from django.views import View
 from django.views.generic import ListView, DetailView
 from .models import Invoice
-from .services.pdf_generator import generate_invoice_pdf, generate_payment_notice_pdf
+from .services.pdf_generator import generate_invoice_pdf, generate_payment_notice_pdf, invoice_pdf_inputs
+from core.services.document_lifecycle import frozen_document_response, should_freeze
+from core.services.keyset import KeysetPaginationMixin
+from core.services.pdf_cache import get_or_render
 
 class AdminInvoicePDFView(View):
     """管理者用 請求書PDFダウンロード"""
@@ -14,7 +17,11 @@ class AdminInvoicePDFView(View):
     @method_decorator(user_passes_test(lambda u: u.is_staff))
     def get(self, request, invoice_id):
         invoice = get_object_or_404(Invoice, pk=invoice_id)
-        buffer = generate_invoice_pdf(invoice)
+        # 発行済みの請求書は保存した原本を返す
+        if should_freeze(invoice, 'invoice'):
+            return frozen_document_response(request, invoice, 'invoice', as_attachment=False)
+
+        buffer = get_or_render('invoice', invoice_pdf_inputs(invoice), lambda: generate_invoice_pdf(invoice))
         
         response = HttpResponse(buffer, content_type='application/pdf')
         response['Content-Disposition'] = f'inline; filename="invoice_{invoice.invoice_no}.pdf"'
@@ -26,7 +33,9 @@ class AdminPaymentNoticePDFView(View):
     @method_decorator(user_passes_test(lambda u: u.is_staff))
     def get(self, request, invoice_id):
         invoice = get_object_or_404(Invoice, pk=invoice_id)
-        buffer = generate_payment_notice_pdf(invoice)
+        buffer = get_or_render(
+            'payment_notice', invoice_pdf_inputs(invoice), lambda: generate_payment_notice_pdf(invoice)
+        )
         
         response = HttpResponse(buffer, content_type='application/pdf')
         response['Content-Disposition'] = f'inline; filename="payment_notice_{invoice.invoice_no}.pdf"'
@@ -46,18 +55,23 @@ class PartnerInvoicePDFView(View):
         if invoice.order.partner != user.profile.partner:
              return HttpResponseForbidden("権限がありません。")
 
-        buffer = generate_invoice_pdf(invoice)
+        # 発行済みの請求書は保存した原本を返す
+        if should_freeze(invoice, 'invoice'):
+            return frozen_document_response(request, invoice, 'invoice')
+
+        buffer = get_or_render('invoice', invoice_pdf_inputs(invoice), lambda: generate_invoice_pdf(invoice))
         
         response = HttpResponse(buffer, content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="invoice_{invoice.invoice_no}.pdf"'
         return response
 
-class PartnerInvoiceListView(ListView):
+class PartnerInvoiceListView(KeysetPaginationMixin, ListView):
     """パートナー用 請求書一覧"""
     model = Invoice
     template_name = 'invoices/invoice_list.html'
     context_object_name = 'invoices'
     ordering = ['-issue_date']
+    keyset_ordering = ('-issue_date', '-created_at', '-id')
 
     @method_decorator(login_required)
     def dispatch(self, *args, **kwargs):
@@ -65,18 +79,17 @@ class PartnerInvoiceListView(ListView):
 
     def get_queryset(self):
         user = self.request.user
+        # 一覧で表示する注文・プロジェクトを同じクエリで取得する
+        queryset = Invoice.objects.select_related('order__partner', 'order__project').filter(
+            status__in=['ISSUED', 'SENT', 'CONFIRMED']
+        ).order_by('-issue_date')
         if user.is_staff:
-            return Invoice.objects.filter(
-                status__in=['ISSUED', 'SENT', 'CONFIRMED']
-            ).order_by('-issue_date')
+            return queryset
 
         if not hasattr(user, 'profile') or not user.profile.partner:
              return Invoice.objects.none()
         
-        return Invoice.objects.filter(
-            order__partner=user.profile.partner,
-            status__in=['ISSUED', 'SENT', 'CONFIRMED']
-        ).order_by('-issue_date')
+        return queryset.filter(order__partner=user.profile.partner)
 
 class PartnerInvoiceDetailView(DetailView):
     """パートナー用 請求書詳細"""
@@ -115,7 +128,7 @@ class PartnerInvoiceConfirmView(View):
             return redirect('invoices:invoice_detail', invoice_id=invoice.pk)
         
         invoice.status = 'CONFIRMED'
-        invoice.save()
+        invoice.save(update_fields=['status', 'updated_at'])
         
         messages.success(request, f"請求書 {invoice.invoice_no} を確定しました。")
         return redirect('invoices:invoice_list')
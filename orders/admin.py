@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.db import models
 from .models import Order, OrderItem, Person, Project, Workplace, Deliverable, PaymentTerm, ContractTerm, Product, OrderBasicInfo
+from core.services.search import SearchIndexAdminMixin
 
 @admin.register(OrderBasicInfo)
 class OrderBasicInfoAdmin(admin.ModelAdmin):
@@ -23,7 +24,7 @@ from django.urls import reverse
 from django import forms
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
     list_display = ('order_id', 'partner', 'project', 'status', 'order_end_ym', 'order_date', 'view_pdf_links')
     list_filter = ('status', 'order_end_ym', 'partner')
     search_fields = ('order_id', 'partner__name', 'project__name')
@@ -75,31 +76,57 @@ class OrderAdmin(admin.ModelAdmin):
         )
     view_pdf_links.short_description = "PDFプレビュー"
 
-    actions = ['upload_to_drive']
+    actions = ['upload_to_drive', 'export_orders_zip', 'rerender_originals']
+
+    def rerender_originals(self, request, queryset):
+        from core.services.document_lifecycle import freeze, should_freeze
+        count = 0
+        for order in queryset.select_related('partner', 'project', 'workplace'):
+            for kind in ('order', 'acceptance'):
+                if should_freeze(order, kind):
+                    freeze(order, kind, force=True)
+                    count += 1
+        self.message_user(request, f"{count}件の原本PDF（注文書・注文請書）を再生成しました（下書きは対象外）。")
+    rerender_originals.short_description = "選択した注文の原本PDFを再生成"
+
+    def export_orders_zip(self, request, queryset):
+        from core.services.document_export import streaming_export_response
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+        return streaming_export_response([('order', pks), ('acceptance', pks)], 'orders')
+    export_orders_zip.short_description = "選択した注文書・注文請書をZIPでダウンロード"
 
     def upload_to_drive(self, request, queryset):
-        from .services.google_drive_service import upload_order_pdf
-        success = 0
-        failed = 0
-        for order in queryset:
+        from .services.google_drive_service import upload_order_pdfs
+        orders = []
+        for order in queryset.select_related('partner'):
             if not order.order_pdf:
                 self.message_user(request, f"{order.order_id}: PDFが生成されていません。先に正式発行してください。", level='warning')
-                failed += 1
                 continue
-            try:
-                result = upload_order_pdf(order)
-                order.drive_file_id = result['file_id']
-                order.save(update_fields=['drive_file_id'])
+            orders.append(order)
+        if not orders:
+            return
+        try:
+            results = upload_order_pdfs(orders)
+        except Exception as e:
+            self.message_user(request, f"アップロード失敗 - {e}", level='error')
+            return
+
+        success = 0
+        for result in results:
+            if result['error'] is None:
                 success += 1
-            except Exception as e:
-                self.message_user(request, f"{order.order_id}: アップロード失敗 - {e}", level='error')
-                failed += 1
+            else:
+                self.message_user(request, f"{result['order_id']}: アップロード失敗 - {result['error']}", level='error')
         if success:
-            self.message_user(request, f"{success}件の注文書をGoogleドライブにアップロードしました。")
+            created = sum(1 for r in results if r['error'] is None and r['action'] == 'created')
+            self.message_user(
+                request,
+                f"{success}件の注文書をGoogleドライブにアップロードしました。（新規 {created}件 / 更新 {success - created}件）",
+            )
     upload_to_drive.short_description = "Google Driveにアップロード"
 
 @admin.register(Project)
-class ProjectAdmin(admin.ModelAdmin):
+class ProjectAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
     list_display = ('project_id', 'customer', 'name')
     list_filter = ('customer',)
     search_fields = ('name', 'customer__name')
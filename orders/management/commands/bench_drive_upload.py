@@ -0,0 +1,275 @@
+import datetime
+import itertools
+import re
+import threading
+import time
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from core.domain.models import Customer, Partner
+from core.services.google_drive import override_drive_service
+from orders.models import Order, Project
+from orders.services.google_drive_service import upload_order_pdf, upload_order_pdfs
+
+
+# ============================================================
+# 擬似 Drive（計測用。core.services.google_drive.override_drive_service で差し替える）
+# ============================================================
+
+class FakeDriveError(Exception):
+    """擬似 Drive のエラー（googleapiclient.errors.HttpError と同じく resp.status を持つ）"""
+
+    class _Response:
+        def __init__(self, status):
+            self.status = status
+            self.reason = 'Not Found' if status == 404 else ''
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.resp = self._Response(status)
+
+
+class _FakeRequest:
+    def __init__(self, drive, func):
+        self._drive = drive
+        self._func = func
+
+    def execute(self, *args, **kwargs):
+        self._drive._wait()
+        return self._func()
+
+
+class _FakeBatch:
+    def __init__(self, drive, callback):
+        self._drive = drive
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._requests.append((request, callback or self._callback, request_id or str(len(self._requests))))
+
+    def execute(self):
+        self._drive._record('batch')
+        self._drive._wait()
+        for request, callback, request_id in self._requests:
+            try:
+                response, exception = request._func(), None
+            except FakeDriveError as e:
+                response, exception = None, e
+            if callback:
+                callback(request_id, response, exception)
+
+
+class _FakeFiles:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def list(self, q='', pageSize=100, **kwargs):
+        return _FakeRequest(self._drive, lambda: self._drive._list(q, pageSize))
+
+    def create(self, body=None, media_body=None, **kwargs):
+        return _FakeRequest(self._drive, lambda: self._drive._create(body or {}, media_body))
+
+    def update(self, fileId=None, body=None, media_body=None, **kwargs):
+        return _FakeRequest(self._drive, lambda: self._drive._update(fileId, body or {}, media_body))
+
+    def get(self, fileId=None, **kwargs):
+        return _FakeRequest(self._drive, lambda: self._drive._get(fileId))
+
+    def delete(self, fileId=None, **kwargs):
+        return _FakeRequest(self._drive, lambda: self._drive._delete(fileId))
+
+
+class FakeDriveService:
+    """
+    メモリ上の擬似 Drive API。files() の list / create / update / get / delete と
+    バッチリクエストに対応する。calls に API 呼び出し回数（メソッド別）を記録する。
+    バッチ内の操作はメソッド別の回数に含め、バッチ自体の送信回数を 'batch' に記録する。
+    round_trips には HTTP の往復回数（バッチは1回）を記録する。
+    """
+
+    def __init__(self, latency=0.0):
+        # 1回のHTTP往復にかかる時間（秒）。並列化・バッチ化の効果の検証用
+        self.latency = latency
+        self.files_by_id = {}
+        self.deleted_ids = set()
+        self.calls = Counter()
+        self.round_trips = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def files(self):
+        return _FakeFiles(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self, callback)
+
+    def _record(self, method):
+        with self._lock:
+            self.calls[method] += 1
+
+    def reset_counts(self):
+        with self._lock:
+            self.calls.clear()
+            self.round_trips = 0
+
+    def _wait(self):
+        with self._lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _content_size(self, media_body):
+        if media_body is None:
+            return 0
+        size = getattr(media_body, 'size', None)
+        return size() if callable(size) else 0
+
+    def _list(self, q, page_size):
+        self._record('list')
+        conditions = {
+            'name': re.search(r"name='((?:[^'\\]|\\.)*)'", q),
+            'parent': re.search(r"'([^']+)' in parents", q),
+            'mimeType': re.search(r"mimeType='([^']+)'", q),
+        }
+        name = conditions['name'] and re.sub(r"\\(.)", r"\1", conditions['name'].group(1))
+        parent = conditions['parent'] and conditions['parent'].group(1)
+        mime_type = conditions['mimeType'] and conditions['mimeType'].group(1)
+        with self._lock:
+            files = [
+                {'id': f['id'], 'name': f['name']}
+                for f in self.files_by_id.values()
+                if (name is None or f['name'] == name)
+                and (parent is None or parent in f['parents'])
+                and (mime_type is None or f['mimeType'] == mime_type)
+            ]
+        return {'files': files[:page_size]}
+
+    def _create(self, body, media_body):
+        self._record('create')
+        with self._lock:
+            for parent in body.get('parents', []):
+                if parent in self.deleted_ids:
+                    raise FakeDriveError(404, f"File not found: {parent}")
+            file_id = f"fake{next(self._ids):06d}"
+            self.files_by_id[file_id] = {
+                'id': file_id,
+                'name': body.get('name', ''),
+                'mimeType': body.get('mimeType', 'application/pdf'),
+                'parents': list(body.get('parents', [])),
+                'size': self._content_size(media_body),
+            }
+        return self._resource(file_id)
+
+    def _update(self, file_id, body, media_body):
+        self._record('update')
+        with self._lock:
+            if file_id not in self.files_by_id:
+                raise FakeDriveError(404, f"File not found: {file_id}")
+            entry = self.files_by_id[file_id]
+            entry.update({k: v for k, v in body.items() if k in ('name', 'mimeType')})
+            if media_body is not None:
+                entry['size'] = self._content_size(media_body)
+        return self._resource(file_id)
+
+    def _get(self, file_id):
+        self._record('get')
+        with self._lock:
+            if file_id not in self.files_by_id:
+                raise FakeDriveError(404, f"File not found: {file_id}")
+        return self._resource(file_id)
+
+    def _delete(self, file_id):
+        self._record('delete')
+        with self._lock:
+            if self.files_by_id.pop(file_id, None) is None:
+                raise FakeDriveError(404, f"File not found: {file_id}")
+            self.deleted_ids.add(file_id)
+            # 配下のファイルも削除する
+            for child_id in [k for k, v in self.files_by_id.items() if file_id in v['parents']]:
+                self.files_by_id.pop(child_id)
+                self.deleted_ids.add(child_id)
+        return {}
+
+    def _resource(self, file_id):
+        return {
+            'id': file_id,
+            'name': self.files_by_id[file_id]['name'],
+            'webViewLink': f"https://drive.google.com/file/d/{file_id}/view",
+        }
+
+
+class RollbackSeed(Exception):
+    """計測用データを破棄するためにトランザクションを巻き戻す"""
+
+
+class Command(BaseCommand):
+    help = 'メモリ上の擬似Driveに同一パートナーの注文書をアップロードし、API呼び出し回数を計測する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100, help='アップロードする注文書の件数')
+        parser.add_argument('--latency', type=float, default=0.0, help='APIの往復時間として待機する秒数（例: 0.2）')
+        parser.add_argument('--bulk', action='store_true', help='1件ずつのアップロードに加えて一括アップロードも計測する')
+
+    def handle(self, *args, **options):
+        count = options['orders']
+        modes = [('1件ずつ', self._upload_serial)]
+        if options['bulk']:
+            modes.append(('一括', self._upload_bulk))
+
+        with override_settings(GOOGLE_DRIVE_ROOT_FOLDER_ID='bench-root'):
+            for mode, upload in modes:
+                drive = FakeDriveService(latency=options['latency'])
+                try:
+                    with override_drive_service(drive), transaction.atomic():
+                        orders = self._seed(count)
+                        first = self._measure(drive, upload, orders, f"[{mode}] 初回アップロード")
+                        second = self._measure(drive, upload, orders, f"[{mode}] 再アップロード（上書き）")
+                        raise RollbackSeed
+                except RollbackSeed:
+                    pass
+
+                # 初回: フォルダ検索1回・フォルダ作成1回＋注文書ごとの作成のみ / 再アップロード: 更新のみ
+                if first['list'] > 1 or first['create'] > count + 1 or second['update'] != count or second['create']:
+                    raise CommandError(f"[{mode}] API呼び出し回数が想定を超えています。")
+        self.stdout.write(self.style.SUCCESS("API呼び出し回数は想定どおりです。"))
+
+    def _upload_serial(self, orders):
+        for order in orders:
+            result = upload_order_pdf(order)
+            order.drive_file_id = result['file_id']
+            order.save(update_fields=['drive_file_id'])
+
+    def _upload_bulk(self, orders):
+        errors = [r for r in upload_order_pdfs(orders) if r['error'] is not None]
+        if errors:
+            raise CommandError(f"{errors[0]['order_id']}: {errors[0]['error']}")
+
+    def _measure(self, drive, upload, orders, title):
+        drive.reset_counts()
+        started = time.perf_counter()
+        upload(orders)
+        elapsed = time.perf_counter() - started
+        calls = dict(drive.calls)
+        self.stdout.write(
+            f"{title}: {len(orders)}件 / 往復 {drive.round_trips}回 "
+            f"(list {calls.get('list', 0)} / create {calls.get('create', 0)} / update {calls.get('update', 0)} "
+            f"/ batch {calls.get('batch', 0)}) / {elapsed:.2f}秒"
+        )
+        return Counter(calls)
+
+    def _seed(self, count):
+        """同一パートナー宛の注文書を count 件作成する（呼び出し側で巻き戻す）"""
+        today = datetime.date.today()
+        month = today.replace(day=1)
+        customer = Customer.objects.create(name='計測用顧客')
+        partner = Partner.objects.create(partner_id='BENCHDRIVE', name='計測用パートナー', email='bench@example.com')
+        project = Project.objects.create(customer=customer, name='計測用プロジェクト')
+        return Order.objects.bulk_create([
+            Order(
+                order_id=f"BD{i:010d}", partner=partner, project=project, status='UNCONFIRMED',
+                order_end_ym=month, work_start=month, work_end=today,
+            )
+            for i in range(count)
+        ])
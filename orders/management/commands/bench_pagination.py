@@ -0,0 +1,120 @@
+import datetime
+import statistics
+import time
+import tracemalloc
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from core.domain.models import Customer, Partner
+from core.services.keyset import encode_cursor
+from orders.models import Order, Project
+from orders.views import OrderListView
+
+
+class RollbackSeed(Exception):
+    """計測用データを破棄するためにトランザクションを巻き戻す"""
+
+
+class Command(BaseCommand):
+    help = '注文書一覧（スタッフ表示）の1ページの表示時間・メモリが、注文の件数・ページの深さによらず一定であることを計測する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100000, help='作成する注文の件数')
+        parser.add_argument('--pages', type=int, default=5, help='計測するページ位置の数（先頭〜末尾を等分）')
+        parser.add_argument('--repeat', type=int, default=3, help='ページ位置ごとの計測回数')
+        parser.add_argument('--legacy', action='store_true', help='従来方式（全件表示）も計測する（件数が多いと時間がかかる）')
+        parser.add_argument('--max-ratio', type=float, default=3.0, help='先頭ページに対する最も遅いページの許容倍率')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                staff = self._seed(options['orders'])
+                results = self._measure_keyset(staff, options['pages'], options['repeat'])
+                if options['legacy']:
+                    self._measure_legacy(staff)
+                raise RollbackSeed
+        except RollbackSeed:
+            pass
+
+        first = results[0][1]
+        slowest = max(elapsed for _position, elapsed, _peak in results)
+        ratio = slowest / first if first else 0
+        self.stdout.write(f"先頭ページに対する最も遅いページ: {ratio:.2f} 倍")
+        if ratio > options['max_ratio']:
+            raise CommandError(f"ページの深さによって表示時間が {ratio:.1f} 倍に増えています。")
+        self.stdout.write(self.style.SUCCESS("ページの深さによらず表示時間は一定です。"))
+
+    def _render(self, staff, cursor=None):
+        request = RequestFactory().get('/orders/', {'cursor': cursor} if cursor else {})
+        request.user = staff
+        response = OrderListView.as_view()(request)
+        response.render()
+        return response
+
+    def _measure_keyset(self, staff, pages, repeat):
+        """先頭〜末尾の各位置のページを画面として描画し、時間とメモリの最大使用量を計測する"""
+        keys = OrderListView.keyset_ordering
+        total = Order.objects.count()
+        positions = sorted({round(i * (total - 1) / max(pages - 1, 1)) for i in range(pages)})
+
+        # 各位置の直前の行からカーソルを作る（ページを順に送った場合と同じカーソル）
+        ordered = Order.objects.order_by(*keys)
+        cursors = {
+            position: encode_cursor(ordered[position - 1:position].get(), keys) if position else None
+            for position in positions
+        }
+
+        results = []
+        for position in positions:
+            timings = []
+            for _ in range(repeat):
+                tracemalloc.start()
+                started = time.perf_counter()
+                response = self._render(staff, cursors[position])
+                timings.append(time.perf_counter() - started)
+                _current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            rows = len(response.context_data['orders'])
+            elapsed = statistics.median(timings)
+            results.append((position, elapsed, peak))
+            self.stdout.write(
+                f"{position + 1:>7}件目から {rows}件: 中央値 {elapsed * 1000:.1f}ms / メモリ最大 {peak / 1024:.0f}KB"
+            )
+        return results
+
+    def _measure_legacy(self, staff):
+        """変更前と同じく、全件を1ページに描画する"""
+        orders = Order.objects.select_related('partner', 'project').order_by('-order_date')
+        request = RequestFactory().get('/orders/')
+        request.user = staff
+        tracemalloc.start()
+        started = time.perf_counter()
+        render_to_string('orders/order_list.html', {'orders': orders}, request=request)
+        elapsed = time.perf_counter() - started
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(f"従来方式（全件表示）: {elapsed * 1000:.1f}ms / メモリ最大 {peak / 1024:.0f}KB")
+
+    def _seed(self, count):
+        """計測用の注文を count 件作成する（呼び出し側で巻き戻す）"""
+        today = datetime.date.today()
+        customer = Customer.objects.create(name='計測用顧客')
+        partner = Partner.objects.create(partner_id='BENCHPAGE', name='計測用パートナー', email='bench@example.com')
+        project = Project.objects.create(customer=customer, name='計測用プロジェクト')
+        batch = []
+        for i in range(count):
+            # 同じ注文日の注文が複数ある状態で、約10年分に散らす
+            order_date = today - datetime.timedelta(days=i // 30)
+            batch.append(Order(
+                order_id=f"BP{i:010d}", partner=partner, project=project, status='UNCONFIRMED',
+                order_end_ym=order_date.replace(day=1), order_date=order_date,
+                work_start=order_date, work_end=order_date,
+            ))
+            if len(batch) >= 5000:
+                Order.objects.bulk_create(batch)
+                batch = []
+        Order.objects.bulk_create(batch)
+        self.stdout.write(f"計測用の注文を {count}件作成しました。")
+        return get_user_model().objects.create_user('bench_pagination', 'bench@example.com', is_staff=True)
@@ -0,0 +1,113 @@
+import os
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from core.services.batch_render import DOCUMENT_KINDS, iter_rendered
+from core.services.document_export import parse_month, select_documents
+from core.services.document_lifecycle import FROZEN_DOCUMENTS, freeze, should_freeze
+from orders.models import Order
+from orders.services.publishing import publish_order
+from invoices.models import Invoice
+
+
+class Command(BaseCommand):
+    help = (
+        '対象月の注文書・注文請書・請求書PDFをプロセスプールで一括生成し、原本として保存する。'
+        '支払通知書は原本を保存しないため、描画のみ行う（描画時間の計測用）'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(DOCUMENT_KINDS), help='書類種別')
+        parser.add_argument('--month', help='対象年月 (YYYY-MM)。注文は注文終了年月、請求は対象年月で絞り込む')
+        parser.add_argument('--status', help='ステータス（カンマ区切りで複数指定可）')
+        parser.add_argument('--partner', help='パートナーID')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='ワーカープロセス数（1で直列実行）')
+        parser.add_argument('--publish', action='store_true', help='注文書: 下書きも対象にし、正式発行（未確認（発行済）に更新）する')
+        parser.add_argument('--overwrite', action='store_true', help='保存済みの原本も再生成して差し替える')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        queryset = self._build_queryset(kind, options)
+        pks = list(queryset.values_list('pk', flat=True))
+        if not pks:
+            self.stdout.write(self.style.WARNING("対象の書類がありません。"))
+            return
+
+        self.stdout.write(f"{len(pks)}件の{kind}を{options['workers']}プロセスで生成します...")
+
+        started = time.perf_counter()
+        latencies = []
+        failures = []
+        for pk, content, elapsed, error in iter_rendered(kind, pks, workers=options['workers']):
+            if error is not None:
+                failures.append((pk, error))
+                self.stdout.write(self.style.ERROR(f"Failed: {pk}: {error}"))
+                continue
+            try:
+                self._persist(kind, pk, content, options)
+            except Exception as e:
+                failures.append((pk, e))
+                self.stdout.write(self.style.ERROR(f"Failed to save: {pk}: {e}"))
+                continue
+            latencies.append(elapsed)
+        total = time.perf_counter() - started
+
+        self._report(len(pks), latencies, failures, total)
+
+    def _build_queryset(self, kind, options):
+        if options['publish'] and kind != 'order':
+            raise CommandError("--publish は注文書（order）にのみ指定できます。")
+        month = None
+        if options['month']:
+            try:
+                month = parse_month(options['month'])
+            except ValueError:
+                raise CommandError("--month は YYYY-MM 形式で指定してください。")
+        statuses = [s.strip() for s in options['status'].split(',')] if options['status'] else None
+        queryset = select_documents(kind, month=month, partner_id=options['partner'], statuses=statuses)
+
+        if kind in FROZEN_DOCUMENTS:
+            # 原本を確定する状態の書類のみ（--publish の場合は発行する下書きも含める）
+            allowed = list(FROZEN_DOCUMENTS[kind]['statuses'])
+            if options['publish']:
+                allowed.append('DRAFT')
+            queryset = queryset.filter(status__in=allowed)
+            if not options['overwrite']:
+                # 保存済みの原本（電帳法対応）は上書きしない
+                field = FROZEN_DOCUMENTS[kind]['file_field']
+                queryset = queryset.filter(Q(**{field: ''}) | Q(**{f'{field}__isnull': True}))
+        return queryset
+
+    def _persist(self, kind, pk, content, options):
+        """生成したPDFを原本として保存する（支払通知書は保存先がないため保存しない）"""
+        if kind in ('order', 'acceptance'):
+            order = Order.objects.get(pk=pk)
+            if kind == 'order' and order.status == 'DRAFT':
+                publish_order(order, content=content)
+            elif should_freeze(order, kind):
+                freeze(order, kind, content=content, force=options['overwrite'])
+        elif kind == 'invoice':
+            invoice = Invoice.objects.get(pk=pk)
+            if should_freeze(invoice, 'invoice'):
+                freeze(invoice, 'invoice', content=content, force=options['overwrite'])
+
+    def _report(self, requested, latencies, failures, total):
+        done = len(latencies)
+        self.stdout.write("")
+        self.stdout.write(f"対象: {requested}件 / 成功: {done}件 / 失敗: {len(failures)}件")
+        self.stdout.write(f"所要時間: {total:.2f}秒 / スループット: {done / total if total else 0:.1f}件/秒")
+        if latencies:
+            ordered = sorted(latencies)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            self.stdout.write(
+                "描画時間(ms): "
+                f"平均 {statistics.mean(ordered) * 1000:.1f} / "
+                f"中央値 {statistics.median(ordered) * 1000:.1f} / "
+                f"p95 {p95 * 1000:.1f} / "
+                f"最大 {ordered[-1] * 1000:.1f}"
+            )
+        if failures:
+            self.stdout.write(self.style.ERROR(f"{len(failures)}件の生成に失敗しました。"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Successfully generated {done} PDFs."))
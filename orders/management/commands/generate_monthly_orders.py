@@ -0,0 +1,45 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from core.services.document_export import parse_month
+from orders.services.monthly_orders import generate_monthly_documents
+
+
+class Command(BaseCommand):
+    help = '発注基本情報から、発行タイミングを過ぎた当月の注文書・請求書（下書き）を一括作成する（毎日のスケジュール実行用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='対象年月 (YYYY-MM)。省略時は --date の月')
+        parser.add_argument('--date', help='発行タイミングの判定日 (YYYY-MM-DD)。省略時は今日')
+        parser.add_argument('--orders-only', action='store_true', help='注文のみ作成し、請求書は作成しない')
+        parser.add_argument('--dry-run', action='store_true', help='作成件数の確認のみ行い、保存しない')
+
+    def handle(self, *args, **options):
+        try:
+            as_of = datetime.date.fromisoformat(options['date']) if options['date'] else datetime.date.today()
+            month = parse_month(options['month']) if options['month'] else as_of.replace(day=1)
+        except ValueError:
+            raise CommandError("--month は YYYY-MM、--date は YYYY-MM-DD 形式で指定してください。")
+
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            result = generate_monthly_documents(
+                month, as_of=as_of, invoices=not options['orders_only'], dry_run=options['dry_run'],
+            )
+        elapsed = time.perf_counter() - started
+
+        for order in result['orders']:
+            self.stdout.write(f"注文: {order.order_id} ({order.partner_id} × {order.project_id})")
+        for invoice in result['invoices']:
+            self.stdout.write(f"請求書: {invoice.invoice_no} (注文 {invoice.order_id})")
+
+        summary = (
+            f"{month:%Y-%m}: 注文 {len(result['orders'])}件 / 請求書 {len(result['invoices'])}件 / "
+            f"{len(queries)}クエリ / {elapsed:.2f}秒"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{summary}（未保存）"))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
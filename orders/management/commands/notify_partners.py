@@ -1,22 +1,29 @@
 import datetime
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from django.conf import settings
 from django.urls import reverse
-from core.domain.models import CompanyInfo, Partner
+from core.domain.models import SentEmailLog
+from core.services.bulk_mail import send_bulk
+from core.services.company import get_company_info
 from orders.models import Order
 
 class Command(BaseCommand):
-    help = 'パートナーへ注文書発行の通知メールを一括送信する'
+    help = 'パートナーへ注文書発行の通知メールを一括送信する（パートナーごとに1通）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='送信ワーカー数（省略時は settings.BULK_MAIL_WORKERS）')
+        parser.add_argument('--rate', type=float, default=None, help='1秒あたりの送信数の上限（省略時は settings.BULK_MAIL_RATE、0 は無制限）')
+        parser.add_argument('--dry-run', action='store_true', help='送信せずに宛先と件数のみ表示する')
 
     def handle(self, *args, **options):
         # 本来は前月末に実行する想定
         # 実行時点から見た「来月」の注文を対象とするか、あるいは未送信のものを対象とするか
         # ここでは、ステータスが UNCONFIRMED の最近の注文を対象とする簡易実装とする
-        
-        company = CompanyInfo.objects.first()
+
+        company = get_company_info()
         company_name = company.name if company else "有限会社 マックプランニング"
-        
+
         # サイトのURL（環境に合わせて設定が必要）
         site_url = getattr(settings, 'SITE_URL', 'http://127.0.0.1:8000')
 
@@ -26,18 +33,27 @@ class Command(BaseCommand):
         deadline_str = deadline.strftime('%m月%d日')
 
         # 未通知の注文を取得（通知済みフラグがないので、UNCONFIRMEDのものを対象）
-        orders = Order.objects.filter(status='UNCONFIRMED')
-        
-        sent_count = 0
+        orders = Order.objects.filter(status='UNCONFIRMED').select_related('partner', 'project').order_by('partner_id', 'order_id')
+
+        # パートナーごとにまとめて1通にする
+        orders_by_partner = {}
         for order in orders:
-            partner = order.partner
+            orders_by_partner.setdefault(order.partner_id, []).append(order)
+
+        partners = []
+        messages = []
+        subject = f"注文書発行のお知らせ（{company_name}）"
+        for partner_orders in orders_by_partner.values():
+            partner = partner_orders[0].partner
             if not partner.email:
                 self.stdout.write(self.style.WARNING(f"Skip: {partner.name} has no email."))
                 continue
 
-            url = f"{site_url}{reverse('orders:order_detail', args=[order.order_id])}"
-
-            subject = f"注文書発行のお知らせ（{company_name}）"
+            order_lines = "\n".join(
+                f"■注文番号：{order.order_id}（{order.project.name}）\n"
+                f"{site_url}{reverse('orders:order_detail', args=[order.order_id])}"
+                for order in partner_orders
+            )
             body = f"""{partner.name} 御中
 
 いつもお世話になっております。
@@ -50,13 +66,13 @@ EDIに注文書を登録しましたので、
 ダウンロードした注文書は、御社サーバ上に必ず保管して下さい。
 
 《URL》
-{url}
+{order_lines}
 
 《送付物》
 
 「注文書」
 「注文請書」
-  各1通
+  各{len(partner_orders)}通
 
 
 《お願い》
@@ -71,17 +87,29 @@ EDIに注文書を登録しましたので、
 
 以上、よろしくお願いします。
 """
-            try:
-                send_mail(
-                    subject,
-                    body,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [partner.email],
-                    fail_silently=False,
-                )
-                sent_count += 1
-                self.stdout.write(self.style.SUCCESS(f"Sent to: {partner.email}"))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Failed to send to {partner.email}: {e}"))
+            partners.append(partner)
+            messages.append(EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [partner.email]))
+
+        if options['dry_run']:
+            for partner, message in zip(partners, messages):
+                self.stdout.write(f"Dry run: {partner.email} ({len(orders_by_partner[partner.partner_id])} orders)")
+            self.stdout.write(self.style.SUCCESS(f"{len(messages)} emails would be sent (dry run)."))
+            return
 
-        self.stdout.write(self.style.SUCCESS(f"Successfully sent {sent_count} emails."))
+        result = send_bulk(messages, workers=options['workers'], rate=options['rate'])
+
+        logs = []
+        for partner, message, error in zip(partners, messages, result['errors']):
+            if error is None:
+                logs.append(SentEmailLog(partner=partner, subject=message.subject, body=message.body))
+                self.stdout.write(self.style.SUCCESS(f"Sent to: {partner.email}"))
+            else:
+                self.stdout.write(self.style.ERROR(f"Failed to send to {partner.email}: {error}"))
+        SentEmailLog.objects.bulk_create(logs)
+
+        elapsed = result['elapsed']
+        throughput = result['sent'] / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{result['sent']} sent / {result['failed']} failed in {elapsed:.2f}s ({throughput:.1f} emails/s)"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Successfully sent {result['sent']} emails."))
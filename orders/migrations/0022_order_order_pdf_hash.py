@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0021_remove_order_customer_remove_person_partner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='order_pdf_hash',
+            field=models.CharField(blank=True, help_text='保存した注文書PDFのSHA-256（注文請書は document_hash）', max_length=64, verbose_name='注文書PDFハッシュ'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0022_order_order_pdf_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-order_date', '-order_id'], name='orders_order_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['partner', '-order_date', '-order_id'], name='orders_partner_date_id_idx'),
+        ),
+    ]
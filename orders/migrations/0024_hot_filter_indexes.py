@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-17 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0023_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-order_date'], name='orders_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['partner', 'status', '-order_date'], name='orders_partner_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'partner', 'order_id'], name='orders_status_partner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('external_signature_id__isnull', False)), fields=['external_signature_id'], name='orders_ext_signature_idx'),
+        ),
+    ]
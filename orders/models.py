@@ -14,21 +14,27 @@ class Project(models.Model):
         verbose_name = _("プロジェクト")
         verbose_name_plural = _("プロジェクト")
 
+    @classmethod
+    def allocate_ids(cls, count=1):
+        """プロジェクトID（PRJ+8桁連番）を count 件まとめて確保する"""
+        from core.services.sequences import allocate, seed_from_last
+        first = allocate(
+            'project:PRJ', count,
+            seed=seed_from_last(cls.objects.filter(project_id__startswith='PRJ'), 'project_id', 3),
+        )
+        return [f"PRJ{str(n).zfill(8)}" for n in range(first, first + count)]
+
     def save(self, *args, **kwargs):
+        explicit = self._state.adding and bool(self.project_id)
         if not self.project_id:
-            # PRJで始まるIDの中から最大値を取得
-            last_project = Project.objects.filter(project_id__startswith='PRJ').order_by('-project_id').first()
-            if last_project:
-                try:
-                    # PRJの後の数値を抽出
-                    last_id_num = int(last_project.project_id[3:])
-                    next_id = last_id_num + 1
-                except ValueError:
-                    next_id = 1
-            else:
-                next_id = 1
-            self.project_id = f"PRJ{str(next_id).zfill(8)}"
+            self.project_id = self.allocate_ids()[0]
         super().save(*args, **kwargs)
+        if explicit:
+            # 手入力された PRJ+連番 のIDは、以降の採番で払い出さないようカウンタに反映する
+            from core.services.sequences import observe, sequence_number
+            number = sequence_number(self.project_id, 'PRJ')
+            if number is not None:
+                observe('project:PRJ', number)
 
     def __str__(self):
         return f"[{self.project_id}] {self.name}"
@@ -123,6 +129,18 @@ class OrderBasicInfo(models.Model):
 
 # トランザクションモデル（実績）
 
+# 支払条件・契約条件の自動設定に関係する項目
+TERM_FIELDS = frozenset([
+    'partner', 'project', 'payment_term', 'payment_condition', 'contract_term', 'contract_items',
+])
+# apply_terms が設定する項目（フィールド名 → 属性名）
+APPLIED_TERM_FIELDS = {
+    'payment_term': 'payment_term_id',
+    'payment_condition': 'payment_condition',
+    'contract_term': 'contract_term_id',
+    'contract_items': 'contract_items',
+}
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('DRAFT', _('下書き')),
@@ -135,6 +153,20 @@ class Order(models.Model):
     class Meta:
         verbose_name = _("注文情報")
         verbose_name_plural = _("注文情報")
+        indexes = [
+            # 注文書一覧のキーセットページ送り（スタッフ：全件、パートナー：自社分）
+            models.Index(fields=['-order_date', '-order_id'], name='orders_order_date_id_idx'),
+            models.Index(fields=['partner', '-order_date', '-order_id'], name='orders_partner_date_id_idx'),
+            # ダッシュボードのステータス別一覧（スタッフ：全件、パートナー：自社分）・未確認注文のパートナー別の通知
+            models.Index(fields=['status', '-order_date'], name='orders_status_date_idx'),
+            models.Index(fields=['partner', 'status', '-order_date'], name='orders_partner_status_date_idx'),
+            models.Index(fields=['status', 'partner', 'order_id'], name='orders_status_partner_idx'),
+            # 電子署名の Webhook（署名IDからの注文の特定）。署名依頼前の注文（NULL）は含めない
+            models.Index(
+                fields=['external_signature_id'], name='orders_ext_signature_idx',
+                condition=models.Q(external_signature_id__isnull=False),
+            ),
+        ]
 
     order_id = models.CharField(_("注文番号"), max_length=20, primary_key=True, help_text="MP+YYYYMMDD+6桁連番")
     partner = models.ForeignKey('core.Partner', on_delete=models.CASCADE, verbose_name=_("パートナー"), db_column='customer_id')
@@ -180,47 +212,42 @@ class Order(models.Model):
     # PDFファイルの永続保存
     order_pdf = models.FileField(_("注文書PDF"), upload_to='orders/pdfs/', null=True, blank=True)
     acceptance_pdf = models.FileField(_("注文請書PDF"), upload_to='acceptances/pdfs/', null=True, blank=True)
+    order_pdf_hash = models.CharField(_("注文書PDFハッシュ"), max_length=64, blank=True, help_text="保存した注文書PDFのSHA-256（注文請書は document_hash）")
 
     # 外部連携
     external_signature_id = models.CharField(_("外部署名ID"), max_length=100, blank=True, null=True)
     drive_file_id = models.CharField(_("DriveファイルID"), max_length=200, blank=True)
 
+    @classmethod
+    def allocate_ids(cls, count=1, date=None):
+        """注文番号（MP+YYYYMMDD+6桁連番）を count 件まとめて確保する"""
+        from core.services.sequences import allocate, seed_from_last
+        prefix = f"MP{(date or datetime.date.today()).strftime('%Y%m%d')}"
+        first = allocate(
+            f"order:{prefix}", count,
+            seed=seed_from_last(cls.objects.filter(order_id__startswith=prefix), 'order_id', len(prefix)),
+        )
+        return [f"{prefix}{str(n).zfill(6)}" for n in range(first, first + count)]
+
     def save(self, *args, **kwargs):
         if not self.order_id:
-            today_str = datetime.date.today().strftime('%Y%m%d')
-            prefix = f"MP{today_str}"
-            last_order = Order.objects.filter(order_id__startswith=prefix).order_by('-order_id').first()
-            if last_order:
-                # MPYYYYMMDDXXXXXX の XXXXXX 部分をインクリメント
-                try:
-                    last_num = int(last_order.order_id[-6:])
-                    next_id_num = last_num + 1
-                except ValueError:
-                    next_id_num = 1
-            else:
-                next_id_num = 1
-            self.order_id = f"{prefix}{str(next_id_num).zfill(6)}"
+            self.order_id = self.allocate_ids()[0]
 
         # パートナー×プロジェクトから支払条件・契約条件を自動設定
-        if self.partner_id and self.project_id:
-            if not self.payment_term_id:
-                pt = PaymentTerm.objects.filter(
-                    partner_id=self.partner_id, project_id=self.project_id
-                ).first()
-                if pt:
-                    self.payment_term = pt
-            if not self.contract_term_id:
-                ct = ContractTerm.objects.filter(
-                    partner_id=self.partner_id, project_id=self.project_id
-                ).first()
-                if ct:
-                    self.contract_term = ct
-
-            # PaymentTerm/ContractTermのdescriptionをテキストフィールドに反映
-            if self.payment_term and not self.payment_condition:
-                self.payment_condition = self.payment_term.description
-            if self.contract_term and not self.contract_items:
-                self.contract_items = self.contract_term.description
+        # （ステータス更新など、update_fields で条件に関係しない項目だけを保存する場合は行わない）
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or not TERM_FIELDS.isdisjoint(update_fields):
+            from orders.services.term_resolution import apply_terms
+            before = {field: getattr(self, attname) for field, attname in APPLIED_TERM_FIELDS.items()}
+            apply_terms([self])
+            if update_fields is not None:
+                # 一部の項目だけを保存する場合も、自動設定した条件を保存対象に加える
+                changed = [
+                    field for field, attname in APPLIED_TERM_FIELDS.items()
+                    if getattr(self, attname) != before[field] and field not in update_fields
+                ]
+                if changed:
+                    kwargs['update_fields'] = [*update_fields, *changed]
 
         super().save(*args, **kwargs)
 
@@ -249,20 +276,24 @@ class OrderItem(models.Model):
         verbose_name_plural = _("注文明細")
 
     def save(self, *args, **kwargs):
-        # 調整金の計算
-        adjustment = 0
-        if self.actual_hours > 0:
-            if self.actual_hours < self.time_lower_limit:
-                shortage_hours = self.time_lower_limit - self.actual_hours
-                adjustment = -int(shortage_hours * self.shortage_rate)
-            elif self.actual_hours > self.time_upper_limit:
-                excess_hours = self.actual_hours - self.time_upper_limit
-                adjustment = int(excess_hours * self.excess_rate)
-        
-        # 合計金額の計算 (工数 * 基本料金 + 調整金)
-        self.price = int(self.effort * self.base_fee) + adjustment
+        # 合計金額の計算 (工数 * 基本料金 + 調整金)。精算ルールは core.services.settlement_rules
+        self.price = self.calculate_price()[2]
         super().save(*args, **kwargs)
 
+    def calculate_price(self):
+        """(工数×基本料金, 調整金, 金額) を現在の入力から計算する"""
+        from core.services.settlement_rules import order_item_price, to_decimal
+        return order_item_price(
+            to_decimal(self.effort), self.base_fee, to_decimal(self.actual_hours), to_decimal(self.time_lower_limit),
+            to_decimal(self.time_upper_limit), self.shortage_rate, self.excess_rate,
+        )
+
+    @property
+    def adjustment(self):
+        """保存済みの金額から求めた調整金（超過は正・不足は負）。PDF描画時に精算を再計算しない"""
+        from core.services.settlement_rules import base_amount
+        return self.price - base_amount(self.effort, self.base_fee)
+
     def __str__(self):
         name = self.person_name or (self.product.name if self.product else _("明細"))
         return f"{self.order.order_id} - {name}"
@@ -3,144 +3,217 @@ Google Drive APIサービス
 注文書PDFをGoogleドライブの共有フォルダにアップロードする。
 
 フォルダ構成:
-  共有フォルダ/注文書/パートナー会社名/order_XXXXX.pdf
+  共有フォルダ/パートナー会社名/order_XXXXX.pdf
+
+認証情報・クライアント・フォルダIDのキャッシュは core.services.google_drive を使用する。
 """
 import io
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
+from core.services.google_drive import (
+    execute_batch, find_or_create_folder, find_or_create_folders, get_drive_service, invalidate_folder, is_not_found,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def _get_drive_service():
-    """Google Drive APIサービスを構築する"""
-    from google.auth import default, impersonated_credentials
-    from googleapiclient.discovery import build
-
-    sa_email = getattr(settings, 'GOOGLE_DRIVE_SERVICE_ACCOUNT', None)
-
-    # サービスアカウント偽装（組織ポリシーでJSON鍵作成が禁止されている場合）
-    if sa_email:
-        source_credentials, _ = default()
-        target_scopes = ['https://www.googleapis.com/auth/drive']
-        credentials = impersonated_credentials.Credentials(
-            source_credentials=source_credentials,
-            target_principal=sa_email,
-            target_scopes=target_scopes,
-        )
-    else:
-        # ADC（Application Default Credentials）を直接使用
-        credentials, _ = default(scopes=['https://www.googleapis.com/auth/drive'])
-
-    return build('drive', 'v3', credentials=credentials)
-
-
-def _find_or_create_folder(service, name, parent_id):
-    """指定した親フォルダ内にフォルダを検索し、なければ作成する"""
-    query = (
-        f"name='{name}' and "
-        f"'{parent_id}' in parents and "
-        f"mimeType='application/vnd.google-apps.folder' and "
-        f"trashed=false"
-    )
-    results = service.files().list(
-        q=query, spaces='drive', fields='files(id, name)', pageSize=1,
-        supportsAllDrives=True, includeItemsFromAllDrives=True
-    ).execute()
-    files = results.get('files', [])
+def _media(pdf_data):
+    from googleapiclient.http import MediaIoBaseUpload
+    return MediaIoBaseUpload(io.BytesIO(pdf_data), mimetype='application/pdf', resumable=True)
 
-    if files:
-        return files[0]['id']
 
-    # フォルダ作成
-    file_metadata = {
-        'name': name,
-        'mimeType': 'application/vnd.google-apps.folder',
-        'parents': [parent_id],
-    }
-    folder = service.files().create(body=file_metadata, fields='id', supportsAllDrives=True).execute()
-    logger.info(f"Created Drive folder: {name} (id={folder['id']})")
-    return folder['id']
+def _read_pdf(order):
+    if order.order_pdf:
+        with order.order_pdf.open('rb') as f:
+            return f.read()
+    from .pdf_generator import generate_order_pdf
+    return generate_order_pdf(order).getvalue()
 
 
 def upload_order_pdf(order):
     """
     注文書PDFをGoogleドライブにアップロードする。
 
-    フォルダ構成: 共有フォルダ/注文書/パートナー会社名/order_XXXXX.pdf
-    既存ファイルがあれば上書き（更新）する。
+    フォルダ構成: 共有フォルダ/パートナー会社名/order_XXXXX.pdf
+    アップロード済み（drive_file_id あり）の場合はそのファイルを上書き（更新）する。
+    パートナーフォルダのIDはキャッシュし、ファイルの検索は行わない。
 
     Returns:
         dict: {'file_id': str, 'url': str} アップロード結果
     Raises:
         Exception: アップロードに失敗した場合
     """
-    from googleapiclient.http import MediaIoBaseUpload
-
     root_folder_id = getattr(settings, 'GOOGLE_DRIVE_ROOT_FOLDER_ID', None)
     if not root_folder_id:
         raise ValueError("GOOGLE_DRIVE_ROOT_FOLDER_ID が設定されていません。settings.py を確認してください。")
 
-    service = _get_drive_service()
-
-    # 1. パートナー会社名フォルダを検索/作成（ROOT直下）
-    partner_name = order.partner.name
-    partner_folder_id = _find_or_create_folder(service, partner_name, root_folder_id)
-
-    # 3. PDFファイル名
+    service = get_drive_service('orders')
     filename = f"order_{order.order_id}.pdf"
-
-    # 4. 既存ファイルを検索（上書き用）
-    query = (
-        f"name='{filename}' and "
-        f"'{partner_folder_id}' in parents and "
-        f"trashed=false"
-    )
-    results = service.files().list(
-        q=query, spaces='drive', fields='files(id)', pageSize=1,
-        supportsAllDrives=True, includeItemsFromAllDrives=True
+    pdf_data = _read_pdf(order)
+
+    # 1. アップロード済みのファイルを更新
+    if order.drive_file_id:
+        try:
+            file = service.files().update(
+                fileId=order.drive_file_id,
+                media_body=_media(pdf_data),
+                fields='id, webViewLink',
+                supportsAllDrives=True
+            ).execute()
+            logger.info(f"Updated Drive file: {filename} (id={file['id']})")
+            return _result(file)
+        except Exception as e:
+            if not is_not_found(e):
+                raise
+            # Drive上で削除されていた場合は新規作成する
+            logger.info(f"Drive file {order.drive_file_id} not found. Creating {filename}.")
+
+    # 2. パートナー会社名フォルダ（ROOT直下）に新規作成
+    partner_folder_id = find_or_create_folder(service, order.partner.name, root_folder_id)
+    try:
+        file = _create_file(service, filename, partner_folder_id, pdf_data)
+    except Exception as e:
+        if not is_not_found(e):
+            raise
+        # キャッシュしていたフォルダが削除・移動されていた
+        invalidate_folder(partner_folder_id)
+        partner_folder_id = find_or_create_folder(service, order.partner.name, root_folder_id)
+        file = _create_file(service, filename, partner_folder_id, pdf_data)
+    logger.info(f"Uploaded to Drive: {filename} (id={file['id']})")
+    return _result(file)
+
+
+def _create_file(service, filename, folder_id, pdf_data):
+    file_metadata = {
+        'name': filename,
+        'parents': [folder_id],
+    }
+    return service.files().create(
+        body=file_metadata,
+        media_body=_media(pdf_data),
+        fields='id, webViewLink',
+        supportsAllDrives=True
     ).execute()
-    existing_files = results.get('files', [])
 
-    # 5. PDFデータを取得
-    if order.order_pdf:
-        order.order_pdf.seek(0)
-        pdf_data = order.order_pdf.read()
-    else:
-        from .pdf_generator import generate_order_pdf
-        buffer = generate_order_pdf(order)
-        pdf_data = buffer.getvalue()
-
-    media = MediaIoBaseUpload(
-        io.BytesIO(pdf_data),
-        mimetype='application/pdf',
-        resumable=True
-    )
-
-    # 6. アップロード or 更新
-    if existing_files:
-        file_id = existing_files[0]['id']
-        file = service.files().update(
-            fileId=file_id,
-            media_body=media,
-            fields='id, webViewLink',
-            supportsAllDrives=True
-        ).execute()
-        logger.info(f"Updated Drive file: {filename} (id={file['id']})")
-    else:
-        file_metadata = {
-            'name': filename,
-            'parents': [partner_folder_id],
-        }
-        file = service.files().create(
-            body=file_metadata,
-            media_body=media,
-            fields='id, webViewLink',
-            supportsAllDrives=True
-        ).execute()
-        logger.info(f"Uploaded to Drive: {filename} (id={file['id']})")
 
+def _result(file):
     return {
         'file_id': file['id'],
         'url': file.get('webViewLink', f"https://drive.google.com/file/d/{file['id']}/view"),
     }
+
+
+def upload_order_pdfs(orders, workers=None):
+    """
+    複数の注文書PDFをまとめてGoogleドライブにアップロードする（管理画面の一括アップロード用）。
+
+    1. パートナーフォルダの検索・作成と、未アップロードの注文書のファイル作成（メタデータのみ）を
+       バッチリクエストでまとめて実行する
+    2. PDF本体の送信をスレッドプール（settings.GOOGLE_DRIVE_UPLOAD_WORKERS）で並列に実行する
+    3. drive_file_id を bulk_update で一括保存する
+
+    Returns:
+        list[dict]: 注文ごとの結果
+            {'order_id': str, 'file_id': str, 'action': 'created' / 'updated', 'error': 例外 or None}
+    """
+    from orders.models import Order
+
+    root_folder_id = getattr(settings, 'GOOGLE_DRIVE_ROOT_FOLDER_ID', None)
+    if not root_folder_id:
+        raise ValueError("GOOGLE_DRIVE_ROOT_FOLDER_ID が設定されていません。settings.py を確認してください。")
+
+    orders = list(orders)
+    workers = workers or getattr(settings, 'GOOGLE_DRIVE_UPLOAD_WORKERS', 8)
+    service = get_drive_service('orders')
+    results = {
+        order.order_id: {'order_id': order.order_id, 'file_id': order.drive_file_id, 'action': 'updated', 'error': None}
+        for order in orders
+    }
+
+    # 1. 未アップロードの注文書はファイルを先に作成してIDを確保する
+    new_orders = [order for order in orders if not order.drive_file_id]
+    for retry in (False, True):
+        if not new_orders:
+            break
+        folder_ids = find_or_create_folders(service, [o.partner.name for o in new_orders], root_folder_id)
+        requests = [
+            service.files().create(
+                body={
+                    'name': f"order_{order.order_id}.pdf",
+                    'mimeType': 'application/pdf',
+                    'parents': [folder_ids[order.partner.name]],
+                },
+                fields='id', supportsAllDrives=True,
+            )
+            for order in new_orders
+        ]
+        missing_folders = []
+        for order, (response, exception) in zip(new_orders, execute_batch(service, requests)):
+            result = results[order.order_id]
+            if exception is None:
+                result.update(file_id=response['id'], action='created', error=None)
+            elif is_not_found(exception) and not retry:
+                # キャッシュしていたフォルダが削除・移動されていた
+                missing_folders.append(order)
+                invalidate_folder(folder_ids[order.partner.name])
+            else:
+                result['error'] = exception
+        new_orders = missing_folders
+
+    # 2. PDF本体を並列に送信する（DBアクセスはメインスレッドで行う）
+    targets = [(order, results[order.order_id]) for order in orders if results[order.order_id]['file_id']]
+    payloads = {}
+    for order, result in targets:
+        if not order.order_pdf:
+            try:
+                payloads[order.order_id] = _read_pdf(order)
+            except Exception as e:
+                result['error'] = e
+
+    def send(order, result):
+        pdf_data = payloads.get(order.order_id) or _read_pdf(order)
+        get_drive_service('orders').files().update(
+            fileId=result['file_id'],
+            media_body=_media(pdf_data),
+            fields='id',
+            supportsAllDrives=True
+        ).execute()
+
+    deleted = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            (order, result, executor.submit(send, order, result))
+            for order, result in targets if result['error'] is None
+        ]
+        for order, result, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                if is_not_found(e) and result['action'] == 'updated':
+                    deleted.append(order)
+                else:
+                    result['error'] = e
+
+    # Drive上で削除されていたファイルは作成し直す
+    for order in deleted:
+        result = results[order.order_id]
+        order.drive_file_id = result['file_id'] = ''
+        try:
+            result.update(file_id=upload_order_pdf(order)['file_id'], action='created')
+        except Exception as e:
+            result['error'] = e
+
+    # 3. drive_file_id を一括保存
+    # PDFの送信に失敗した場合も作成済みのファイルIDは保存し、次回はそのファイルを更新する
+    changed = []
+    for order in orders:
+        result = results[order.order_id]
+        if result['error'] is not None:
+            logger.warning(f"Drive upload failed for {order.order_id}: {result['error']}")
+        if result['file_id'] and order.drive_file_id != result['file_id']:
+            order.drive_file_id = result['file_id']
+            changed.append(order)
+    Order.objects.bulk_update(changed, ['drive_file_id'])
+
+    return [results[order.order_id] for order in orders]
@@ -0,0 +1,273 @@
+"""
+月次の注文書・請求書の一括作成サービス
+
+発注基本情報（OrderBasicInfo）のうち、対象月が契約期間内で発行タイミングを過ぎたものについて、
+その月の注文（下書き）と請求書（下書き）をまとめて作成する。
+
+- 注文の内容（料金・精算条件・明細・担当者など）は、同じパートナー×プロジェクトの
+  直近の注文を引き継ぐ（実稼働時間は 0 に戻す）。直近の注文がなければ空の注文を作成する
+- 支払条件・契約条件は orders.services.term_resolution でまとめて解決する
+- 注文番号・請求番号はまとめて確保し、bulk_create で登録する
+- 請求書は実稼働時間が入力された注文のみ作成する（作成直後の注文は実稼働時間が 0 のため、
+  請求書は入力後の実行で作成される）
+
+作成済みの月（パートナー×プロジェクト×注文終了年月）はスキップするため、
+毎日実行しても重複して作成しない。
+"""
+import calendar
+import datetime
+import logging
+
+from django.db import transaction
+
+from core.services.search import update_search_index
+from core.services.settlement_rules import base_amount
+
+logger = logging.getLogger(__name__)
+
+# 発行タイミング → 月内の発行日（None は月末）
+ISSUANCE_DAYS = {
+    'FIRST_DAY': 1,
+    '10TH_DAY': 10,
+    '15TH_DAY': 15,
+    '20TH_DAY': 20,
+    'LAST_DAY': None,
+}
+
+# 直近の注文から引き継ぐ項目
+INHERITED_ORDER_FIELDS = (
+    'workplace_id', 'deliverable_id', 'deliverable_text', 'payment_condition', 'contract_items',
+    '甲_責任者', '甲_担当者', '乙_責任者', '乙_担当者', '作業責任者',
+    'base_fee', 'time_lower_limit', 'time_upper_limit', 'shortage_fee', 'excess_fee', 'remarks',
+)
+INHERITED_ITEM_FIELDS = (
+    'product_id', 'person_name', 'effort', 'base_fee', 'time_lower_limit', 'time_upper_limit',
+    'shortage_rate', 'excess_rate', 'quantity',
+)
+
+
+def month_range(month):
+    """対象月の初日と末日"""
+    first = month.replace(day=1)
+    return first, first.replace(day=calendar.monthrange(first.year, first.month)[1])
+
+
+def issuance_date(month, timing):
+    """対象月における発行日"""
+    first, last = month_range(month)
+    day = ISSUANCE_DAYS.get(timing)
+    return last if day is None else first.replace(day=day)
+
+
+def is_due(month, timing, as_of):
+    """as_of の時点で、対象月の発行日を過ぎているか"""
+    return issuance_date(month, timing) <= as_of
+
+
+def _latest_orders(pairs, before):
+    """パートナー×プロジェクトごとの、before より前の直近の注文"""
+    from orders.models import Order
+
+    partner_ids = {partner_id for partner_id, _project_id in pairs}
+    project_ids = {project_id for _partner_id, project_id in pairs}
+    latest = {}
+    orders = (
+        Order.objects.filter(partner_id__in=partner_ids, project_id__in=project_ids, order_end_ym__lt=before)
+        .order_by('-order_end_ym', '-created_at')
+        .only('order_id', 'partner_id', 'project_id', *INHERITED_ORDER_FIELDS)
+    )
+    for order in orders.iterator(chunk_size=2000):
+        latest.setdefault((order.partner_id, order.project_id), order)
+    return {pair: order for pair, order in latest.items() if pair in pairs}
+
+
+def _group_by_order(queryset):
+    grouped = {}
+    for obj in queryset:
+        grouped.setdefault(obj.order_id, []).append(obj)
+    return grouped
+
+
+def generate_orders(month, as_of, basic_infos):
+    """
+    発行日を過ぎた発注基本情報の注文（下書き）を作成する。
+
+    Returns:
+        list: 作成した注文
+    """
+    from orders.models import Order, OrderItem, Person
+    from orders.services.term_resolution import apply_terms
+
+    first, last = month_range(month)
+    due = [
+        info for info in basic_infos
+        if info.project_start_date <= last and info.project_end_date >= first
+        and is_due(first, info.order_issuance_timing, as_of)
+    ]
+    existing = set(
+        Order.objects.filter(order_end_ym__year=first.year, order_end_ym__month=first.month)
+        .values_list('partner_id', 'project_id')
+    )
+    due = [info for info in due if (info.partner_id, info.project_id) not in existing]
+    if not due:
+        return []
+
+    pairs = {(info.partner_id, info.project_id) for info in due}
+    templates = _latest_orders(pairs, first)
+    template_ids = [order.order_id for order in templates.values()]
+    template_items = _group_by_order(OrderItem.objects.filter(order_id__in=template_ids).order_by('pk'))
+    template_persons = _group_by_order(Person.objects.filter(order_id__in=template_ids).order_by('pk'))
+
+    order_ids = Order.allocate_ids(len(due), date=as_of)
+
+    orders, items, persons = [], [], []
+    for order_id, info in zip(order_ids, due):
+        pair = (info.partner_id, info.project_id)
+        template = templates.get(pair)
+        order = Order(
+            order_id=order_id, partner_id=info.partner_id, project_id=info.project_id, status='DRAFT',
+            order_end_ym=first, order_date=issuance_date(first, info.order_issuance_timing),
+            work_start=max(first, info.project_start_date), work_end=min(last, info.project_end_date),
+        )
+        if template:
+            for field in INHERITED_ORDER_FIELDS:
+                setattr(order, field, getattr(template, field))
+        orders.append(order)
+
+        if template:
+            for source in template_items.get(template.order_id, []):
+                item = OrderItem(order_id=order_id, **{f: getattr(source, f) for f in INHERITED_ITEM_FIELDS})
+                item.price = item.calculate_price()[2]
+                items.append(item)
+            for source in template_persons.get(template.order_id, []):
+                persons.append(Person(order_id=order_id, role=source.role, name=source.name, contact=source.contact))
+
+    # Order.save と同じく支払条件・契約条件を設定する（bulk_create は save を呼ばない）
+    apply_terms(orders)
+    Order.objects.bulk_create(orders)
+    OrderItem.objects.bulk_create(items)
+    Person.objects.bulk_create(persons)
+    return orders
+
+
+def _hours_entered(order, items):
+    """
+    請求書を作成できるだけの実稼働時間が入力されているか。
+
+    明細がある注文はすべての明細の実稼働時間が入力されていること。明細のない注文は実稼働時間を
+    持たないため、基準時間の下限がない（不足の控除が起きない）場合のみ作成する。
+    """
+    if items:
+        return all(item.actual_hours > 0 for item in items)
+    return not order.time_lower_limit > 0
+
+
+def generate_invoices(month, as_of, basic_infos):
+    """
+    対象月の注文のうち、請求書の発行日を過ぎて請求書がなく、実稼働時間が入力されたものに
+    請求書（下書き）を作成する。
+
+    Returns:
+        list: 作成した請求書
+    """
+    from invoices.models import Invoice, InvoiceItem
+    from invoices.services.settlement import settle_invoices
+    from orders.models import Order, OrderItem
+
+    first, _last = month_range(month)
+    due_pairs = {
+        (info.partner_id, info.project_id) for info in basic_infos
+        if is_due(first, info.invoice_issuance_timing, as_of)
+    }
+    if not due_pairs:
+        return []
+    orders = [
+        order for order in
+        Order.objects.filter(
+            order_end_ym__year=first.year, order_end_ym__month=first.month, invoice__isnull=True,
+        ).order_by('order_id')
+        if (order.partner_id, order.project_id) in due_pairs
+    ]
+    if not orders:
+        return []
+
+    order_items = _group_by_order(OrderItem.objects.filter(order_id__in=[o.order_id for o in orders]).order_by('pk'))
+    # 実稼働時間が未入力のまま請求書を作ると、基準時間の下限まで不足として控除されるため、
+    # 入力されるまで作成しない（毎日の実行で入力後に作成される）
+    ready = [order for order in orders if _hours_entered(order, order_items.get(order.order_id, []))]
+    if len(ready) < len(orders):
+        logger.info(f"Invoices for {first:%Y-%m}: {len(orders) - len(ready)} orders skipped until work hours are entered")
+    orders = ready
+    if not orders:
+        return []
+
+    invoice_nos = Invoice.allocate_invoice_nos(len(orders), date=as_of)
+    invoices = [
+        Invoice(order=order, invoice_no=no, acceptance_no=f"MP{no}", target_month=first, issue_date=as_of)
+        for order, no in zip(orders, invoice_nos)
+    ]
+    invoices = Invoice.objects.bulk_create(invoices)
+    invoice_by_order = {invoice.order_id: invoice for invoice in invoices}
+
+    items = []
+    for order in orders:
+        invoice = invoice_by_order[order.order_id]
+        for source in order_items.get(order.order_id, []):
+            items.append(InvoiceItem(
+                invoice=invoice, person_name=source.person_name or "作業担当者",
+                work_time=source.actual_hours, base_fee=base_amount(source.effort, source.base_fee),
+                time_lower_limit=source.time_lower_limit, time_upper_limit=source.time_upper_limit,
+                shortage_rate=source.shortage_rate, excess_rate=source.excess_rate,
+            ))
+        if order.order_id not in order_items and order.base_fee:
+            # 明細のない注文は注文本体の料金・精算条件を1行の明細にする
+            items.append(InvoiceItem(
+                invoice=invoice, person_name=order.作業責任者 or "作業担当者", base_fee=order.base_fee,
+                time_lower_limit=order.time_lower_limit, time_upper_limit=order.time_upper_limit,
+                shortage_rate=order.shortage_fee, excess_rate=order.excess_fee,
+            ))
+    InvoiceItem.objects.bulk_create(items)
+    settle_invoices(Invoice.objects.filter(pk__in=[invoice.pk for invoice in invoices]))
+    return invoices
+
+
+def generate_monthly_documents(month, as_of=None, invoices=True, dry_run=False):
+    """
+    対象月の注文・請求書（下書き）を一括で作成する。
+
+    Args:
+        month: 対象月（date。日は無視する）
+        as_of: 発行タイミングの判定日（省略時は今日）
+        invoices: False の場合は注文のみ作成する
+        dry_run: True の場合は作成した内容を保存しない（件数の確認用）
+
+    Returns:
+        dict: orders（作成した注文）, invoices（作成した請求書）
+    """
+    from orders.models import OrderBasicInfo
+
+    as_of = as_of or datetime.date.today()
+    result = {'orders': [], 'invoices': []}
+    with transaction.atomic():
+        basic_infos = list(OrderBasicInfo.objects.all())
+        result['orders'] = generate_orders(month, as_of, basic_infos)
+        if invoices:
+            result['invoices'] = generate_invoices(month, as_of, basic_infos)
+        # bulk_create は post_save を送らないため、横断検索の索引をここで作成する
+        update_search_index('orders.Order', [order.pk for order in result['orders']])
+        update_search_index('invoices.Invoice', [invoice.pk for invoice in result['invoices']])
+        if dry_run:
+            transaction.set_rollback(True)
+
+    if not dry_run:
+        # bulk_create は post_save を送らないため、ダッシュボードの集計キャッシュをここで破棄する
+        from core.services.status_counts import invalidate_status_counts
+        if result['orders']:
+            invalidate_status_counts('orders.Order')
+        if result['invoices']:
+            invalidate_status_counts('invoices.Invoice')
+    logger.info(
+        f"Monthly documents for {month:%Y-%m}: {len(result['orders'])} orders, "
+        f"{len(result['invoices'])} invoices{' (dry run)' if dry_run else ''}"
+    )
+    return result
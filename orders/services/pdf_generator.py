@@ -1,27 +1,22 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.cidfonts import UnicodeCIDFont
 from reportlab.platypus import Table, TableStyle
 from reportlab.lib import colors
 import io
 import os
 from django.conf import settings
-from core.domain.models import CompanyInfo
+from core.services.company import get_company_info
+from core.services.pdf_context import get_stamp_image, register_fonts
 
 def _setup_fonts(p):
-    # フォント登録（日本語対応）
-    font_name = "HeiseiMin-W3"
-    try:
-        pdfmetrics.getFont(font_name)
-    except:
-        pdfmetrics.registerFont(UnicodeCIDFont("HeiseiMin-W3"))
-    return font_name
+    # フォント登録（日本語対応）。登録はプロセスごとに一度だけ行われる（core.services.pdf_context）
+    return register_fonts()
 
-def _draw_company_info(p, x, y, font_name, side="甲"):
+def _draw_company_info(p, x, y, font_name, side="甲", company=None):
     p.setFont(font_name, 10)
-    company = CompanyInfo.objects.first()
+    if company is None:
+        company = get_company_info()
     if not company:
         name = "有限会社 マックプランニング"
         post = "〒116-0012"
@@ -49,24 +44,20 @@ def _draw_company_info(p, x, y, font_name, side="甲"):
     return name, rep
 
 def _get_fee_text(order):
-    items = order.items.all()
-    if items.exists():
+    items = list(order.items.all())
+    if items:
         fee_text = ""
         for item in items:
             name = item.person_name or "作業担当者"
             calc_text = f"￥{item.base_fee:,} × {item.effort}"
             
-            adjustment = 0
+            # 調整金は保存時に計算済みの金額（item.price）から求める
+            adjustment = item.adjustment
             adj_detail = ""
-            if item.actual_hours > 0:
-                if item.actual_hours < item.time_lower_limit:
-                    shortage = item.time_lower_limit - item.actual_hours
-                    adjustment = -int(shortage * item.shortage_rate)
-                    adj_detail = f" － 調整金(不足):￥{-adjustment:,}円"
-                elif item.actual_hours > item.time_upper_limit:
-                    excess = item.actual_hours - item.time_upper_limit
-                    adjustment = int(excess * item.excess_rate)
-                    adj_detail = f" ＋ 調整金(超過):￥{adjustment:,}円"
+            if adjustment < 0:
+                adj_detail = f" － 調整金(不足):￥{-adjustment:,}円"
+            elif adjustment > 0:
+                adj_detail = f" ＋ 調整金(超過):￥{adjustment:,}円"
             
             fee_text += f"【{name}】\n"
             fee_text += f"金額：￥{item.price:,}円 (内訳: {calc_text}{adj_detail})\n"
@@ -80,8 +71,21 @@ def _get_fee_text(order):
                 f"※基準時間：{order.time_lower_limit}h～{order.time_upper_limit}h/月\n\n"
                 "作業報告書に基づく稼動実費精算とする。")
 
-def generate_order_pdf(order, watermark=None):
-    """注文書PDFの生成"""
+def order_pdf_inputs(order):
+    """注文書・注文請書PDFに反映される入力一式（PDFキャッシュのキー算出用）"""
+    return [
+        order,
+        order.items.all(),
+        order.partner,
+        order.project,
+        order.workplace,
+        get_company_info(),
+    ]
+
+def generate_order_pdf(order, watermark=None, company=None):
+    """注文書PDFの生成（company を渡すと自社情報の再取得を省略する）"""
+    if company is None:
+        company = get_company_info()
     buffer = io.BytesIO()
     p = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
@@ -112,15 +116,12 @@ def generate_order_pdf(order, watermark=None):
     p.drawString(20*mm, height - 56*mm, f"{order.partner.name}  御中")
 
     # 4. 発行人 (甲)
-    _draw_company_info(p, 110*mm, height - 55*mm, font_name, "甲")
+    _draw_company_info(p, 110*mm, height - 55*mm, font_name, "甲", company=company)
 
     # 6. 印影表示（枠なし）
-    company = CompanyInfo.objects.first()
-    if company and company.stamp_image:
-        try:
-            p.drawImage(company.stamp_image.path, 155*mm, height - 85*mm, width=22*mm, height=22*mm, mask='auto', preserveAspectRatio=True)
-        except:
-            pass
+    stamp = get_stamp_image(company)
+    if stamp:
+        p.drawImage(stamp, 155*mm, height - 85*mm, width=22*mm, height=22*mm, mask='auto', preserveAspectRatio=True)
 
     # 7. 本文
     p.setFont(font_name, 10)
@@ -176,8 +177,10 @@ def generate_order_pdf(order, watermark=None):
     buffer.seek(0)
     return buffer
 
-def generate_acceptance_pdf(order):
-    """注文請書PDFの生成"""
+def generate_acceptance_pdf(order, company=None):
+    """注文請書PDFの生成（company を渡すと自社情報の再取得を省略する）"""
+    if company is None:
+        company = get_company_info()
     buffer = io.BytesIO()
     p = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
@@ -200,7 +203,6 @@ def generate_acceptance_pdf(order):
     # 4. 宛先 (甲)
     p.setFont(font_name, 12)
     p.drawString(20*mm, height - 50*mm, "（甲）")
-    company = CompanyInfo.objects.first()
     p.drawString(20*mm, height - 56*mm, f"{company.name if company else '有限会社 マックプランニング'}  御中")
 
     # 5. 発行人 (乙)
@@ -0,0 +1,48 @@
+"""
+注文書の正式発行（DRAFT -> UNCONFIRMED）
+
+画面からの正式発行（OrderPublishView）と manage.py generate_month_pdfs --publish で共通の処理。
+
+- 下書き以降に登録された支払条件・契約条件を反映してから、注文書を原本として保存する
+  （発行の保存に失敗した場合は原本ファイルを削除する）
+- Google Driveへのアップロードはワーカーで実行する（ジョブを登録する）
+"""
+from django.db import transaction
+
+from core.services.document_lifecycle import discard_on_rollback, freeze
+from core.services.jobs import enqueue
+from orders.services.term_resolution import apply_terms
+
+# 条件の反映で注文書の記載が変わる項目
+_TERM_VALUES = ('payment_term_id', 'payment_condition', 'contract_term_id', 'contract_items')
+
+
+def publish_order(order, content=None):
+    """
+    下書きの注文書を正式に発行する。
+
+    Args:
+        order: 下書き（DRAFT）の注文
+        content: 下書きの状態で描画済みの注文書PDF（条件の反映で記載が変わった場合は描画し直す）
+    """
+    if order.status != 'DRAFT':
+        raise ValueError(f"Order {order.order_id} is not a draft: {order.status}")
+
+    before = [getattr(order, field) for field in _TERM_VALUES]
+    apply_terms([order])
+    if content is not None and [getattr(order, field) for field in _TERM_VALUES] != before:
+        content = None
+    order.status = 'UNCONFIRMED'
+
+    with discard_on_rollback(order, 'order'), transaction.atomic():
+        freeze(order, 'order', content=content, force=True, save=False)
+        order.save(update_fields=[
+            'status', 'order_pdf', 'order_pdf_hash', 'updated_at',
+            'payment_term', 'payment_condition', 'contract_term', 'contract_items',
+        ])
+        # Google Driveへの自動アップロードはワーカーで実行する
+        enqueue(
+            'orders.services.tasks.upload_order_pdf_to_drive', {'order_id': order.order_id},
+            label="Googleドライブへのアップロード", target=order,
+            idempotency_key=f"order:{order.order_id}:drive_upload",
+        )
@@ -0,0 +1,60 @@
+"""
+注文書まわりのバックグラウンドジョブ
+
+core.services.jobs.enqueue から登録し、ワーカー（manage.py run_jobs）で実行する。
+ジョブは再試行されるため、各関数は複数回実行されても結果が変わらないようにする。
+"""
+import logging
+from django.conf import settings
+from django.core.mail import send_mail
+
+logger = logging.getLogger(__name__)
+
+# 承認通知の宛先
+APPROVAL_NOTIFY_EMAILS = ['y.yoshikawa@macplanning.com']
+
+
+def _get_order(order_id):
+    from orders.models import Order
+    return Order.objects.select_related('partner', 'project').get(order_id=order_id)
+
+
+def upload_order_pdf_to_drive(order_id):
+    """注文書PDFをGoogleドライブにアップロードし、ファイルIDを保存する"""
+    from .google_drive_service import upload_order_pdf
+    order = _get_order(order_id)
+    result = upload_order_pdf(order)
+    order.drive_file_id = result['file_id']
+    order.save(update_fields=['drive_file_id'])
+
+
+def request_order_signature(order_id):
+    """注文書の電子署名を依頼し、署名IDを保存する（依頼済みの場合は何もしない）"""
+    from .signature_service import SignatureService
+    order = _get_order(order_id)
+    if order.external_signature_id:
+        return
+    result = SignatureService().request_signature(order)
+    order.external_signature_id = result['signature_id']
+    order.save(update_fields=['external_signature_id'])
+
+
+def notify_order_approved(order_id):
+    """注文書の承認を管理者へメールで通知する"""
+    order = _get_order(order_id)
+    subject = f"【承認通知】注文番号：{order.order_id}"
+    message = f"""{order.partner.name} 様より、以下の注文書が承認されました。
+
+■注文番号：{order.order_id}
+■プロジェクト：{order.project.name}
+■注文日：{order.order_date}
+
+システムにログインして詳細を確認してください。
+"""
+    send_mail(
+        subject,
+        message,
+        settings.DEFAULT_FROM_EMAIL,
+        APPROVAL_NOTIFY_EMAILS,
+        fail_silently=False,
+    )
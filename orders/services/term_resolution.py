@@ -0,0 +1,136 @@
+"""
+支払条件・契約条件の解決サービス
+
+注文のパートナー×プロジェクトに対応する支払条件（PaymentTerm）・契約条件（ContractTerm）を、
+プロセス内に保持した (partner_id, project_id) → 条件 の対応表から引く
+（注文の保存ごとに PaymentTerm / ContractTerm を問い合わせない）。
+
+- 条件が登録されていない組み合わせも「なし」として保持する
+- 条件の保存・削除時に Django のキャッシュ上の世代番号を進める（core/signals.py）。
+  各プロセスは解決のたびに世代番号を確かめ、変わっていれば対応表を読み直す
+  （CACHE_URL に共有キャッシュを指定していれば、他のプロセスでの変更もすぐに反映される）
+- 保持期間（settings.TERM_CACHE_TIMEOUT 秒）を過ぎた対応表も読み直す（キャッシュを共有しない構成での上限）
+- resolve_terms_many / apply_terms は、複数の注文の条件を2クエリでまとめて解決する
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'term_resolution:generation'
+
+_lock = threading.Lock()
+_terms = {}         # (partner_id, project_id) → (PaymentTerm or None, ContractTerm or None)
+_loaded_at = None   # 対応表を最初に読み込んだ時刻（保持期間の起点）
+_generation = None  # 対応表を読み込んだときの世代番号
+
+
+def _current_generation():
+    try:
+        return cache.get(GENERATION_KEY, 0)
+    except Exception as e:
+        logger.warning(f"Term cache generation lookup failed: {e}")
+        return None
+
+
+def _fresh_cache(generation):
+    """世代番号が同じで保持期間内の対応表を返す（変わっていれば破棄する）"""
+    global _loaded_at, _generation
+    timeout = getattr(settings, 'TERM_CACHE_TIMEOUT', 300)
+    if (
+        _loaded_at is None or generation is None or generation != _generation
+        or time.monotonic() - _loaded_at >= timeout
+    ):
+        _terms.clear()
+        _loaded_at = time.monotonic()
+        _generation = generation
+    return _terms
+
+
+def resolve_terms_many(pairs):
+    """
+    パートナー×プロジェクトの組み合わせごとに支払条件・契約条件を解決する。
+
+    保持していない組み合わせは PaymentTerm / ContractTerm を1クエリずつで読み込む。
+    取得したインスタンスは複数の処理で共有されるため、変更して保存しないこと。
+
+    Returns:
+        dict: (partner_id, project_id) → (PaymentTerm or None, ContractTerm or None)
+    """
+    from orders.models import ContractTerm, PaymentTerm
+
+    pairs = {pair for pair in pairs if all(pair)}
+    if not pairs:
+        return {}
+    generation = _current_generation()
+    with _lock:
+        terms = _fresh_cache(generation)
+        resolved = {pair: terms[pair] for pair in pairs if pair in terms}
+    missing = pairs - resolved.keys()
+    if not missing:
+        return resolved
+
+    partner_ids = {partner_id for partner_id, _project_id in missing}
+    project_ids = {project_id for _partner_id, project_id in missing}
+    loaded = {pair: [None, None] for pair in missing}
+    for index, model in enumerate((PaymentTerm, ContractTerm)):
+        for term in model.objects.filter(partner_id__in=partner_ids, project_id__in=project_ids):
+            pair = (term.partner_id, term.project_id)
+            if pair in loaded:
+                loaded[pair][index] = term
+    loaded = {pair: tuple(terms) for pair, terms in loaded.items()}
+    with _lock:
+        # 読み込み中に世代番号が進んだ場合は、古いかもしれない結果を保持しない
+        if generation is not None and generation == _generation:
+            _terms.update(loaded)
+    resolved.update(loaded)
+    return resolved
+
+
+def resolve_terms(partner_id, project_id):
+    """1件の組み合わせの (支払条件, 契約条件) を返す"""
+    return resolve_terms_many([(partner_id, project_id)]).get((partner_id, project_id), (None, None))
+
+
+def apply_terms(orders):
+    """
+    注文に未設定の支払条件・契約条件を設定し、説明文を詳細テキストの初期値にする（保存はしない）。
+
+    Args:
+        orders: 注文のリスト（bulk_create 前の未保存の注文も可）
+    """
+    orders = [order for order in orders if order.partner_id and order.project_id]
+    resolved = resolve_terms_many(
+        (order.partner_id, order.project_id) for order in orders
+        if not order.payment_term_id or not order.contract_term_id
+    )
+    for order in orders:
+        payment_term, contract_term = resolved.get((order.partner_id, order.project_id), (None, None))
+        if not order.payment_term_id and payment_term:
+            order.payment_term = payment_term
+        if not order.contract_term_id and contract_term:
+            order.contract_term = contract_term
+
+        if order.payment_term_id and not order.payment_condition:
+            order.payment_condition = order.payment_term.description
+        if order.contract_term_id and not order.contract_items:
+            order.contract_items = order.contract_term.description
+
+
+def invalidate_terms():
+    """世代番号を進め、すべてのプロセスで次回の解決時に対応表を読み直させる"""
+    global _loaded_at
+    with _lock:
+        _terms.clear()
+        _loaded_at = None
+    try:
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.set(GENERATION_KEY, 1, None)
+    except Exception as e:
+        logger.warning(f"Term cache invalidation failed: {e}")
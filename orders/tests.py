@@ -1,3 +1,41 @@
+"""
+orders のテスト
+
+python manage.py test --settings=EDI_MP.test_settings で実行する。
+"""
+import io
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
 
-# Create your tests here.
+from core.management.commands.check_query_budget import QUERY_BUDGETS
+
+
+def run_command(name, *args):
+    """管理コマンドを実行し、(成功したか, 出力) を返す"""
+    out = io.StringIO()
+    try:
+        call_command(name, *args, stdout=out)
+    except CommandError as e:
+        return False, f"{out.getvalue()}\n{e}"
+    return True, out.getvalue()
+
+
+class QueryBudgetTests(TestCase):
+    """一覧・ダッシュボード画面のクエリ数がデータ件数に依存せず上限内に収まること（check_query_budget）"""
+
+    def test_list_and_dashboard_views_stay_within_budget(self):
+        ok, output = run_command('check_query_budget', '--rows', '10,1000')
+        self.assertTrue(ok, output)
+        for url_name, role, _budget in QUERY_BUDGETS:
+            self.assertIn(f"{url_name} ({role})", output)
+
+
+class QueryPlanTests(TestCase):
+    """よく使う絞り込みがテーブル全体の走査にならないこと（check_query_plans）"""
+
+    def test_hot_queries_use_indexes(self):
+        ok, output = run_command('check_query_plans', '--rows', '2000')
+        self.assertTrue(ok, output)
+        self.assertNotIn("NG  ", output)
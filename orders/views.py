@@ -1,18 +1,19 @@
-import hashlib
 from django.shortcuts import render, get_object_or_404, redirect
-from django.core.files.base import ContentFile
 from django.http import HttpResponse,  HttpResponseForbidden
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.generic import ListView, DetailView
 from django.contrib import messages
-from django.core.mail import send_mail
-from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from .models import Order
-from .services.pdf_generator import generate_order_pdf, generate_acceptance_pdf
-from .services.signature_service import SignatureService
+from .services.pdf_generator import generate_order_pdf, generate_acceptance_pdf, order_pdf_inputs
+from .services.publishing import publish_order
+from core.services.document_lifecycle import discard_on_rollback, freeze, frozen_document_response, should_freeze
+from core.services.jobs import enqueue, jobs_for
+from core.services.keyset import KeysetPaginationMixin
+from core.services.pdf_cache import get_or_render
 
 class AdminOrderPDFView(View):
     """管理者用PDFプレビュー・ダウンロード"""
@@ -23,21 +24,16 @@ class AdminOrderPDFView(View):
         
         # 下書きの場合は透かし入りでプレビュー表示
         if order.status == 'DRAFT':
-            buffer = generate_order_pdf(order, watermark="下書き")
+            buffer = get_or_render(
+                'order_draft', order_pdf_inputs(order),
+                lambda: generate_order_pdf(order, watermark="下書き"),
+            )
             response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
             response['Content-Disposition'] = f'inline; filename="order_{order_id}_draft.pdf"'
             return response
 
-        # 正式発行済みの原本があればそれを返す
-        if order.order_pdf:
-            response = HttpResponse(order.order_pdf.read(), content_type='application/pdf')
-            response['Content-Disposition'] = f'inline; filename="order_{order_id}.pdf"'
-            return response
-
-        buffer = generate_order_pdf(order)
-        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'inline; filename="order_{order_id}.pdf"'
-        return response
+        # 正式発行済みの注文書は保存した原本を返す
+        return frozen_document_response(request, order, 'order', as_attachment=False)
 
 class CustomerOrderPDFView(View):
     """パートナー用PDFダウンロード"""
@@ -54,19 +50,17 @@ class CustomerOrderPDFView(View):
         if order.partner != request.user.profile.partner:
              return HttpResponseForbidden("この注文書を閲覧する権限がありません。")
 
-        # 既に保存されたPDFがあればそれを返す（電帳法対応：原本の保持）
-        if order.order_pdf:
+        # 発行済みの注文書は保存した原本を返す（電帳法対応：原本の保持）
+        if should_freeze(order, 'order'):
             # 閲覧＝承認とする（ユーザー要望）
             if order.status in ['UNCONFIRMED', 'CONFIRMING']:
                 order.status = 'APPROVED'
                 order.finalized_at = timezone.now()
                 # 承認時に請書も生成・保存するロジック（後述のApproveViewと同様）をここでも実行するか検討
                 # 一旦ステータス更新のみ。請書生成はApproveViewまたは別途
-                order.save()
+                order.save(update_fields=['status', 'finalized_at', 'updated_at'])
             
-            response = HttpResponse(order.order_pdf.read(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="order_{order_id}.pdf"'
-            return response
+            return frozen_document_response(request, order, 'order')
 
         buffer = generate_order_pdf(order)
 
@@ -74,7 +68,7 @@ class CustomerOrderPDFView(View):
         if order.status in ['UNCONFIRMED', 'CONFIRMING']:
             order.status = 'APPROVED'
             order.finalized_at = timezone.now()
-            order.save()
+            order.save(update_fields=['status', 'finalized_at', 'updated_at'])
 
         response = HttpResponse(buffer, content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="order_{order_id}.pdf"'
@@ -86,7 +80,11 @@ class AdminAcceptancePDFView(View):
     @method_decorator(user_passes_test(lambda u: u.is_staff))
     def get(self, request, order_id):
         order = get_object_or_404(Order, order_id=order_id)
-        buffer = generate_acceptance_pdf(order)
+        # 承認済みの注文請書は保存した原本を返す
+        if should_freeze(order, 'acceptance'):
+            return frozen_document_response(request, order, 'acceptance', as_attachment=False)
+
+        buffer = get_or_render('acceptance', order_pdf_inputs(order), lambda: generate_acceptance_pdf(order))
         
         response = HttpResponse(buffer, content_type='application/pdf')
         response['Content-Disposition'] = f'inline; filename="acceptance_{order_id}.pdf"'
@@ -105,10 +103,8 @@ class CustomerAcceptancePDFView(View):
         if order.partner != request.user.profile.partner:
              return HttpResponseForbidden("権限がありません。")
 
-        if order.acceptance_pdf:
-            response = HttpResponse(order.acceptance_pdf.read(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="acceptance_{order_id}.pdf"'
-            return response
+        if should_freeze(order, 'acceptance'):
+            return frozen_document_response(request, order, 'acceptance')
 
         buffer = generate_acceptance_pdf(order)
 
@@ -116,12 +112,13 @@ class CustomerAcceptancePDFView(View):
         response['Content-Disposition'] = f'attachment; filename="acceptance_{order_id}.pdf"'
         return response
 
-class OrderListView(ListView):
+class OrderListView(KeysetPaginationMixin, ListView):
     """パートナー用：自分宛ての注文書一覧"""
     model = Order
     template_name = 'orders/order_list.html'
     context_object_name = 'orders'
     ordering = ['-order_date']
+    keyset_ordering = ('-order_date', '-order_id')
 
     @method_decorator(login_required)
     def dispatch(self, *args, **kwargs):
@@ -129,15 +126,17 @@ class OrderListView(ListView):
 
     def get_queryset(self):
         user = self.request.user
+        # 一覧で表示するプロジェクト名を同じクエリで取得する
+        queryset = Order.objects.select_related('partner', 'project').order_by('-order_date')
         if user.is_staff:
-            return Order.objects.all().order_by('-order_date')
+            return queryset
 
         if not hasattr(user, 'profile') or not user.profile.partner:
              # パートナーが紐付いていない場合は空リスト
              return Order.objects.none()
         
         # 自分のCustomerの注文のみ ＆ 下書き（DRAFT）は非表示
-        return Order.objects.filter(partner=user.profile.partner).exclude(status='DRAFT').order_by('-order_date')
+        return queryset.filter(partner=user.profile.partner).exclude(status='DRAFT')
 
 class OrderDetailView(DetailView):
     """パートナー用：注文書詳細"""
@@ -160,6 +159,13 @@ class OrderDetailView(DetailView):
         # パートナー用にはDRAFTを非表示に
         return Order.objects.filter(partner=user.profile.partner).exclude(status='DRAFT')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.request.user.is_staff:
+            # Driveアップロード・署名依頼・通知メールの処理状況
+            context['jobs'] = jobs_for(self.object)
+        return context
+
 class OrderApproveView(View):
     """パートナー用：注文承認処理"""
     
@@ -179,46 +185,22 @@ class OrderApproveView(View):
         order.status = 'APPROVED'
         order.finalized_at = timezone.now()
         
-        # 注文請書を生成して保存（永続化・改ざん防止）
-        buffer = generate_acceptance_pdf(order)
-        content = buffer.getvalue()
-        order.document_hash = hashlib.sha256(content).hexdigest()
-        order.acceptance_pdf.save(f"acceptance_{order.order_id}.pdf", ContentFile(content), save=False)
-        
-        # 電子署名依頼（フェーズ4: 外部連携）
-        try:
-            sig_service = SignatureService()
-            sig_result = sig_service.request_signature(order)
-            order.external_signature_id = sig_result['signature_id']
-        except Exception as e:
-            # 署名依頼の失敗はログに留め、本体の承認処理は継続（運用の柔軟性のため）
-            import logging
-            logging.getLogger(__name__).warning(f"Signature request failed for {order.order_id}: {e}")
-            
-        order.save()
-
-        # 管理者へメール送信
-        subject = f"【承認通知】注文番号：{order.order_id}"
-        message = f"""{order.partner.name} 様より、以下の注文書が承認されました。
-
-■注文番号：{order.order_id}
-■プロジェクト：{order.project.name}
-■注文日：{order.order_date}
-
-システムにログインして詳細を確認してください。
-"""
-        try:
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                ['y.yoshikawa@macplanning.com'],
-                fail_silently=False,
+        # 注文請書を生成して原本として保存（永続化・改ざん防止）。承認の保存に失敗した場合は原本ファイルを削除する
+        with discard_on_rollback(order, 'acceptance'), transaction.atomic():
+            freeze(order, 'acceptance', force=True, save=False)
+            order.save(update_fields=['status', 'finalized_at', 'acceptance_pdf', 'document_hash', 'updated_at'])
+            # 電子署名依頼（フェーズ4: 外部連携）と管理者へのメール通知はワーカーで実行する
+            # 署名依頼の失敗は本体の承認処理に影響させない（運用の柔軟性のため）
+            enqueue(
+                'orders.services.tasks.request_order_signature', {'order_id': order.order_id},
+                label="電子署名依頼", target=order, idempotency_key=f"order:{order.order_id}:signature",
+            )
+            enqueue(
+                'orders.services.tasks.notify_order_approved', {'order_id': order.order_id},
+                label="承認通知メール", target=order, idempotency_key=f"order:{order.order_id}:approved_mail",
             )
-            messages.success(request, "注文書を承認しました。管理者へ通知されました。")
-        except Exception as e:
-            messages.warning(request, "承認ステータスを更新しましたが、メール通知に失敗しました。")
 
+        messages.success(request, "注文書を承認しました。管理者への通知を送信します。")
         return redirect('orders:order_detail', order_id=order_id)
 
 
@@ -232,23 +214,7 @@ class OrderPublishView(View):
             messages.warning(request, "下書き状態の注文書のみ発行可能です。")
             return redirect('orders:order_detail', order_id=order_id)
         
-        order.status = 'UNCONFIRMED'
-        # 正式発行時に注文書を永続保存
-        buffer = generate_order_pdf(order)
-        content = buffer.getvalue()
-        order.order_pdf.save(f"order_{order.order_id}.pdf", ContentFile(content), save=False)
-        order.save()
-
-        # Google Driveへ自動アップロード
-        try:
-            from .services.google_drive_service import upload_order_pdf
-            result = upload_order_pdf(order)
-            order.drive_file_id = result['file_id']
-            order.save(update_fields=['drive_file_id'])
-            messages.success(request, f"注文書 {order.order_id} を正式に発行し、Googleドライブにアップロードしました。")
-        except Exception as e:
-            import logging
-            logging.getLogger(__name__).warning(f"Drive upload failed for {order.order_id}: {e}")
-            messages.success(request, f"注文書 {order.order_id} を正式に発行しました。（Driveへのアップロードは失敗しました）")
+        publish_order(order)
 
+        messages.success(request, f"注文書 {order.order_id} を正式に発行しました。Googleドライブへのアップロードを開始します。")
         return redirect('orders:order_detail', order_id=order_id)
@@ -31,7 +31,7 @@ def signature_webhook(request):
             # ステータスを「受領済（または署名済）」に自動更新
             if order.status != 'APPROVED':
                 order.status = 'APPROVED'
-                order.save()
+                order.save(update_fields=['status', 'updated_at'])
             logger.info(f"Order {order.order_id} has been signed via external service (Webhook).")
 
         return JsonResponse({'status': 'success'})
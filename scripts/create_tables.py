@@ -1,6 +1,9 @@
 """
 PostgreSQL用: Djangoモデルからテーブルを直接作成するスクリプト。
 マイグレーションの不整合を回避するため、migrate --fake の後に実行する。
+
+既存のテーブルに不足している列（モデルに追加したフィールド）とインデックス、
+横断検索の索引（pg_trgm の GIN インデックス。core.services.search）も追加する。
 """
 import os
 import sys
@@ -34,9 +37,44 @@ def create_tables():
                         print(f"  Error creating {table_name}: {e}")
                 else:
                     print(f"  Table exists: {table_name}")
+                    add_missing_columns(schema_editor, model)
+                    add_missing_indexes(schema_editor, model)
+
+
+def add_missing_columns(schema_editor, model):
+    """既存テーブルに、モデルにあってテーブルにない列を追加する"""
+    with connection.cursor() as cursor:
+        columns = {
+            column.name
+            for column in connection.introspection.get_table_description(cursor, model._meta.db_table)
+        }
+    for field in model._meta.local_fields:
+        if field.column is None or field.column in columns:
+            continue
+        try:
+            schema_editor.add_field(model, field)
+            print(f"  Added column: {model._meta.db_table}.{field.column}")
+        except Exception as e:
+            print(f"  Error adding {model._meta.db_table}.{field.column}: {e}")
+
+
+def add_missing_indexes(schema_editor, model):
+    """既存テーブルに、モデルの Meta.indexes にあってテーブルにないインデックスを作成する"""
+    with connection.cursor() as cursor:
+        existing = set(connection.introspection.get_constraints(cursor, model._meta.db_table))
+    for index in model._meta.indexes:
+        if index.name in existing:
+            continue
+        try:
+            schema_editor.add_index(model, index)
+            print(f"  Added index: {model._meta.db_table}.{index.name}")
+        except Exception as e:
+            print(f"  Error adding index {model._meta.db_table}.{index.name}: {e}")
 
 
 if __name__ == '__main__':
     print("Creating tables from Django models...")
     create_tables()
+    from core.services.search import ensure_search_backend
+    print(f"  Search backend: {ensure_search_backend()}")
     print("Done.")